@@ -9,6 +9,7 @@ sys.path.append(str(Path(__file__).parent / "src"))
 from rag import CloneDetectionRAG
 from ingest import DataIngestor
 from config import Config
+import index_store
 
 # 页面配置
 st.set_page_config(
@@ -107,6 +108,9 @@ def load_rag_system(model_size="1.5B"):
                 # 实际加载（传入模型大小参数）
                 st.session_state.rag_system = CloneDetectionRAG(model_size=model_size)
                 st.session_state.selected_model = model_size
+                if Config.WATCH_DATA_DIRS:
+                    # 后台监听数据目录，文件变化后增量同步，下一次检索即可见
+                    st.session_state.rag_system.retriever_manager.start_watcher()
                 
                 # 步骤 4: 完成
                 progress_bar.progress(100)
@@ -157,6 +161,27 @@ def sidebar():
                         st.error("失败！")
                 except Exception as e:
                     st.error(f"错误: {str(e)[:50]}...")
+        
+        # 全量重建在新版本目录中进行，校验通过后才切换，重建期间问答不受影响
+        if st.button("全量重建索引", use_container_width=True):
+            with st.spinner("重建中..."):
+                try:
+                    ingestor = DataIngestor()
+                    vector_store = ingestor.ingest_all_data(force_refresh=True)
+                    if vector_store:
+                        st.session_state.data_ingested = True
+                        st.success(f"已切换到新版本: {index_store.current_version()}")
+                    else:
+                        st.error("失败！")
+                except Exception as e:
+                    st.error(f"重建失败，继续使用当前版本: {str(e)[:50]}...")
+        
+        if st.button("回滚到上一版本", use_container_width=True):
+            version = index_store.rollback()
+            if version:
+                st.success(f"已回滚到: {version}")
+            else:
+                st.info("没有可回滚的旧版本")
     
     # 快速操作 - 简化
     with st.sidebar.expander("🚀 示例问题"):
@@ -383,7 +408,7 @@ Embedding 模型: BAAI/bge-small-zh-v1.5
 Chunk Size: {Config.CHUNK_SIZE}
 Chunk Overlap: {Config.CHUNK_OVERLAP}
 Top K Retrieval: {Config.TOP_K_RETRIEVAL}
-Vector DB: {Config.CHROMA_PERSIST_DIRECTORY}
+Vector DB: {index_store.active_index_dir()}
         """, language="text")
         
         st.write("")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+向量模型后端基准测试
+在同一批文档块和查询上对比 torch（sentence-transformers）、onnx 和 onnx-int8（ONNX Runtime）：
+文档吞吐量、单条查询延迟、加载耗时，以及与 PyTorch 输出的余弦相似度（一致性校验），输出 JSON。
+任一 ONNX 后端的最低余弦相似度低于阈值时以非零状态退出。
+"""
+
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# 添加src目录到路径
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from config import Config
+from ingest import DocumentProcessor, discover_sources, load_sources
+from onnx_embeddings import PARITY_THRESHOLD, export_onnx, onnx_model_dir
+from bench_ingest import git_commit, peak_rss_mb
+from bench_vector_index import collect_questions
+
+# 日志输出到 stderr，stdout 只输出 JSON 结果
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BACKEND_CHOICES = ['torch', 'onnx', 'onnx-int8']
+
+def collect_texts(limit: int, seed: int) -> List[str]:
+    """从数据目录中读取并分块，抽取 limit 个文档块作为向量化样本"""
+    paths = list(discover_sources().values())
+    documents = []
+    for file_path, docs, error in load_sources(paths):
+        if error:
+            logger.warning(f"读取文件 {file_path} 时出错: {error}")
+            continue
+        documents.extend(docs)
+    texts = [chunk.page_content for chunk in DocumentProcessor().split_documents(documents)]
+    random.Random(seed).shuffle(texts)
+    return texts[:limit]
+
+def measure(embeddings, texts: List[str], queries: List[str]) -> Dict[str, Any]:
+    """文档吞吐量与单条查询延迟，返回指标和文档、查询向量"""
+    embeddings.embed_documents(texts[:8])  # 预热
+    start = time.perf_counter()
+    doc_vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    doc_seconds = time.perf_counter() - start
+
+    latencies, query_vectors = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies = np.array(latencies)
+
+    return {
+        'documents': len(texts),
+        'doc_seconds': round(doc_seconds, 3),
+        'docs_per_second': round(len(texts) / doc_seconds, 2) if doc_seconds > 0 else None,
+        'query_latency_ms': {
+            'mean': round(float(latencies.mean()), 3),
+            'p50': round(float(np.percentile(latencies, 50)), 3),
+            'p95': round(float(np.percentile(latencies, 95)), 3)
+        },
+        'doc_vectors': doc_vectors,
+        'query_vectors': np.asarray(query_vectors, dtype=np.float32)
+    }
+
+def cosine_stats(expected: np.ndarray, actual: np.ndarray) -> Dict[str, float]:
+    dot = np.sum(expected * actual, axis=1)
+    cosines = dot / np.maximum(np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1), 1e-12)
+    return {'min': round(float(cosines.min()), 5), 'mean': round(float(cosines.mean()), 5)}
+
+def main():
+    parser = argparse.ArgumentParser(description='向量模型后端基准测试（torch / onnx / onnx-int8）')
+    parser.add_argument('--backends', nargs='+', choices=BACKEND_CHOICES, default=BACKEND_CHOICES,
+                        help='参与对比的后端，torch 作为一致性校验的基准')
+    parser.add_argument('--num-texts', type=int, default=512, help='文档块样本数')
+    parser.add_argument('--num-queries', type=int, default=100, help='查询样本数')
+    parser.add_argument('--batch-size', type=int, default=Config.EMBED_BATCH_SIZE, help='向量化批大小')
+    parser.add_argument('--threads', type=int, default=Config.EMBEDDING_THREADS,
+                        help='计算线程数，0 表示使用全部CPU核')
+    parser.add_argument('--export', action='store_true', help='重新导出 ONNX 模型（默认复用已导出的模型）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='把 JSON 结果写入文件（默认输出到 stdout）')
+    args = parser.parse_args()
+
+    # 直接测量模型本身，不经过向量缓存
+    Config.EMBEDDING_CACHE_DIR = ''
+    Config.EMBEDDING_THREADS = args.threads
+
+    from embeddings import create_embeddings
+
+    texts = collect_texts(args.num_texts, args.seed)
+    queries = collect_questions(args.num_queries, args.seed)
+    logger.info(f"样本: {len(texts)} 个文档块, {len(queries)} 个查询")
+    if args.export and any(backend != 'torch' for backend in args.backends):
+        export_onnx(output_dir=onnx_model_dir())
+
+    backends = list(args.backends)
+    # 一致性校验需要 PyTorch 的输出作为基准
+    if 'torch' not in backends:
+        backends.insert(0, 'torch')
+
+    results, reference = {}, None
+    for backend in backends:
+        logger.info(f"加载向量模型: {Config.EMBEDDING_MODEL}（{backend}）")
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        embeddings = create_embeddings('cpu', batch_size=args.batch_size, backend=backend)
+        load_seconds = time.perf_counter() - start
+        if backend == 'torch' and args.threads:
+            import torch
+            torch.set_num_threads(args.threads)
+
+        entry = measure(embeddings, texts, queries)
+        doc_vectors, query_vectors = entry.pop('doc_vectors'), entry.pop('query_vectors')
+        entry['load_seconds'] = round(load_seconds, 3)
+        rss_after = peak_rss_mb()
+        entry['peak_rss_increase_mb'] = round(rss_after - rss_before, 1) if rss_after is not None else None
+        if reference is None:
+            reference = (doc_vectors, query_vectors)
+        else:
+            entry['parity'] = {
+                'documents': cosine_stats(reference[0], doc_vectors),
+                'queries': cosine_stats(reference[1], query_vectors)
+            }
+        logger.info(f"  {entry['docs_per_second']} 文档块/秒, 查询 p50={entry['query_latency_ms']['p50']} ms"
+                    + (f", 最低余弦相似度 {entry['parity']['documents']['min']}" if 'parity' in entry else ''))
+        if backend in args.backends:
+            results[backend] = entry
+        del embeddings
+
+    passed = all(
+        min(entry['parity']['documents']['min'], entry['parity']['queries']['min']) >= PARITY_THRESHOLD
+        for entry in results.values() if 'parity' in entry
+    )
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'embedding_model': Config.EMBEDDING_MODEL,
+            'batch_size': args.batch_size,
+            'threads': args.threads,
+            'num_texts': len(texts),
+            'num_queries': len(queries),
+            'parity_threshold': PARITY_THRESHOLD
+        },
+        'backends': results,
+        'parity_passed': passed
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        logger.info(f"结果已写入: {args.output}")
+    else:
+        print(output)
+    if not passed:
+        logger.error(f"ONNX 输出与 PyTorch 的余弦相似度低于 {PARITY_THRESHOLD}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+数据摄取分阶段基准测试
+依次单独运行 读取 → 清洗 → 分块 → 去重 → 向量化 → 写入 各阶段，
+输出每个阶段的耗时、吞吐量和进程内存峰值（JSON），便于在不同提交和硬件之间对比。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# 添加src目录到路径
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from config import Config
+from ingest import DataIngestor, DocumentProcessor, discover_sources, is_dedup_target
+from dedup import NearDuplicateIndex
+from pipeline import PaddingStats, batched, length_buckets, ordered_map, sequential_batches
+from vector_index import open_index
+from embeddings import TokenCounter
+from qa_store import QA_FILENAME, LEGACY_QA_FILENAME, find_qa_file, open_qa_store, write_qa_pairs
+
+# 日志输出到 stderr，stdout 只输出 JSON 结果
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def peak_rss_mb() -> Optional[float]:
+    """进程的内存峰值（MB），无法获取时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 为单位，macOS 以字节为单位
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+    except (ImportError, AttributeError):
+        return None
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class StageTimer:
+    """记录各阶段的耗时、处理量和内存峰值"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def run(self, name: str, unit: str, func):
+        """运行一个阶段，func 返回 (结果, 处理数量)"""
+        logger.info(f"阶段开始: {name}")
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        result, items = func()
+        seconds = time.perf_counter() - start
+        rss_after = peak_rss_mb()
+
+        self.stages[name] = {
+            'seconds': round(seconds, 4),
+            'items': items,
+            'unit': unit,
+            'items_per_second': round(items / seconds, 2) if seconds > 0 else None,
+            'peak_rss_mb': round(rss_after, 1) if rss_after is not None else None,
+            'peak_rss_increase_mb': round(rss_after - rss_before, 1) if rss_after is not None else None
+        }
+        logger.info(f"阶段完成: {name}，{items} {unit}，{seconds:.3f} 秒")
+        return result
+
+def build_synthetic_corpus(scale: int, target: Path) -> Dict[str, str]:
+    """把 data/ 中的语料复制 scale 份，返回替换后的 DATA_DIRS
+
+    每个数据目录下建立 copy_0 … copy_{scale-1} 子目录，问答对在同一个 qa_pairs.jsonl 中重复 scale 次。
+    每份副本的首行标注副本编号（代码文件写成注释），保证内容哈希互不相同。
+    """
+    data_dirs = {}
+    for name, dir_path in Config.DATA_DIRS.items():
+        source_dir = Path(dir_path)
+        target_dir = target / name
+        data_dirs[name] = str(target_dir)
+        if not source_dir.exists():
+            continue
+
+        for file_path in source_dir.rglob('*'):
+            if not file_path.is_file() or file_path.suffix.lower() not in Config.SUPPORTED_EXTENSIONS:
+                continue
+            relative = file_path.relative_to(source_dir)
+            content = file_path.read_bytes()
+            for copy in range(scale):
+                copy_path = target_dir / f"copy_{copy}" / relative
+                copy_path.parent.mkdir(parents=True, exist_ok=True)
+                suffix = file_path.suffix.lower()
+                if suffix == '.pdf':
+                    copy_path.write_bytes(content)
+                    continue
+                marker = f"[副本 {copy}]"
+                if suffix == '.py':
+                    marker = '# ' + marker
+                elif suffix in ('.js', '.java', '.cpp', '.c'):
+                    marker = '// ' + marker
+                copy_path.write_bytes(f"{marker}\n".encode('utf-8') + content)
+
+        qa_file = find_qa_file(source_dir)
+        if qa_file:
+            qa_store = open_qa_store(qa_file)
+            scaled = (
+                dict(pair, question=f"{pair.get('question', '')} [副本 {copy}]", answer=f"[副本 {copy}] {pair.get('answer', '')}")
+                for copy in range(scale) for pair in qa_store
+            )
+            target_dir.mkdir(parents=True, exist_ok=True)
+            write_qa_pairs(target_dir / QA_FILENAME, scaled)
+    return data_dirs
+
+def fake_embed(texts: List[str], dim: int) -> List[List[float]]:
+    """跳过模型时使用的固定向量"""
+    return [[0.0] * (dim - 1) + [1.0] for _ in texts]
+
+def run_stages(args, timer: StageTimer, sources: Dict[str, Path], chroma_dir: Path) -> Dict[str, Any]:
+    processor = DocumentProcessor()
+
+    def read():
+        raw, size = [], 0
+        for file_path in sources.values():
+            if file_path.name in (QA_FILENAME, LEGACY_QA_FILENAME):
+                # 问答对在清洗阶段从存储中流式读取
+                raw.append((file_path, open_qa_store(file_path)))
+            else:
+                raw.append((file_path, processor.read_file(str(file_path))))
+            size += file_path.stat().st_size
+        return (raw, size), len(raw)
+
+    raw, size = timer.run('read', 'sources', read)
+
+    def clean():
+        documents = []
+        for file_path, content in raw:
+            if file_path.name in (QA_FILENAME, LEGACY_QA_FILENAME):
+                documents.extend(processor.build_qa_documents(content, file_path))
+            elif content:
+                documents.append(processor.build_document(file_path, content))
+        return documents, len(raw)
+
+    documents = timer.run('clean', 'sources', clean)
+
+    def split():
+        chunks = processor.split_documents(documents)
+        return chunks, len(chunks)
+
+    chunks = timer.run('split', 'chunks', split)
+
+    def dedup():
+        # 只计时并统计近重复块，不过滤，后续阶段处理同样数量的块
+        if Config.DEDUP_THRESHOLD <= 0:
+            return 0, 0
+        index = NearDuplicateIndex(Config.DEDUP_THRESHOLD)
+        duplicates = 0
+        for i, chunk in enumerate(chunks):
+            if not is_dedup_target(chunk.metadata):
+                continue
+            signature = index.signature(chunk.page_content)
+            if index.find(signature):
+                duplicates += 1
+            else:
+                index.add(str(i), signature)
+        return duplicates, len(chunks)
+
+    duplicates = timer.run('dedup', 'chunks', dedup)
+
+    padding = PaddingStats()
+    token_counter = TokenCounter()
+
+    def embed():
+        texts = [chunk.page_content for chunk in chunks]
+        # 与摄取流水线一致：每个窗口内按 token 数分桶；多个向量化进程时同时在途的批次数等于进程数
+        window_size = args.embed_batch_size * max(1, args.bucket_batches)
+        batches = []
+        for start in range(0, len(texts), window_size):
+            window = np.arange(start, min(start + window_size, len(texts)))
+            lengths = token_counter([texts[i] for i in window])
+            if args.bucket_batches > 1:
+                window_batches = length_buckets(lengths, args.embed_batch_size)
+            else:
+                window_batches = sequential_batches(len(window), args.embed_batch_size)
+            padding.add(lengths, args.embed_batch_size, window_batches)
+            batches.extend(window[batch] for batch in window_batches)
+        if args.skip_embed:
+            return fake_embed(texts, args.dim), len(texts)
+
+        def embed_batch(rows):
+            return rows, embeddings.embed_documents([texts[i] for i in rows])
+
+        vectors = [None] * len(texts)
+        for rows, batch_vectors in ordered_map(embed_batch, batches, args.embed_workers):
+            for i, vector in zip(rows, batch_vectors):
+                vectors[i] = vector
+        return vectors, len(texts)
+
+    if not args.skip_embed:
+        from embeddings import create_embeddings
+        logger.info(f"加载向量模型: {Config.EMBEDDING_MODEL}")
+        embeddings = create_embeddings(args.device, batch_size=args.embed_batch_size, workers=args.embed_workers)
+    vectors = timer.run('embed', 'chunks', embed)
+
+    def upsert():
+        index = open_index(chroma_dir)
+        for batch in batched(list(range(len(chunks))), args.upsert_batch_size):
+            index.upsert(
+                [str(i) for i in batch],
+                [vectors[i] for i in batch],
+                [chunks[i].metadata for i in batch],
+                [chunks[i].page_content for i in batch]
+            )
+        index.persist()
+        return None, len(chunks)
+
+    timer.run('upsert', 'chunks', upsert)
+
+    return {
+        'sources': len(sources),
+        'bytes': size,
+        'documents': len(documents),
+        'chunks': len(chunks),
+        'near_duplicates': duplicates,
+        'padding': {
+            'tokens': padding.tokens,
+            'sequential_ratio': round(padding.sequential_ratio, 4),
+            'bucketed_ratio': round(padding.bucketed_ratio, 4)
+        }
+    }
+
+def run_end_to_end(args, chroma_dir: Path) -> Dict[str, Any]:
+    """完整运行一次流水线化的全量摄取，作为各阶段耗时之和的对照"""
+    Config.CHROMA_PERSIST_DIRECTORY = str(chroma_dir)
+    ingestor = DataIngestor(
+        embed_batch_size=args.embed_batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        embed_workers=args.embed_workers
+    )
+    start = time.perf_counter()
+    vector_store = ingestor.ingest_all_data(force_refresh=True)
+    seconds = time.perf_counter() - start
+    count = vector_store.count() if vector_store else 0
+    rss = peak_rss_mb()
+    return {
+        'seconds': round(seconds, 4),
+        'items': count,
+        'unit': 'chunks',
+        'items_per_second': round(count / seconds, 2) if seconds > 0 else None,
+        'peak_rss_mb': round(rss, 1) if rss is not None else None
+    }
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='数据摄取分阶段基准测试')
+    parser.add_argument('--scale', type=int, default=1,
+                      help='语料倍数：1 使用 data/ 原始语料，N>1 时生成 N 份副本的合成语料 (默认: 1)')
+    parser.add_argument('--embed-batch-size', type=int, default=Config.EMBED_BATCH_SIZE,
+                      help=f'向量化批大小 (默认: {Config.EMBED_BATCH_SIZE})')
+    parser.add_argument('--upsert-batch-size', type=int, default=Config.UPSERT_BATCH_SIZE,
+                      help=f'向量库写入批大小 (默认: {Config.UPSERT_BATCH_SIZE})')
+    parser.add_argument('--embed-workers', type=int, default=1,
+                      help='向量化进程数，各绑定一段CPU核并加载一份模型 (默认: 1)')
+    parser.add_argument('--bucket-batches', type=int, default=Config.EMBED_BUCKET_BATCHES,
+                      help='每次取 N 批文本按 token 数分桶，1 表示按原顺序分批 (默认: %(default)s)')
+    parser.add_argument('--device', default='cpu',
+                      help='向量模型运行设备 (默认: cpu)')
+    parser.add_argument('--embedding-cache', action='store_true',
+                      help='启用向量缓存（默认关闭，测量模型本身的吞吐量）')
+    parser.add_argument('--skip-embed', action='store_true',
+                      help='不加载向量模型，用固定向量代替，只测其余阶段')
+    parser.add_argument('--dim', type=int, default=512,
+                      help='--skip-embed 时的向量维度 (默认: 512)')
+    parser.add_argument('--end-to-end', action='store_true',
+                      help='额外运行一次完整的流水线化摄取作为对照')
+    parser.add_argument('--output', help='把 JSON 结果写入文件（默认输出到 stdout）')
+    args = parser.parse_args()
+
+    if not args.embedding_cache:
+        Config.EMBEDDING_CACHE_DIR = ''
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_ingest_'))
+    try:
+        if args.scale > 1:
+            logger.info(f"生成 {args.scale} 倍合成语料: {work_dir / 'corpus'}")
+            Config.DATA_DIRS = build_synthetic_corpus(args.scale, work_dir / 'corpus')
+
+        sources = discover_sources()
+
+        timer = StageTimer()
+        corpus = run_stages(args, timer, sources, work_dir / 'chroma_stages')
+
+        report = {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'cpu_count': os.cpu_count()
+            },
+            'config': {
+                'scale': args.scale,
+                'chunk_size': Config.CHUNK_SIZE,
+                'chunk_overlap': Config.CHUNK_OVERLAP,
+                'embedding_model': None if args.skip_embed else Config.EMBEDDING_MODEL,
+                'device': args.device,
+                'embedding_cache': args.embedding_cache,
+                'embed_batch_size': args.embed_batch_size,
+                'embed_workers': args.embed_workers,
+                'bucket_batches': args.bucket_batches,
+                'upsert_batch_size': args.upsert_batch_size,
+                'vector_backend': Config.VECTOR_BACKEND,
+                'dedup_threshold': Config.DEDUP_THRESHOLD,
+                'qa_group_by_answer': Config.QA_GROUP_BY_ANSWER
+            },
+            'corpus': corpus,
+            'stages': timer.stages,
+            'total_seconds': round(sum(stage['seconds'] for stage in timer.stages.values()), 4)
+        }
+        if args.end_to_end:
+            if args.skip_embed:
+                logger.warning("--skip-embed 时跳过完整摄取对照")
+            else:
+                report['end_to_end'] = run_end_to_end(args, work_dir / 'chroma_end_to_end')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        logger.info(f"结果已写入: {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
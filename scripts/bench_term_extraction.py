@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+术语抽取基准测试
+对比 PDFProcessor 旧版逐个术语表 `kw in text` 扫描与 Aho-Corasick 自动机（TermMatcher）一次扫描的耗时，
+并核对两者结果一致。--extra-terms 向每个术语表追加合成术语，观察耗时随术语数量的变化。
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import string
+import logging
+from pathlib import Path
+
+# 添加src目录到路径
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from term_matcher import TermMatcher
+from pdf_processor import Paper, PDFProcessor
+
+logging.disable(logging.INFO)
+
+TERM_LISTS = ('relevant_keywords', 'venue_keywords', 'concept_terms', 'method_terms', 'metric_terms', 'tech_terms')
+
+class LegacyExtractor:
+    """旧版实现：每个术语表各自扫描一遍文本（逻辑与改动前的 PDFProcessor 相同）"""
+
+    def __init__(self, processor: PDFProcessor):
+        self.p = processor
+
+    def relevance_count(self, paper: Paper) -> int:
+        text = (paper.title + ' ' + paper.abstract).lower()
+        return sum(1 for kw in self.p.relevant_keywords if kw in text)
+
+    def extract_venue(self, text: str) -> str:
+        for keyword in self.p.venue_keywords:
+            if keyword.lower() in text.lower():
+                pattern = rf'(?i){keyword}[^,\.\n]*'
+                match = re.search(pattern, text)
+                if match:
+                    venue = match.group(0).strip()
+                    if len(venue) < 100:
+                        return venue
+        return "Unknown Venue"
+
+    def extract_keywords(self, text: str) -> list:
+        keywords = []
+        keywords_match = re.search(r'(?i)keywords?\s*:?\s*(.*?)(?=\n|\.)', text)
+        if keywords_match:
+            keywords_text = keywords_match.group(1).strip()
+            keywords = [kw.strip() for kw in re.split(r'[,;]', keywords_text) if kw.strip()]
+        if not keywords:
+            for kw in self.p.relevant_keywords:
+                if kw.lower() in text.lower():
+                    keywords.append(kw)
+        return keywords[:10]
+
+    def _scan(self, text: str, terms) -> set:
+        return {term for term in terms if term.lower() in text.lower()}
+
+    def paper_terms(self, paper: Paper):
+        text = paper.title + ' ' + paper.abstract + ' ' + ' '.join(paper.keywords)
+        return (
+            self._scan(text, self.p.concept_terms),
+            self._scan(text, self.p.method_terms),
+            self._scan(paper.title + ' ' + paper.abstract, self.p.metric_terms),
+            self._scan(text, self.p.tech_terms)
+        )
+
+def new_paper_terms(processor: PDFProcessor, paper: Paper):
+    hits = processor._paper_hits(paper)
+    return (
+        set(processor._extract_concepts(paper, hits)),
+        set(processor._extract_methods(paper, hits)),
+        set(processor._extract_metrics(paper, hits)),
+        set(processor._extract_tech_terms(paper, hits))
+    )
+
+def load_corpus(data_dir: Path, scale: int):
+    """论文记录（标题、摘要、关键词）和全文（data/ 中的文本文件，代替 PDF 全文）"""
+    papers_file = data_dir / 'google_scholar_papers' / 'papers.json'
+    with open(papers_file, 'r', encoding='utf-8') as f:
+        papers = [Paper(**record) for record in json.load(f)]
+    texts = [
+        file_path.read_text(encoding='utf-8', errors='ignore')
+        for file_path in sorted(data_dir.rglob('*'))
+        if file_path.is_file() and file_path.suffix.lower() in ('.txt', '.md')
+    ]
+    return papers * scale, texts * scale
+
+def add_extra_terms(processor: PDFProcessor, count: int, seed: int):
+    """向每个术语表追加 count 个合成术语（几乎不会命中），然后重建自动机"""
+    rng = random.Random(seed)
+    for name in TERM_LISTS:
+        extra = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 14))) for _ in range(count)]
+        getattr(processor, name).extend(extra)
+
+def build_matcher(processor: PDFProcessor, use_native: bool) -> TermMatcher:
+    return TermMatcher({
+        'relevant': processor.relevant_keywords,
+        'venue': processor.venue_keywords,
+        'concept': processor.concept_terms,
+        'method': processor.method_terms,
+        'metric': processor.metric_terms,
+        'tech': processor.tech_terms
+    }, use_native=use_native)
+
+def measure(run, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='术语抽取基准测试')
+    parser.add_argument('--data-dir', default=str(project_root / 'data'),
+                      help='语料目录 (默认: data)')
+    parser.add_argument('--scale', type=int, default=1,
+                      help='语料重复倍数 (默认: 1)')
+    parser.add_argument('--extra-terms', type=int, default=0,
+                      help='每个术语表追加的合成术语数 (默认: 0)')
+    parser.add_argument('--repeat', type=int, default=5,
+                      help='重复轮数，取最快一轮 (默认: 5)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    processor = PDFProcessor()
+    if args.extra_terms:
+        add_extra_terms(processor, args.extra_terms, args.seed)
+    legacy = LegacyExtractor(processor)
+    papers, texts = load_corpus(Path(args.data_dir), args.scale)
+    total_terms = sum(len(getattr(processor, name)) for name in TERM_LISTS)
+    text_mb = sum(len(text) for text in texts) / (1024 * 1024)
+    print(f"语料: {len(papers)} 篇论文记录，{len(texts)} 篇全文（{text_mb:.2f} MB），术语 {total_terms} 个")
+
+    backends = [False]
+    try:
+        import ahocorasick  # noqa: F401
+        backends.append(True)
+    except ImportError:
+        print("未安装 pyahocorasick，只测试纯 Python 自动机")
+
+    def run_legacy_papers():
+        for paper in papers:
+            legacy.relevance_count(paper)
+            legacy.paper_terms(paper)
+
+    def run_legacy_texts():
+        for text in texts:
+            legacy.extract_venue(text)
+            legacy.extract_keywords(text)
+
+    def run_new_papers():
+        for paper in papers:
+            processor._relevance_count(paper)
+            new_paper_terms(processor, paper)
+
+    def run_new_texts():
+        for text in texts:
+            hits = processor.term_matcher.find(text, {'venue', 'relevant'})
+            processor._extract_venue(text, hits)
+            processor._extract_keywords(text, hits)
+
+    results = {'legacy': (measure(run_legacy_papers, args.repeat), measure(run_legacy_texts, args.repeat))}
+    for use_native in backends:
+        start = time.perf_counter()
+        processor.term_matcher = build_matcher(processor, use_native)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # 结果核对
+        for paper in papers[:len(papers) // args.scale]:
+            assert legacy.paper_terms(paper) == new_paper_terms(processor, paper), paper.title
+            assert legacy.relevance_count(paper) == processor._relevance_count(paper), paper.title
+        for text in texts[:len(texts) // args.scale]:
+            hits = processor.term_matcher.find(text, {'venue', 'relevant'})
+            assert legacy.extract_venue(text) == processor._extract_venue(text, hits)
+            assert legacy.extract_keywords(text) == processor._extract_keywords(text, hits)
+
+        name = f"automaton_{processor.term_matcher.backend}"
+        results[name] = (measure(run_new_papers, args.repeat), measure(run_new_texts, args.repeat))
+        print(f"{name}: 构建 {build_ms:.1f} ms，结果与旧版一致")
+
+    base_papers, base_texts = results['legacy']
+    print(f"{'':24s} {'论文记录':>12s} {'全文':>12s}")
+    for name, (paper_seconds, text_seconds) in results.items():
+        print(f"{name:24s} {paper_seconds*1000:9.1f} ms {text_seconds*1000:9.1f} ms"
+              f"  {base_papers/paper_seconds:5.2f}x {base_texts/text_seconds:5.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+向量索引检索基准测试
+以精确检索（numpy 后端）的结果为基准，测量近似检索后端在不同参数下的召回率、单次查询延迟、
+构建耗时、磁盘大小和常驻内存，输出 JSON，用于为当前语料选择后端和参数：
+- hnsw:          M / efConstruction / efSearch
+- ivfpq:         nlist / 编码字节数 m / nprobe / rerank
+- int8, float16: rerank
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 添加src目录到路径
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from config import Config
+from vector_index import BACKENDS, HnswIndex, IvfPqIndex, NumpyIndex, QuantizedIndex, VectorIndex, index_backend, normalize_rows
+from pipeline import batched
+from bench_ingest import git_commit, peak_rss_mb
+import index_store
+from qa_store import find_qa_file, open_qa_store
+
+# 日志输出到 stderr，stdout 只输出 JSON 结果
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 问答对不足时补充的查询
+DEFAULT_QUERIES = [
+    "什么是代码克隆检测?",
+    "AST方法和Token方法的区别",
+    "如何评估克隆检测工具",
+    "Type-1 Type-2 Type-3克隆",
+    "二进制代码克隆检测",
+    "基于深度学习的代码相似性检测"
+]
+
+def load_corpus(args) -> np.ndarray:
+    """语料向量：当前生效版本（或 --index-dir）中的全部向量，或 --synthetic 生成的聚簇向量"""
+    if args.synthetic:
+        rng = np.random.default_rng(args.seed)
+        centers = rng.standard_normal((max(1, args.synthetic // 100), args.dim))
+        labels = rng.integers(0, len(centers), args.synthetic)
+        return normalize_rows(centers[labels] + 0.5 * rng.standard_normal((args.synthetic, args.dim)))
+
+    index_dir = Path(args.index_dir) if args.index_dir else index_store.active_index_dir()
+    backend = index_backend(index_dir)
+    if backend not in BACKENDS:
+        logger.error(f"{index_dir} 使用 {backend} 后端，请先用新版本重建索引（fast_ingest.py --force）")
+        sys.exit(1)
+    _, vectors = BACKENDS[backend](index_dir, read_only=True).live_vectors()
+    logger.info(f"从 {index_dir} 读取 {len(vectors)} 个向量")
+    return vectors
+
+def collect_questions(limit: int, seed: int) -> List[str]:
+    """从各数据目录的问答对中抽取问题作为查询"""
+    questions = list(DEFAULT_QUERIES)
+    for dir_path in Config.DATA_DIRS.values():
+        qa_file = find_qa_file(Path(dir_path))
+        if qa_file:
+            questions.extend(pair.get('question', '') for pair in open_qa_store(qa_file))
+    questions = list(dict.fromkeys(q for q in questions if q))
+    random.Random(seed).shuffle(questions)
+    return questions[:limit]
+
+def load_queries(args, corpus: np.ndarray) -> np.ndarray:
+    """查询向量：默认用向量模型编码项目中的问题；--skip-embed 或合成语料时从语料中抽样并加噪声"""
+    if args.synthetic or args.skip_embed:
+        rng = np.random.default_rng(args.seed + 1)
+        rows = rng.choice(len(corpus), args.num_queries, replace=len(corpus) < args.num_queries)
+        return normalize_rows(corpus[rows] + args.noise * rng.standard_normal((len(rows), corpus.shape[1])))
+
+    from embeddings import create_embeddings
+    questions = collect_questions(args.num_queries, args.seed)
+    logger.info(f"加载向量模型并编码 {len(questions)} 个查询: {Config.EMBEDDING_MODEL}")
+    embeddings = create_embeddings(args.device, read_only_cache=True)
+    return normalize_rows(np.asarray(embeddings.embed_documents(questions), dtype=np.float32))
+
+def build(index: VectorIndex, vectors: np.ndarray, batch_size: int) -> float:
+    """写入全部向量（文本为行号，用于核对检索结果），返回耗时"""
+    start = time.perf_counter()
+    for rows in batched(list(range(len(vectors))), batch_size):
+        ids = [str(row) for row in rows]
+        index.upsert(ids, vectors[rows[0]:rows[-1] + 1], [{}] * len(ids), ids)
+    index.persist()
+    return time.perf_counter() - start
+
+def dir_size_mb(path: Path) -> float:
+    return round(sum(f.stat().st_size for f in path.iterdir() if f.is_file()) / 1024 / 1024, 2)
+
+def index_sizes(index: NumpyIndex) -> Dict[str, float]:
+    return {'index_mb': dir_size_mb(index.dir), 'resident_mb': round(index.resident_bytes() / 1024 / 1024, 2)}
+
+def measure(index: VectorIndex, queries: np.ndarray, k: int, truth: Optional[List[List[str]]] = None) -> Tuple[Dict[str, Any], List[List[str]]]:
+    """逐条查询，统计延迟分位数；给定基准结果时计算 recall@k"""
+    index.search(queries[0], k)  # 预热
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([doc.page_content for doc, _ in hits])
+
+    stats = {
+        'latency_ms': {
+            'mean': round(float(np.mean(latencies)), 4),
+            'p50': round(float(np.percentile(latencies, 50)), 4),
+            'p95': round(float(np.percentile(latencies, 95)), 4)
+        }
+    }
+    if truth is not None:
+        recalls = [len(set(found) & set(expected)) / len(expected) for found, expected in zip(results, truth) if expected]
+        stats['recall'] = round(float(np.mean(recalls)), 4) if recalls else None
+    return stats, results
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='向量索引检索基准测试（召回率 vs 延迟）')
+    parser.add_argument('--index-dir', help='读取语料向量的索引目录 (默认: 当前生效的版本)')
+    parser.add_argument('--synthetic', type=int, default=0,
+                      help='不读取索引，生成 N 个聚簇的合成向量')
+    parser.add_argument('--dim', type=int, default=512,
+                      help='合成向量的维度 (默认: 512)')
+    parser.add_argument('--num-queries', type=int, default=200,
+                      help='查询数量 (默认: 200)')
+    parser.add_argument('--skip-embed', action='store_true',
+                      help='不加载向量模型，从语料中抽样加噪声作为查询')
+    parser.add_argument('--noise', type=float, default=0.05,
+                      help='抽样查询的噪声幅度 (默认: 0.05)')
+    parser.add_argument('--device', default='cpu',
+                      help='向量模型运行设备 (默认: cpu)')
+    parser.add_argument('-k', type=int, default=Config.TOP_K_RETRIEVAL,
+                      help=f'每个查询返回的结果数 (默认: {Config.TOP_K_RETRIEVAL})')
+    parser.add_argument('--m', type=int, nargs='+', default=[Config.HNSW_M],
+                      help=f'HNSW 的 M，可给多个 (默认: {Config.HNSW_M})')
+    parser.add_argument('--ef-construction', type=int, nargs='+', default=[Config.HNSW_EF_CONSTRUCTION],
+                      help=f'HNSW 的 efConstruction，可给多个 (默认: {Config.HNSW_EF_CONSTRUCTION})')
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[16, 32, 64, 128, 256],
+                      help='HNSW 的 efSearch，可给多个 (默认: 16 32 64 128 256)')
+    parser.add_argument('--nlist', type=int, nargs='+', default=[Config.IVFPQ_NLIST],
+                      help=f'IVF-PQ 的倒排列表数，0 为自动，可给多个 (默认: {Config.IVFPQ_NLIST})')
+    parser.add_argument('--pq-m', type=int, nargs='+', default=[Config.IVFPQ_M],
+                      help=f'IVF-PQ 每个向量的编码字节数，可给多个 (默认: {Config.IVFPQ_M})')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32, 64],
+                      help='IVF-PQ 检索时扫描的列表数，可给多个 (默认: 4 8 16 32 64)')
+    parser.add_argument('--rerank', type=int, nargs='+',
+                      help=f'IVF-PQ / 量化后端精确重排的候选数，可给多个 '
+                           f'(默认: IVF-PQ {Config.IVFPQ_RERANK}，量化 {Config.QUANTIZED_RERANK})')
+    parser.add_argument('--backends', nargs='+', default=['hnsw', 'ivfpq', 'int8', 'float16'],
+                      choices=['hnsw', 'ivfpq', 'int8', 'float16'],
+                      help='要测试的后端 (默认: 全部)')
+    parser.add_argument('--batch-size', type=int, default=10000,
+                      help='构建索引时的写入批大小 (默认: 10000)')
+    parser.add_argument('--seed', type=int, default=0,
+                      help='随机种子 (默认: 0)')
+    parser.add_argument('--output', help='把 JSON 结果写入文件（默认输出到 stdout）')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    if not len(corpus):
+        logger.error("索引中没有向量，请先运行数据摄取")
+        sys.exit(1)
+    queries = load_queries(args, corpus)
+
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_vector_index_'))
+    try:
+        logger.info("构建精确检索基准")
+        exact = NumpyIndex(work_dir / 'exact')
+        exact_report = dict({'build_seconds': round(build(exact, corpus, args.batch_size), 4)}, **index_sizes(exact))
+        stats, truth = measure(exact, queries, args.k)
+        exact_report.update(stats)
+
+        hnsw_reports = []
+        for m in (args.m if 'hnsw' in args.backends else []):
+            for ef_construction in args.ef_construction:
+                logger.info(f"构建 HNSW: M={m}, efConstruction={ef_construction}")
+                index = HnswIndex(work_dir / f'hnsw_m{m}_efc{ef_construction}', m=m, ef_construction=ef_construction)
+                build_seconds = build(index, corpus, args.batch_size)
+                for ef_search in args.ef_search:
+                    index.set_ef_search(ef_search)
+                    stats, _ = measure(index, queries, args.k, truth)
+                    logger.info(f"  efSearch={ef_search}: recall={stats['recall']}, p50={stats['latency_ms']['p50']} ms")
+                    hnsw_reports.append(dict(
+                        {'m': m, 'ef_construction': ef_construction, 'ef_search': ef_search,
+                         'build_seconds': round(build_seconds, 4)},
+                        **index_sizes(index), **stats
+                    ))
+
+        ivfpq_reports = []
+        for nlist in (args.nlist if 'ivfpq' in args.backends else []):
+            for pq_m in args.pq_m:
+                logger.info(f"构建 IVF-PQ: nlist={nlist or '自动'}, m={pq_m}")
+                # 基准测试总是训练码本，不受 IVFPQ_MIN_TRAIN_ROWS 限制
+                index = IvfPqIndex(work_dir / f'ivfpq_n{nlist}_m{pq_m}', nlist=nlist, m=pq_m, min_train_rows=0)
+                build_seconds = build(index, corpus, args.batch_size)
+                for rerank in args.rerank or [Config.IVFPQ_RERANK]:
+                    for nprobe in args.nprobe:
+                        index.nprobe, index.rerank = nprobe, rerank
+                        stats, _ = measure(index, queries, args.k, truth)
+                        logger.info(f"  nprobe={nprobe}, rerank={rerank}: recall={stats['recall']}, p50={stats['latency_ms']['p50']} ms")
+                        ivfpq_reports.append(dict(
+                            {'nlist': len(index._centroids), 'm': index._codebooks.shape[0], 'nprobe': nprobe,
+                             'rerank': rerank, 'build_seconds': round(build_seconds, 4)},
+                            **index_sizes(index), **stats
+                        ))
+
+        quantized_reports = []
+        for quantization in [b for b in args.backends if b in ('int8', 'float16')]:
+            logger.info(f"构建 {quantization} 量化索引")
+            index = QuantizedIndex(work_dir / quantization, quantization=quantization)
+            build_seconds = build(index, corpus, args.batch_size)
+            for rerank in args.rerank or [Config.QUANTIZED_RERANK]:
+                index.rerank = rerank
+                stats, _ = measure(index, queries, args.k, truth)
+                logger.info(f"  rerank={rerank}: recall={stats['recall']}, p50={stats['latency_ms']['p50']} ms")
+                quantized_reports.append(dict(
+                    {'quantization': quantization, 'rerank': rerank, 'build_seconds': round(build_seconds, 4)},
+                    **index_sizes(index), **stats
+                ))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    rss = peak_rss_mb()
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'k': args.k,
+            'queries': len(queries),
+            'query_source': 'corpus_sample' if args.synthetic or args.skip_embed else 'qa_questions',
+            'embedding_model': None if args.synthetic or args.skip_embed else Config.EMBEDDING_MODEL
+        },
+        'corpus': {
+            'vectors': int(len(corpus)),
+            'dim': int(corpus.shape[1]),
+            'synthetic': bool(args.synthetic)
+        },
+        'exact': exact_report,
+        'hnsw': hnsw_reports,
+        'ivfpq': ivfpq_reports,
+        'quantized': quantized_reports,
+        'peak_rss_mb': round(rss, 1) if rss is not None else None
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        logger.info(f"结果已写入: {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+问答对格式转换工具
+把旧版的 qa_pairs.json（整体 JSON 数组）转换为 qa_pairs.jsonl + 偏移索引（src/qa_store.py），
+转换后逐条核对内容一致。
+"""
+
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+
+# 添加src目录到路径
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from qa_store import LEGACY_QA_FILENAME, QA_FILENAME, QAStore, convert_json
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def convert(json_file: Path, remove_source: bool) -> bool:
+    """转换一个文件并核对，返回是否成功"""
+    qa_file = json_file.with_name(QA_FILENAME)
+    count = convert_json(json_file, qa_file)
+    with open(json_file, 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    store = QAStore(qa_file)
+    if len(store) != len(expected) or any(a != b for a, b in zip(store, expected)):
+        logger.error(f"核对失败: {qa_file} 与 {json_file} 内容不一致")
+        return False
+
+    old_size, new_size = json_file.stat().st_size, qa_file.stat().st_size
+    logger.info(f"{json_file} -> {qa_file}: {count} 个问答对，{old_size / 1024:.0f} KB -> {new_size / 1024:.0f} KB")
+    for qa_type, type_count in store.type_counts().items():
+        logger.info(f"  {qa_type}: {type_count}")
+    if remove_source:
+        json_file.unlink()
+        logger.info(f"已删除 {json_file}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='把 qa_pairs.json 转换为带偏移索引的 qa_pairs.jsonl')
+    parser.add_argument('paths', nargs='*', default=[str(project_root / 'data')],
+                        help='qa_pairs.json 文件或包含它的目录（递归查找，默认: data）')
+    parser.add_argument('--remove-source', action='store_true', help='转换并核对成功后删除原 JSON 文件')
+    args = parser.parse_args()
+
+    json_files = []
+    for path in map(Path, args.paths):
+        if path.is_dir():
+            json_files.extend(sorted(path.rglob(LEGACY_QA_FILENAME)))
+        elif path.exists():
+            json_files.append(path)
+        else:
+            logger.error(f"路径不存在: {path}")
+            sys.exit(1)
+    if not json_files:
+        logger.info("没有需要转换的 qa_pairs.json")
+        return
+
+    failed = [json_file for json_file in json_files if not convert(json_file, args.remove_source)]
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
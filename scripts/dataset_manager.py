@@ -14,6 +14,11 @@ from datetime import datetime
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+import sys
+
+# 添加src目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from qa_store import find_qa_files, open_qa_store
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -108,42 +113,42 @@ class DatasetValidator:
         return papers
     
     def _validate_qa_pairs(self) -> Dict:
-        """验证问答对数据"""
-        qa_files = list(self.data_dir.rglob('*qa*.json'))
+        """验证问答对数据（通过 QAStore 逐条流式读取，只统计数量和各类型数量，不保留问答对本身）"""
+        qa_files = find_qa_files(self.data_dir)
         if not qa_files:
             return {'status': 'missing', 'count': 0, 'errors': []}
         
-        qa_pairs = []
+        valid_count = 0
+        type_counts: Dict[str, int] = {}
         errors = []
         
         for qa_file in qa_files:
             try:
-                with open(qa_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                if isinstance(data, list):
-                    for i, pair in enumerate(data):
-                        if not isinstance(pair, dict):
-                            errors.append(f"无效格式 {qa_file}:{i}")
-                            continue
-                        
-                        question = pair.get('question', '')
-                        answer = pair.get('answer', '')
-                        
-                        if len(question) < 10 or len(answer) < 20:
-                            errors.append(f"问答过短 {qa_file}:{i}")
-                            continue
-                        
-                        qa_pairs.append(pair)
+                qa_store = open_qa_store(qa_file)
+                for i, pair in enumerate(qa_store):
+                    if not isinstance(pair, dict):
+                        errors.append(f"无效格式 {qa_file}:{i}")
+                        continue
+                    
+                    question = pair.get('question', '')
+                    answer = pair.get('answer', '')
+                    
+                    if len(question) < 10 or len(answer) < 20:
+                        errors.append(f"问答过短 {qa_file}:{i}")
+                        continue
+                    
+                    valid_count += 1
+                for qa_type, count in qa_store.type_counts().items():
+                    type_counts[qa_type] = type_counts.get(qa_type, 0) + count
                 
             except Exception as e:
                 errors.append(f"读取失败 {qa_file}: {e}")
         
         return {
             'status': 'valid' if not errors else 'warnings',
-            'count': len(qa_pairs),
+            'count': valid_count,
             'errors': errors,
-            'qa_pairs': qa_pairs
+            'types': type_counts
         }
     
     def _validate_tools_docs(self) -> Dict:
@@ -381,25 +386,12 @@ class DatasetAnalyzer:
         return total_size / len(documents)
     
     def _count_qa_pairs(self) -> int:
-        """统计问答对数量"""
+        """统计问答对数量（读取偏移索引，不解析问答对）"""
         qa_count = 0
         
-        # 搜索所有问答对文件
-        qa_files = []
-        qa_files.extend(self.data_dir.rglob('*qa*.json'))
-        
-        # 特别搜索处理后的论文目录
-        processed_dir = self.data_dir / 'google_scholar_papers'
-        if processed_dir.exists():
-            qa_files.extend(processed_dir.rglob('qa_pairs.json'))
-        
-        for file_path in qa_files:
+        for file_path in find_qa_files(self.data_dir):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                if isinstance(data, list):
-                    qa_count += len(data)
+                qa_count += len(open_qa_store(file_path))
             except Exception as e:
                 logger.warning(f"无法统计问答对 {file_path}: {e}")
         
@@ -8,13 +8,14 @@ import sys
 import os
 from pathlib import Path
 
-# 添加项目根目录到路径
+# 添加src目录到路径（与 app.py 一致，保证这里修改的 Config 就是摄取模块使用的 Config）
 script_dir = Path(__file__).parent
 project_root = script_dir.parent
-sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / "src"))
 
-from src.ingest import DataIngestor
-from src.config import Config
+from ingest import DataIngestor
+from config import Config
+import index_store
 
 def main():
     """主函数"""
@@ -22,29 +23,53 @@ def main():
     
     parser = argparse.ArgumentParser(description='快速数据摄取工具')
     parser.add_argument('--force', action='store_true', 
-                      help='强制重新摄取所有数据')
-    parser.add_argument('--batch-size', type=int, default=100,
-                      help='批量处理大小 (默认: 100)')
-    parser.add_argument('--chunk-size', type=int, default=2000,
-                      help='文档分块大小 (默认: 2000)')
-    parser.add_argument('--chunk-overlap', type=int, default=100,
-                      help='分块重叠大小 (默认: 100)')
+                      help='强制重新摄取所有数据（在新版本目录中重建，校验通过后切换）')
+    parser.add_argument('--rollback', action='store_true',
+                      help='切换回上一个索引版本后退出')
+    parser.add_argument('--embed-batch-size', '--batch-size', type=int, default=Config.EMBED_BATCH_SIZE,
+                      help=f'向量化批大小，即模型单次前向的文本数 (默认: {Config.EMBED_BATCH_SIZE})')
+    parser.add_argument('--upsert-batch-size', type=int, default=Config.UPSERT_BATCH_SIZE,
+                      help=f'向量库写入批大小 (默认: {Config.UPSERT_BATCH_SIZE})')
+    parser.add_argument('--adaptive-batch', action='store_true', default=Config.ADAPTIVE_BATCH,
+                      help=f'根据实测吞吐量自动调大向量化批大小 (上限: {Config.EMBED_BATCH_SIZE_MAX})')
+    parser.add_argument('--embed-workers', type=int, default=Config.EMBED_WORKERS,
+                      help='向量化进程数，各绑定一段CPU核并加载一份模型，1 表示在当前进程内计算 (默认: %(default)s)')
+    parser.add_argument('--workers', type=int, default=Config.LOAD_WORKERS,
+                      help='文档加载进程数，0 表示使用全部CPU核 (默认: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=Config.CHUNK_SIZE,
+                      help='文档分块大小 (默认: %(default)s)')
+    parser.add_argument('--chunk-overlap', type=int, default=Config.CHUNK_OVERLAP,
+                      help='分块重叠大小 (默认: %(default)s)')
     
     args = parser.parse_args()
     
+    if args.rollback:
+        version = index_store.rollback()
+        print(f"✅ 已回滚到索引版本: {version}" if version else "❌ 没有可回滚的旧版本")
+        return
+    
     # 更新配置
     Config.CHUNK_SIZE = args.chunk_size
     Config.CHUNK_OVERLAP = args.chunk_overlap
+    Config.LOAD_WORKERS = args.workers
     
     print("=== 快速数据摄取工具 ===")
     print(f"分块大小: {Config.CHUNK_SIZE}")
     print(f"分块重叠: {Config.CHUNK_OVERLAP}")
-    print(f"批量大小: {args.batch_size}")
+    print(f"向量化批大小: {args.embed_batch_size}{'（自适应）' if args.adaptive_batch else ''}")
+    print(f"写入批大小: {args.upsert_batch_size}")
+    print(f"向量化进程数: {args.embed_workers or os.cpu_count()}")
+    print(f"加载进程数: {Config.LOAD_WORKERS or os.cpu_count()}")
     print(f"强制重新摄取: {args.force}")
     print()
     
     # 创建数据摄取器
-    ingestor = DataIngestor()
+    ingestor = DataIngestor(
+        embed_batch_size=args.embed_batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        adaptive_batch=args.adaptive_batch,
+        embed_workers=args.embed_workers
+    )
     
     try:
         # 执行数据摄取
@@ -53,12 +78,11 @@ def main():
         if vector_store:
             print("\n=== 摄取完成 ===")
             print("✅ 数据摄取成功完成")
-            print(f"📁 数据库位置: {Config.CHROMA_PERSIST_DIRECTORY}")
+            print(f"📁 数据库位置: {index_store.active_index_dir()}")
             
             # 显示统计信息
             try:
-                collection = vector_store._collection
-                count = collection.count()
+                count = vector_store.count()
                 print(f"📊 向量数量: {count}")
             except:
                 print("📊 无法获取向量数量")
@@ -7,23 +7,34 @@ PDF论文处理工具 - 处理从Google Scholar下载的PDF论文
 import json
 import os
 import re
+import itertools
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from typing import List, Dict, Iterator, Optional, Tuple
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 import logging
 from datetime import datetime
-import PyPDF2
-from PyPDF2 import PdfReader
-import pdfplumber
 import requests
 import argparse
 from bs4 import BeautifulSoup
 import time
+import sys
+
+# 添加src目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from pdf_extract import extract_pdf_text
+from qa_store import QA_FILENAME, write_qa_pairs
+from term_matcher import TermHit, TermMatcher, first_hits
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 断点文件：每处理完一个PDF追加一行，中断后重新运行时跳过已记录且未变化的文件
+CHECKPOINT_FILENAME = 'papers.checkpoint.jsonl'
+# 会议/期刊名：关键词之后到下一个逗号、句号或换行之前的部分
+_VENUE_TAIL = re.compile(r'[^,\.\n]*')
+
 @dataclass
 class Paper:
     """论文数据结构"""
@@ -221,92 +232,126 @@ class PDFProcessor:
             'IEEE', 'ACM', 'Springer', 'Elsevier', 'ArXiv', 'Journal', 'Conference',
             'Workshop', 'Symposium', 'Proceedings'
         ]
+        
+        # 概念、方法/工具、评估指标和技术术语
+        self.concept_terms = [
+            'code clone', 'clone detection', 'software similarity',
+            'program analysis', 'AST', 'abstract syntax tree',
+            'token-based', 'tree-based', 'semantic similarity',
+            'software plagiarism', 'code duplication',
+            'software maintenance', 'code quality', 'software engineering'
+        ]
+        
+        self.method_terms = [
+            'CCFinder', 'NiCad', 'Deckard', 'MOSS', 'JPlag',
+            'Simian', 'CloneDR', 'SourcererCC', 'CodeClone',
+            'PDG', 'program dependence graph', 'AST-based',
+            'token-based', 'tree-based', 'semantic-based',
+            'machine learning', 'deep learning', 'neural network',
+            'graph-based', 'hash-based', 'metric-based'
+        ]
+        
+        self.metric_terms = [
+            'precision', 'recall', 'F1-score', 'accuracy',
+            'false positive', 'false negative', 'true positive',
+            'true negative', 'ROC curve', 'AUC', 'precision-recall',
+            'similarity score', 'matching score', 'detection rate'
+        ]
+        
+        self.tech_terms = [
+            'algorithm', 'complexity', 'scalability', 'performance', 'accuracy',
+            'precision', 'recall', 'f1-score', 'roc', 'auc', 'false positive',
+            'false negative', 'true positive', 'true negative', 'confusion matrix',
+            'cross-validation', 'benchmark', 'dataset', 'training', 'testing',
+            'validation', 'overfitting', 'underfitting', 'regularization',
+            'optimization', 'heuristic', 'metaheuristic', 'genetic algorithm',
+            'neural network', 'deep learning', 'machine learning', 'artificial intelligence',
+            'natural language processing', 'computer vision', 'data mining',
+            'big data', 'cloud computing', 'distributed computing', 'parallel computing',
+            'software engineering', 'software development', 'software maintenance',
+            'software quality', 'software testing', 'software debugging',
+            'version control', 'git', 'github', 'gitlab', 'bitbucket',
+            'continuous integration', 'continuous deployment', 'devops',
+            'agile', 'scrum', 'kanban', 'waterfall', 'extreme programming',
+            'code review', 'peer review', 'static analysis', 'dynamic analysis',
+            'unit testing', 'integration testing', 'system testing', 'acceptance testing',
+            'refactoring', 'technical debt', 'code smell', 'design pattern',
+            'architecture', 'microservices', 'monolith', 'service-oriented architecture',
+            'container', 'docker', 'kubernetes', 'orchestration', 'deployment',
+            'monitoring', 'logging', 'alerting', 'observability', 'tracing'
+        ]
+        
+        # 全部术语表编译成一个多模式自动机，每段文本只扫描一次
+        self.term_matcher = TermMatcher({
+            'relevant': self.relevant_keywords,
+            'venue': self.venue_keywords,
+            'concept': self.concept_terms,
+            'method': self.method_terms,
+            'metric': self.metric_terms,
+            'tech': self.tech_terms
+        })
     
     def extract_pdf_text(self, pdf_path: str) -> str:
-        """提取PDF文本内容"""
-        text = ""
-        
+        """提取PDF文本内容（按页并行，PyPDF2 提取不到文本的页逐页改用 pdfplumber）"""
         try:
-            # 首先尝试使用PyPDF2
-            with open(pdf_path, 'rb') as file:
-                reader = PdfReader(file)
-                for page in reader.pages:
-                    try:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                    except Exception as e:
-                        logger.warning(f"PyPDF2读取页面失败: {e}")
-                        continue
-            
-            # 如果PyPDF2效果不好，尝试pdfplumber
-            if len(text.strip()) < 500:
-                text = ""
-                try:
-                    with pdfplumber.open(pdf_path) as pdf:
-                        for page in pdf.pages:
-                            try:
-                                page_text = page.extract_text()
-                                if page_text:
-                                    text += page_text + "\n"
-                            except Exception as e:
-                                logger.warning(f"pdfplumber读取页面失败: {e}")
-                                continue
-                except Exception as e:
-                    logger.warning(f"pdfplumber失败: {e}")
-            
+            return extract_pdf_text(pdf_path, skip_empty=True)
         except Exception as e:
             logger.error(f"PDF文本提取失败 {pdf_path}: {e}")
-        
-        return text
+            return ""
     
     def extract_paper_info(self, pdf_path: str) -> Optional[Paper]:
         """从PDF提取论文信息"""
         try:
-            # 提取文本
-            text = self.extract_pdf_text(pdf_path)
-            
-            if not text or len(text.strip()) < 500:
-                logger.warning(f"PDF文本内容过短: {pdf_path}")
-                return None
-            
-            # 提取标题
-            title = self._extract_title(text, pdf_path)
-            
-            # 提取作者
-            authors = self._extract_authors(text)
-            
-            # 提取摘要
-            abstract = self._extract_abstract(text)
-            
-            # 提取年份
-            year = self._extract_year(text, pdf_path)
-            
-            # 提取会议/期刊
-            venue = self._extract_venue(text)
-            
-            # 提取关键词
-            keywords = self._extract_keywords(text)
-            
-            # 构建URL（基于文件名）
-            url = self._generate_url(pdf_path)
-            
-            paper = Paper(
-                title=title,
-                authors=authors,
-                abstract=abstract,
-                year=year,
-                venue=venue,
-                url=url,
-                keywords=keywords
-            )
-            
-            return paper
-            
+            return self._extract_paper_info(pdf_path)
         except Exception as e:
             logger.error(f"提取论文信息失败 {pdf_path}: {e}")
             return None
     
+    def _extract_paper_info(self, pdf_path: str) -> Optional[Paper]:
+        """从PDF提取论文信息，出错时抛出异常（供 process_pdfs 区分出错和文本过短）"""
+        # 提取文本
+        text = extract_pdf_text(pdf_path, skip_empty=True)
+        
+        if not text or len(text.strip()) < 500:
+            logger.warning(f"PDF文本内容过短: {pdf_path}")
+            return None
+        
+        # 提取标题
+        title = self._extract_title(text, pdf_path)
+        
+        # 提取作者
+        authors = self._extract_authors(text)
+        
+        # 提取摘要
+        abstract = self._extract_abstract(text)
+        
+        # 提取年份
+        year = self._extract_year(text, pdf_path)
+        
+        # 会议/期刊名和备选关键词共用一次全文扫描
+        hits = self.term_matcher.find(text, {'venue', 'relevant'})
+        
+        # 提取会议/期刊
+        venue = self._extract_venue(text, hits)
+        
+        # 提取关键词
+        keywords = self._extract_keywords(text, hits)
+        
+        # 构建URL（基于文件名）
+        url = self._generate_url(pdf_path)
+        
+        paper = Paper(
+            title=title,
+            authors=authors,
+            abstract=abstract,
+            year=year,
+            venue=venue,
+            url=url,
+            keywords=keywords
+        )
+        
+        return paper
+    
     def _extract_title(self, text: str, pdf_path: str) -> str:
         """提取标题"""
         lines = text.split('\n')
@@ -422,22 +467,24 @@ class PDFProcessor:
         
         return 2023  # 默认年份
     
-    def _extract_venue(self, text: str) -> str:
+    def _extract_venue(self, text: str, hits: List[TermHit] = None) -> str:
         """提取会议/期刊"""
-        # 查找会议/期刊关键词
+        if hits is None:
+            hits = self.term_matcher.find(text, {'venue'})
+        found = first_hits(hits, 'venue')
+        # 按关键词表的顺序，取关键词首次出现处到下一个逗号、句号或换行之间的文字
         for keyword in self.venue_keywords:
-            if keyword.lower() in text.lower():
-                # 尝试提取更完整的会议名称
-                pattern = rf'(?i){keyword}[^,\.\n]*'
-                match = re.search(pattern, text)
-                if match:
-                    venue = match.group(0).strip()
-                    if len(venue) < 100:
-                        return venue
+            start = found.get(keyword)
+            if start is None:
+                continue
+            end = _VENUE_TAIL.match(text, start + len(keyword)).end()
+            venue = text[start:end].strip()
+            if len(venue) < 100:
+                return venue
         
         return "Unknown Venue"
     
-    def _extract_keywords(self, text: str) -> List[str]:
+    def _extract_keywords(self, text: str, hits: List[TermHit] = None) -> List[str]:
         """提取关键词"""
         keywords = []
         
@@ -450,9 +497,10 @@ class PDFProcessor:
         
         # 如果没找到，从相关关键词中提取
         if not keywords:
-            for kw in self.relevant_keywords:
-                if kw.lower() in text.lower():
-                    keywords.append(kw)
+            if hits is None:
+                hits = self.term_matcher.find(text, {'relevant'})
+            found = first_hits(hits, 'relevant')
+            keywords = [kw for kw in self.relevant_keywords if kw in found]
         
         return keywords[:10]  # 最多返回10个关键词
     
@@ -480,206 +528,125 @@ class PDFProcessor:
             return False
         
         # 相关性检查
-        text = (paper.title + ' ' + paper.abstract).lower()
-        keyword_count = sum(1 for kw in self.relevant_keywords if kw in text)
+        return self._relevance_count(paper) >= 2
+    
+    def _relevance_count(self, paper: Paper) -> int:
+        """标题和摘要中出现的相关关键词数
         
-        return keyword_count >= 2
+        与小写后的文本比较，含大写字母的术语（如 'AST'）不计入；列表中重复的术语按出现次数计。
+        """
+        found = first_hits(self.term_matcher.find(paper.title + ' ' + paper.abstract, {'relevant'}), 'relevant')
+        return sum(1 for kw in self.relevant_keywords if kw in found and kw == kw.lower())
     
     def generate_qa_pairs(self, papers: List[Paper]) -> List[Dict]:
-        """生成问答对 - 大幅增强以支持5000+问答对"""
-        qa_pairs = []
+        """生成问答对列表（全部保存在内存中，大批量生成请使用 iter_qa_pairs）"""
+        return list(self.iter_qa_pairs(papers))
+    
+    def iter_qa_pairs(self, papers: List[Paper], max_per_category: int = None,
+                      max_per_paper: int = None) -> Iterator[Dict]:
+        """逐个生成问答对
         
+        max_per_category 限制每篇论文每种问答类型的数量（比较问答随方法数平方增长），
+        max_per_paper 限制每篇论文的总数；不设上限时与原先一次性生成的结果和顺序相同。
+        """
         for paper in papers:
-            # 提取关键概念
-            concepts = self._extract_concepts(paper)
-            
-            # 提取方法/工具
-            methods = self._extract_methods(paper)
-            
-            # 提取评估指标
-            metrics = self._extract_metrics(paper)
-            
-            # 提取技术术语
-            tech_terms = self._extract_tech_terms(paper)
-            
-            # 生成概念问答 (20个模板)
-            for concept in concepts:
-                for template in self.qa_templates['concept']:
-                    question = template.format(concept=concept)
-                    answer = self._generate_concept_answer(paper, concept)
-                    qa_pairs.append({
-                        'question': question,
-                        'answer': answer,
-                        'source': paper.title,
-                        'type': 'concept',
-                        'year': paper.year,
-                        'venue': paper.venue
-                    })
-            
-            # 生成比较问答 (20个模板)
-            if len(methods) >= 2:
-                for i in range(len(methods)):
-                    for j in range(i+1, len(methods)):
-                        method1, method2 = methods[i], methods[j]
-                        for template in self.qa_templates['comparison']:
-                            question = template.format(method1=method1, method2=method2)
-                            answer = self._generate_comparison_answer(paper, method1, method2)
-                            qa_pairs.append({
-                                'question': question,
-                                'answer': answer,
-                                'source': paper.title,
-                                'type': 'comparison',
-                                'year': paper.year,
-                                'venue': paper.venue
-                            })
-            
-            # 生成应用问答 (20个模板)
-            for method in methods:
-                for template in self.qa_templates['application']:
-                    question = template.format(method=method, task="代码克隆检测")
-                    answer = self._generate_application_answer(paper, method)
-                    qa_pairs.append({
-                        'question': question,
-                        'answer': answer,
-                        'source': paper.title,
-                        'type': 'application',
-                        'year': paper.year,
-                        'venue': paper.venue
-                    })
-            
-            # 生成评估问答 (20个模板)
-            for method in methods:
-                for metric in metrics:
-                    for template in self.qa_templates['evaluation']:
-                        question = template.format(method=method)
-                        answer = self._generate_evaluation_answer(paper, method, metric)
-                        qa_pairs.append({
-                            'question': question,
-                            'answer': answer,
-                            'source': paper.title,
-                            'type': 'evaluation',
-                            'year': paper.year,
-                            'venue': paper.venue
-                        })
-            
-            # 生成技术问答 (20个模板)
-            for method in methods:
-                for template in self.qa_templates['technique']:
-                    question = template.format(method=method)
-                    answer = self._generate_technique_answer(paper, method)
-                    qa_pairs.append({
-                        'question': question,
-                        'answer': answer,
-                        'source': paper.title,
-                        'type': 'technique',
-                        'year': paper.year,
-                        'venue': paper.venue
-                    })
-            
-            # 生成挑战问答 (10个模板)
-            for method in methods:
-                for template in self.qa_templates['challenge']:
-                    question = template.format(method=method)
-                    answer = self._generate_challenge_answer(paper, method)
-                    qa_pairs.append({
-                        'question': question,
-                        'answer': answer,
-                        'source': paper.title,
-                        'type': 'challenge',
-                        'year': paper.year,
-                        'venue': paper.venue
-                    })
-            
-            # 生成优化问答 (10个模板)
-            for method in methods:
-                for template in self.qa_templates['optimization']:
-                    question = template.format(method=method)
-                    answer = self._generate_optimization_answer(paper, method)
-                    qa_pairs.append({
-                        'question': question,
-                        'answer': answer,
-                        'source': paper.title,
-                        'type': 'optimization',
-                        'year': paper.year,
-                        'venue': paper.venue
-                    })
-            
-            # 生成集成问答 (10个模板)
-            for method in methods:
-                for template in self.qa_templates['integration']:
-                    question = template.format(method=method)
-                    answer = self._generate_integration_answer(paper, method)
-                    qa_pairs.append({
-                        'question': question,
-                        'answer': answer,
-                        'source': paper.title,
-                        'type': 'integration',
-                        'year': paper.year,
-                        'venue': paper.venue
-                    })
-            
-            # 生成趋势问答 (10个模板)
-            for method in methods:
-                for template in self.qa_templates['trend']:
-                    question = template.format(method=method)
-                    answer = self._generate_trend_answer(paper, method)
-                    qa_pairs.append({
-                        'question': question,
-                        'answer': answer,
-                        'source': paper.title,
-                        'type': 'trend',
-                        'year': paper.year,
-                        'venue': paper.venue
-                    })
-            
-            # 生成技术术语问答
-            for term in tech_terms:
-                qa_pairs.extend(self._generate_term_qa_pairs(paper, term))
-            
-            # 生成论文特定问答
-            qa_pairs.extend(self._generate_paper_specific_qa_pairs(paper))
-        
-        logger.info(f"生成了 {len(qa_pairs)} 个问答对")
-        return qa_pairs
+            emitted = 0
+            for qa_type, stream in self._qa_streams(paper).items():
+                if max_per_category:
+                    stream = itertools.islice(stream, max_per_category)
+                for qa_pair in stream:
+                    if max_per_paper and emitted >= max_per_paper:
+                        break
+                    yield qa_pair
+                    emitted += 1
+    
+    def _qa_streams(self, paper: Paper) -> Dict[str, Iterator[Dict]]:
+        """一篇论文各类问答对的生成器，按类型排列（共10种模板类型 + 技术术语 + 论文特定）"""
+        # 提取关键概念、方法/工具、评估指标和技术术语（共用一次扫描的结果）
+        hits = self._paper_hits(paper)
+        concepts = self._extract_concepts(paper, hits)
+        methods = self._extract_methods(paper, hits)
+        metrics = self._extract_metrics(paper, hits)
+        tech_terms = self._extract_tech_terms(paper, hits)
+        templates = self.qa_templates
+        
+        return {
+            'concept': (
+                self._qa_pair(paper, 'concept', template.format(concept=concept),
+                              self._generate_concept_answer(paper, concept))
+                for concept in concepts for template in templates['concept']
+            ),
+            'comparison': (
+                self._qa_pair(paper, 'comparison', template.format(method1=method1, method2=method2),
+                              self._generate_comparison_answer(paper, method1, method2))
+                for method1, method2 in itertools.combinations(methods, 2) for template in templates['comparison']
+            ),
+            'application': (
+                self._qa_pair(paper, 'application', template.format(method=method, task="代码克隆检测"),
+                              self._generate_application_answer(paper, method))
+                for method in methods for template in templates['application']
+            ),
+            'evaluation': (
+                self._qa_pair(paper, 'evaluation', template.format(method=method),
+                              self._generate_evaluation_answer(paper, method, metric))
+                for method in methods for metric in metrics for template in templates['evaluation']
+            ),
+            'technique': (
+                self._qa_pair(paper, 'technique', template.format(method=method),
+                              self._generate_technique_answer(paper, method))
+                for method in methods for template in templates['technique']
+            ),
+            'challenge': (
+                self._qa_pair(paper, 'challenge', template.format(method=method),
+                              self._generate_challenge_answer(paper, method))
+                for method in methods for template in templates['challenge']
+            ),
+            'optimization': (
+                self._qa_pair(paper, 'optimization', template.format(method=method),
+                              self._generate_optimization_answer(paper, method))
+                for method in methods for template in templates['optimization']
+            ),
+            'integration': (
+                self._qa_pair(paper, 'integration', template.format(method=method),
+                              self._generate_integration_answer(paper, method))
+                for method in methods for template in templates['integration']
+            ),
+            'trend': (
+                self._qa_pair(paper, 'trend', template.format(method=method),
+                              self._generate_trend_answer(paper, method))
+                for method in methods for template in templates['trend']
+            ),
+            'term': (
+                qa_pair for term in tech_terms for qa_pair in self._generate_term_qa_pairs(paper, term)
+            ),
+            'paper_specific': self._generate_paper_specific_qa_pairs(paper)
+        }
+    
+    @staticmethod
+    def _qa_pair(paper: Paper, qa_type: str, question: str, answer: str) -> Dict:
+        return {
+            'question': question,
+            'answer': answer,
+            'source': paper.title,
+            'type': qa_type,
+            'year': paper.year,
+            'venue': paper.venue
+        }
+    
+    def _extract_tech_terms(self, paper: Paper, hits: List[TermHit] = None) -> List[str]:
+        """提取技术术语（标题、摘要和关键词中出现的，按术语表顺序）"""
+        if hits is None:
+            hits = self._paper_hits(paper)
+        found = first_hits(hits, 'tech')
+        return list(dict.fromkeys(term for term in self.tech_terms if term in found))
     
-    def _extract_tech_terms(self, paper: Paper) -> List[str]:
-        """提取技术术语"""
+    def _paper_hits(self, paper: Paper) -> List[TermHit]:
+        """扫描一次标题、摘要和关键词，得到概念、方法、指标和技术术语的全部命中"""
         text = paper.title + ' ' + paper.abstract + ' ' + ' '.join(paper.keywords)
-        tech_terms = []
-        
-        common_terms = [
-            'algorithm', 'complexity', 'scalability', 'performance', 'accuracy',
-            'precision', 'recall', 'f1-score', 'roc', 'auc', 'false positive',
-            'false negative', 'true positive', 'true negative', 'confusion matrix',
-            'cross-validation', 'benchmark', 'dataset', 'training', 'testing',
-            'validation', 'overfitting', 'underfitting', 'regularization',
-            'optimization', 'heuristic', 'metaheuristic', 'genetic algorithm',
-            'neural network', 'deep learning', 'machine learning', 'artificial intelligence',
-            'natural language processing', 'computer vision', 'data mining',
-            'big data', 'cloud computing', 'distributed computing', 'parallel computing',
-            'software engineering', 'software development', 'software maintenance',
-            'software quality', 'software testing', 'software debugging',
-            'version control', 'git', 'github', 'gitlab', 'bitbucket',
-            'continuous integration', 'continuous deployment', 'devops',
-            'agile', 'scrum', 'kanban', 'waterfall', 'extreme programming',
-            'code review', 'peer review', 'static analysis', 'dynamic analysis',
-            'unit testing', 'integration testing', 'system testing', 'acceptance testing',
-            'refactoring', 'technical debt', 'code smell', 'design pattern',
-            'architecture', 'microservices', 'monolith', 'service-oriented architecture',
-            'container', 'docker', 'kubernetes', 'orchestration', 'deployment',
-            'monitoring', 'logging', 'alerting', 'observability', 'tracing'
-        ]
-        
-        for term in common_terms:
-            if term.lower() in text.lower():
-                tech_terms.append(term)
-        
-        return list(set(tech_terms))
+        return self.term_matcher.find(text, {'concept', 'method', 'metric', 'tech'})
     
-    def _generate_term_qa_pairs(self, paper: Paper, term: str) -> List[Dict]:
+    def _generate_term_qa_pairs(self, paper: Paper, term: str) -> Iterator[Dict]:
         """生成技术术语问答对"""
-        qa_pairs = []
-        
         term_templates = [
             f"什么是{term}？",
             f"{term}在代码克隆检测中的作用是什么？",
@@ -688,25 +655,12 @@ class PDFProcessor:
             f"{term}与软件质量的关系是什么？"
         ]
         
-        for template in term_templates:
-            question = template
-            answer = f"根据{paper.title}({paper.year})的研究，{term}是相关的重要技术概念。{paper.abstract[:200]}..."
-            
-            qa_pairs.append({
-                'question': question,
-                'answer': answer,
-                'source': paper.title,
-                'type': 'term',
-                'year': paper.year,
-                'venue': paper.venue
-            })
-        
-        return qa_pairs
-    
-    def _generate_paper_specific_qa_pairs(self, paper: Paper) -> List[Dict]:
+        answer = f"根据{paper.title}({paper.year})的研究，{term}是相关的重要技术概念。{paper.abstract[:200]}..."
+        for question in term_templates:
+            yield self._qa_pair(paper, 'term', question, answer)
+    
+    def _generate_paper_specific_qa_pairs(self, paper: Paper) -> Iterator[Dict]:
         """生成论文特定问答对"""
-        qa_pairs = []
-        
         # 论文基本信息问答
         paper_qa = [
             f"{paper.title}这篇论文的主要贡献是什么？",
@@ -721,19 +675,9 @@ class PDFProcessor:
             f"{paper.title}的创新点在哪里？"
         ]
         
+        answer = f"根据{paper.title}({paper.year})在{paper.venue}的研究，{paper.abstract[:300]}..."
         for question in paper_qa:
-            answer = f"根据{paper.title}({paper.year})在{paper.venue}的研究，{paper.abstract[:300]}..."
-            
-            qa_pairs.append({
-                'question': question,
-                'answer': answer,
-                'source': paper.title,
-                'type': 'paper_specific',
-                'year': paper.year,
-                'venue': paper.venue
-            })
-        
-        return qa_pairs
+            yield self._qa_pair(paper, 'paper_specific', question, answer)
     
     def _generate_challenge_answer(self, paper: Paper, method: str) -> str:
         """生成挑战回答"""
@@ -751,61 +695,25 @@ class PDFProcessor:
         """生成趋势回答"""
         return f"根据{paper.title}({paper.year})在{paper.venue}的研究，{method}的发展趋势包括：{paper.abstract[:250]}..."
     
-    def _extract_concepts(self, paper: Paper) -> List[str]:
-        text = paper.title + ' ' + paper.abstract + ' ' + ' '.join(paper.keywords)
-        concepts = []
-        
-        common_concepts = [
-            'code clone', 'clone detection', 'software similarity',
-            'program analysis', 'AST', 'abstract syntax tree',
-            'token-based', 'tree-based', 'semantic similarity',
-            'software plagiarism', 'code duplication',
-            'software maintenance', 'code quality', 'software engineering'
-        ]
-        
-        for concept in common_concepts:
-            if concept.lower() in text.lower():
-                concepts.append(concept)
-        
-        return list(set(concepts))
+    def _extract_concepts(self, paper: Paper, hits: List[TermHit] = None) -> List[str]:
+        if hits is None:
+            hits = self._paper_hits(paper)
+        found = first_hits(hits, 'concept')
+        return list(dict.fromkeys(term for term in self.concept_terms if term in found))
     
-    def _extract_methods(self, paper: Paper) -> List[str]:
+    def _extract_methods(self, paper: Paper, hits: List[TermHit] = None) -> List[str]:
         """提取方法"""
-        text = paper.title + ' ' + paper.abstract + ' ' + ' '.join(paper.keywords)
-        methods = []
-        
-        common_methods = [
-            'CCFinder', 'NiCad', 'Deckard', 'MOSS', 'JPlag',
-            'Simian', 'CloneDR', 'SourcererCC', 'CodeClone',
-            'PDG', 'program dependence graph', 'AST-based',
-            'token-based', 'tree-based', 'semantic-based',
-            'machine learning', 'deep learning', 'neural network',
-            'graph-based', 'hash-based', 'metric-based'
-        ]
-        
-        for method in common_methods:
-            if method.lower() in text.lower():
-                methods.append(method)
-        
-        return list(set(methods))
-    
-    def _extract_metrics(self, paper: Paper) -> List[str]:
-        """提取评估指标"""
-        text = paper.title + ' ' + paper.abstract
-        metrics = []
-        
-        common_metrics = [
-            'precision', 'recall', 'F1-score', 'accuracy',
-            'false positive', 'false negative', 'true positive',
-            'true negative', 'ROC curve', 'AUC', 'precision-recall',
-            'similarity score', 'matching score', 'detection rate'
-        ]
-        
-        for metric in common_metrics:
-            if metric.lower() in text.lower():
-                metrics.append(metric)
-        
-        return list(set(metrics))
+        if hits is None:
+            hits = self._paper_hits(paper)
+        found = first_hits(hits, 'method')
+        return list(dict.fromkeys(term for term in self.method_terms if term in found))
+    
+    def _extract_metrics(self, paper: Paper, hits: List[TermHit] = None) -> List[str]:
+        """提取评估指标（只看标题和摘要，不含关键词）"""
+        if hits is None:
+            hits = self._paper_hits(paper)
+        found = first_hits(hits, 'metric', limit=len(paper.title) + 1 + len(paper.abstract))
+        return list(dict.fromkeys(term for term in self.metric_terms if term in found))
     
     def _generate_concept_answer(self, paper: Paper, concept: str) -> str:
         """生成概念回答"""
@@ -837,57 +745,144 @@ class PDFProcessor:
         """生成技术回答"""
         return f"根据{paper.title}({paper.year})在{paper.venue}的研究，{method}的技术原理基于：{paper.abstract[:250]}..."
     
-    def process_pdfs(self, source_dir: str, output_dir: str) -> Tuple[List[Paper], List[Dict]]:
-        """处理PDF文件"""
+    def process_pdfs(self, source_dir: str, output_dir: str, workers: int = 0, resume: bool = True,
+                     max_qa_per_category: int = None, max_qa_per_paper: int = None) -> Tuple[List[Paper], int]:
+        """处理PDF文件，返回有效论文和写入的问答对数量
+
+        workers 个进程并行提取论文信息（0 表示使用全部CPU核，1 表示在当前进程内串行），
+        同时在途的文件数限制在 workers 的两倍。每成功提取一个文件就向输出目录下的断点文件追加一条记录
+        （出错或未能提取论文信息的文件不记录，下次运行时重试），
+        resume 为 True 时跳过断点文件中已记录且大小、修改时间未变的文件，中断的运行可以接着处理。
+        问答对边生成边写入 qa_pairs.jsonl（同时生成偏移索引，见 src/qa_store.py），数量上限见 iter_qa_pairs。
+        """
         source_path = Path(source_dir)
         output_path = Path(output_dir)
         
         if not source_path.exists():
             logger.error(f"源目录不存在: {source_dir}")
-            return [], []
+            return [], 0
         
         # 创建输出目录
         output_path.mkdir(parents=True, exist_ok=True)
         
-        # 获取所有PDF文件
-        pdf_files = list(source_path.glob("*.pdf"))
+        # 获取所有PDF文件（按文件名排序，输出顺序与处理完成的先后无关）
+        pdf_files = sorted(source_path.glob("*.pdf"))
         logger.info(f"找到 {len(pdf_files)} 个PDF文件")
         
-        papers = []
-        processed_count = 0
+        checkpoint_file = output_path / CHECKPOINT_FILENAME
+        if not resume and checkpoint_file.exists():
+            checkpoint_file.unlink()
+        done = self._load_checkpoint(checkpoint_file)
         
+        results: Dict[str, Optional[Paper]] = {}
+        pending = []
         for pdf_file in pdf_files:
-            logger.info(f"正在处理: {pdf_file.name}")
-            
-            try:
-                paper = self.extract_paper_info(str(pdf_file))
-                
-                if paper and self.validate_paper(paper):
-                    papers.append(paper)
-                    processed_count += 1
-                    logger.info(f"✅ 成功处理: {paper.title}")
-                else:
-                    logger.warning(f"❌ 论文验证失败: {pdf_file.name}")
-                
-                # 添加延迟避免过快处理
-                time.sleep(0.5)
-                
-            except Exception as e:
-                logger.error(f"❌ 处理失败 {pdf_file.name}: {e}")
-                continue
-        
-        logger.info(f"成功处理 {processed_count}/{len(pdf_files)} 个PDF文件")
+            record = done.get(pdf_file.name)
+            # 旧版断点文件中 paper 为空的记录同样重试
+            if (record and record.get('paper')
+                    and record['size'] == pdf_file.stat().st_size and record['mtime_ns'] == pdf_file.stat().st_mtime_ns):
+                results[pdf_file.name] = Paper(**record['paper'])
+            else:
+                pending.append(pdf_file)
+        if results:
+            logger.info(f"从断点恢复 {len(results)} 个已处理的文件，剩余 {len(pending)} 个")
+        
+        start = time.perf_counter()
+        with open(checkpoint_file, 'a', encoding='utf-8') as checkpoint:
+            for index, (pdf_file, paper, error) in enumerate(self._extract_all(pending, workers), 1):
+                rate = index / (time.perf_counter() - start)
+                # 出错或未能提取的文件不写入断点，下次运行时重试
+                if error:
+                    logger.error(f"[{index}/{len(pending)}] ❌ 处理失败 {pdf_file.name}: {error}")
+                    continue
+                results[pdf_file.name] = paper
+                if not paper:
+                    logger.warning(f"[{index}/{len(pending)}] ❌ 未能提取论文信息: {pdf_file.name}（{rate:.2f} 篇/秒）")
+                    continue
+                stat = pdf_file.stat()
+                checkpoint.write(json.dumps({
+                    'file': pdf_file.name,
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'paper': asdict(paper)
+                }, ensure_ascii=False) + '\n')
+                checkpoint.flush()
+                logger.info(f"[{index}/{len(pending)}] 已提取: {paper.title}（{rate:.2f} 篇/秒）")
+        if pending:
+            elapsed = time.perf_counter() - start
+            logger.info(f"本次处理 {len(pending)} 个PDF文件，耗时 {elapsed:.1f} 秒（{len(pending) / elapsed:.2f} 篇/秒）")
+        
+        # 验证在汇总时进行，调整验证规则后从断点恢复的结果同样适用
+        papers = []
+        for pdf_file in pdf_files:
+            paper = results.get(pdf_file.name)
+            if paper and self.validate_paper(paper):
+                papers.append(paper)
+            elif pdf_file.name in results:
+                logger.warning(f"❌ 论文验证失败: {pdf_file.name}")
         
-        # 生成问答对
-        qa_pairs = self.generate_qa_pairs(papers)
+        logger.info(f"成功处理 {len(papers)}/{len(pdf_files)} 个PDF文件")
         
-        # 保存数据
-        self._save_data(papers, qa_pairs, output_path)
+        # 生成问答对并保存数据
+        qa_pairs = self.iter_qa_pairs(papers, max_qa_per_category, max_qa_per_paper)
+        qa_count = self._save_data(papers, qa_pairs, output_path)
         
-        return papers, qa_pairs
+        return papers, qa_count
     
-    def _save_data(self, papers: List[Paper], qa_pairs: List[Dict], output_path: Path):
-        """保存数据"""
+    def _extract_all(self, pdf_files: List[Path], workers: int):
+        """并行提取论文信息，按完成先后产出 (文件, 论文或None, 错误信息)"""
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        
+        if workers <= 1 or len(pdf_files) <= 1:
+            for pdf_file in pdf_files:
+                try:
+                    yield pdf_file, self._extract_paper_info(str(pdf_file)), None
+                except Exception as e:
+                    yield pdf_file, None, str(e)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            remaining = iter(pdf_files)
+            in_flight = {}
+            while True:
+                while len(in_flight) < workers * 2:
+                    pdf_file = next(remaining, None)
+                    if pdf_file is None:
+                        break
+                    in_flight[executor.submit(_extract_worker, str(pdf_file))] = pdf_file
+                if not in_flight:
+                    return
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pdf_file = in_flight.pop(future)
+                    try:
+                        yield pdf_file, future.result(), None
+                    except Exception as e:
+                        yield pdf_file, None, str(e)
+    
+    @staticmethod
+    def _load_checkpoint(checkpoint_file: Path) -> Dict[str, Dict]:
+        """读取断点文件，返回 文件名 -> 记录；中断时写了一半的最后一行被忽略"""
+        records = {}
+        if not checkpoint_file.exists():
+            return records
+        with open(checkpoint_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['file']] = record
+        # 保证之后追加的记录从新的一行开始
+        if content and not content.endswith('\n'):
+            with open(checkpoint_file, 'a', encoding='utf-8') as f:
+                f.write('\n')
+        return records
+    
+    def _save_data(self, papers: List[Paper], qa_pairs: Iterator[Dict], output_path: Path) -> int:
+        """保存数据，返回写入的问答对数量"""
         # 保存论文数据
         papers_file = output_path / 'papers.json'
         with open(papers_file, 'w', encoding='utf-8') as f:
@@ -903,9 +898,7 @@ class PDFProcessor:
             } for p in papers], f, ensure_ascii=False, indent=2)
         
         # 保存问答对
-        qa_file = output_path / 'qa_pairs.json'
-        with open(qa_file, 'w', encoding='utf-8') as f:
-            json.dump(qa_pairs, f, ensure_ascii=False, indent=2)
+        qa_count = write_qa_pairs(output_path / QA_FILENAME, qa_pairs)
         
         # 保存为文本格式便于RAG处理
         text_dir = output_path / 'texts'
@@ -937,7 +930,17 @@ class PDFProcessor:
         
         logger.info(f"数据已保存到: {output_path}")
         logger.info(f"- 论文数量: {len(papers)}")
-        logger.info(f"- 问答对数量: {len(qa_pairs)}")
+        logger.info(f"- 问答对数量: {qa_count}")
+        return qa_count
+
+# 进程池中每个进程各自持有的处理器
+_worker_processor = None
+
+def _extract_worker(pdf_path: str) -> Optional[Paper]:
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = PDFProcessor()
+    return _worker_processor._extract_paper_info(pdf_path)
 
 def main():
     """主函数"""
@@ -949,6 +952,14 @@ def main():
                        help='PDF文件目录 (默认: CloneDetection paper)')
     parser.add_argument('--output', default='data/google_scholar_papers', 
                        help='输出目录 (默认: data/google_scholar_papers)')
+    parser.add_argument('--workers', type=int, default=0,
+                       help='并行处理的进程数，0 表示使用全部CPU核 (默认: 0)')
+    parser.add_argument('--no-resume', action='store_true',
+                       help='忽略断点文件，重新处理所有PDF')
+    parser.add_argument('--max-qa-per-category', type=int, default=None,
+                       help='每篇论文每种问答类型最多生成的问答对数 (默认: 不限)')
+    parser.add_argument('--max-qa-per-paper', type=int, default=None,
+                       help='每篇论文最多生成的问答对数 (默认: 不限)')
     args = parser.parse_args()
     
     # 构建相对路径
@@ -965,11 +976,14 @@ def main():
     print()
     
     # 处理PDF文件
-    papers, qa_pairs = processor.process_pdfs(str(source_dir), str(output_dir))
+    papers, qa_count = processor.process_pdfs(str(source_dir), str(output_dir),
+                                              workers=args.workers, resume=not args.no_resume,
+                                              max_qa_per_category=args.max_qa_per_category,
+                                              max_qa_per_paper=args.max_qa_per_paper)
     
     print("\n=== 处理完成 ===")
     print(f"有效论文: {len(papers)} 篇")
-    print(f"问答对: {len(qa_pairs)} 个")
+    print(f"问答对: {qa_count} 个")
     print(f"数据保存位置: {output_dir}")
     
     # 显示统计信息
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+数据目录监听脚本
+持续监听 Config.DATA_DIRS 中文件的新增、修改和删除，去抖后增量更新向量数据库。
+正在运行的 RetrieverManager 在下一次检索时会自动加载更新后的索引。
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+# 添加src目录到路径
+script_dir = Path(__file__).parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from ingest import DataIngestor
+from watcher import SourceWatcher
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    """主函数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='数据目录监听与实时增量摄取')
+    parser.add_argument('--interval', type=float, default=1.0,
+                      help='轮询间隔（秒） (默认: 1.0)')
+    parser.add_argument('--debounce', type=float, default=2.0,
+                      help='文件停止变化多久后开始同步（秒） (默认: 2.0)')
+    parser.add_argument('--max-delay', type=float, default=30.0,
+                      help='文件持续变化时最长等待多久同步一次（秒） (默认: 30.0)')
+    args = parser.parse_args()
+    
+    ingestor = DataIngestor()
+    # 先建立文件快照再做首次同步，同步期间发生的修改会在下一轮被发现
+    watcher = SourceWatcher(
+        ingestor,
+        interval=args.interval,
+        debounce=args.debounce,
+        max_delay=args.max_delay,
+        on_update=lambda changed: logger.info(f"已同步 {len(changed)} 个数据源")
+    )
+    
+    logger.info("首次同步：检查全部数据源...")
+    ingestor.update_sources()
+    
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("已停止监听")
+
+if __name__ == "__main__":
+    main()
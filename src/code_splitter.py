@@ -0,0 +1,290 @@
+import ast
+import re
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.docstore.document import Document
+
+# 切分规则变化时递增，写入摄取清单以触发重新分块
+CODE_SPLITTER_VERSION = 1
+
+_CONTAINER_RE = re.compile(r'\b(class|struct|interface|enum|namespace|union)\s+([A-Za-z_$][\w$]*)')
+_ANNOTATION_RE = re.compile(r'@\w+(\([^)]*\))?')
+_JS_ASSIGN_RE = re.compile(r'([A-Za-z_$][\w$]*)\s*[=:]\s*(async\s+)?(function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)')
+_CALL_RE = re.compile(r'([A-Za-z_$~][\w$:~]*)\s*\(')
+_NOT_FUNCTION_NAMES = {'if', 'for', 'while', 'switch', 'catch', 'return', 'sizeof', 'function', 'new', 'synchronized'}
+
+
+class CodeUnit:
+    """代码中的一个语法单元：行范围为 1 起始的闭区间"""
+
+    def __init__(self, start_line: int, end_line: int, symbol: str, symbol_type: str):
+        self.start_line = start_line
+        self.end_line = end_line
+        self.symbol = symbol
+        self.symbol_type = symbol_type
+
+
+def _text_size(lines: List[str], start: int, end: int) -> int:
+    return sum(len(line) + 1 for line in lines[start - 1:end])
+
+
+def _gap_unit(lines: List[str], start: int, end: int, symbol: str, symbol_type: str) -> Optional[CodeUnit]:
+    """语法单元之间的模块级代码（导入、全局变量等），去掉首尾空行，全为空行时返回 None"""
+    while start <= end and not lines[start - 1].strip():
+        start += 1
+    while end >= start and not lines[end - 1].strip():
+        end -= 1
+    return CodeUnit(start, end, symbol, symbol_type) if start <= end else None
+
+
+def _with_leading_comments(lines: List[str], start: int, floor: int, markers: Tuple[str, ...]) -> int:
+    """把紧贴在定义上方的注释行并入该定义"""
+    while start - 1 >= floor and lines[start - 2].strip().startswith(markers):
+        start -= 1
+    return start
+
+
+def _python_units(
+    nodes: List[ast.stmt], lines: List[str], start: int, end: int,
+    prefix: str, gap_symbol: str, gap_type: str, chunk_size: int
+) -> List[CodeUnit]:
+    """按函数和类切分 Python 代码，超过块大小的类继续按方法切分"""
+    units = []
+    cursor = start
+    for node in nodes:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        node_start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        node_start = _with_leading_comments(lines, node_start, cursor, ('#',))
+        node_end = node.end_lineno
+
+        gap = _gap_unit(lines, cursor, node_start - 1, gap_symbol, gap_type)
+        if gap:
+            units.append(gap)
+
+        name = prefix + node.name
+        if isinstance(node, ast.ClassDef):
+            has_members = any(isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) for child in node.body)
+            if has_members and _text_size(lines, node_start, node_end) > chunk_size:
+                units.extend(_python_units(node.body, lines, node_start, node_end, name + '.', name, 'class', chunk_size))
+            else:
+                units.append(CodeUnit(node_start, node_end, name, 'class'))
+        else:
+            units.append(CodeUnit(node_start, node_end, name, 'method' if prefix else 'function'))
+        cursor = node_end + 1
+
+    gap = _gap_unit(lines, cursor, end, gap_symbol, gap_type)
+    if gap:
+        units.append(gap)
+    return units
+
+
+def _scan_braces(text: str, begin: int, end: int) -> Optional[List[Tuple[int, int, int]]]:
+    """扫描 C 系代码中顶层的花括号块
+
+    跳过字符串、字符字面量、注释和预处理指令，返回 (语句起点, 左括号位置, 右括号位置) 列表；
+    括号不配对时返回 None。
+    """
+    blocks = []
+    depth = 0
+    statement_start = None
+    open_pos = 0
+    i = begin
+    line_start = True
+    while i < end:
+        ch = text[i]
+        nxt = text[i + 1] if i + 1 < end else ''
+        if ch == '\n':
+            line_start = True
+            i += 1
+            continue
+        if ch in ' \t':
+            i += 1
+            continue
+        if ch == '/' and nxt == '/':
+            newline = text.find('\n', i, end)
+            i = end if newline < 0 else newline
+            continue
+        if ch == '/' and nxt == '*':
+            close = text.find('*/', i + 2, end)
+            i = end if close < 0 else close + 2
+            line_start = False
+            continue
+        if ch == '#' and line_start and depth == 0:
+            newline = text.find('\n', i, end)
+            i = end if newline < 0 else newline
+            statement_start = None
+            continue
+        line_start = False
+        if depth == 0 and statement_start is None:
+            statement_start = i
+
+        if ch in '"\'`':
+            i += 1
+            while i < end and text[i] != ch:
+                i += 2 if text[i] == '\\' else 1
+            i += 1
+            continue
+
+        if ch == '{':
+            if depth == 0:
+                open_pos = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0:
+                blocks.append((statement_start, open_pos, i))
+                statement_start = None
+        elif ch == ';' and depth == 0:
+            statement_start = None
+        i += 1
+
+    return blocks if depth == 0 else None
+
+
+def _c_symbol(header: str) -> Tuple[str, str]:
+    """从块的头部（左括号之前的部分）提取符号名和类型"""
+    header = _ANNOTATION_RE.sub(' ', header)
+    match = _CONTAINER_RE.search(header)
+    if match and '(' not in header[:match.start()]:
+        return match.group(2), 'namespace' if match.group(1) == 'namespace' else 'class'
+    match = _JS_ASSIGN_RE.search(header)
+    if match:
+        return match.group(1), 'function'
+    for match in _CALL_RE.finditer(header):
+        if match.group(1) not in _NOT_FUNCTION_NAMES:
+            return match.group(1), 'function'
+    return '', 'block'
+
+
+def _c_family_units(
+    text: str, lines: List[str], line_starts: List[int], begin: int, end: int,
+    first_line: int, last_line: int, prefix: str, gap_symbol: str, gap_type: str, chunk_size: int
+) -> Optional[List[CodeUnit]]:
+    """按花括号块切分 C 系代码（C/C++/Java/JavaScript），超过块大小的类和命名空间继续按成员切分
+
+    [begin, end) 为要扫描的字符范围，[first_line, last_line] 为其中可分给模块级代码的行。
+    """
+    blocks = _scan_braces(text, begin, end)
+    if blocks is None:
+        return None
+
+    def line_of(offset: int) -> int:
+        return bisect_right(line_starts, offset)
+
+    units = []
+    cursor = first_line
+    for statement_start, open_pos, close_pos in blocks:
+        block_start = line_of(statement_start)
+        block_end = line_of(close_pos)
+        if block_start < cursor:
+            # 与上一个块写在同一行（如 "int a[] = {1}; int b[] = {2};"），并入上一个单元
+            if units:
+                units[-1].end_line = max(units[-1].end_line, block_end)
+            cursor = block_end + 1
+            continue
+        block_start = _with_leading_comments(lines, block_start, cursor, ('//', '/*', '*'))
+
+        gap = _gap_unit(lines, cursor, block_start - 1, gap_symbol, gap_type)
+        if gap:
+            units.append(gap)
+
+        name, kind = _c_symbol(text[statement_start:open_pos])
+        if kind == 'function' and prefix:
+            kind = 'method'
+        full_name = prefix + name if name else gap_symbol
+
+        nested = None
+        if kind in ('class', 'namespace') and _text_size(lines, block_start, block_end) > chunk_size:
+            nested = _c_family_units(text, lines, line_starts, open_pos + 1, close_pos,
+                                     line_of(open_pos) + 1, line_of(close_pos) - 1,
+                                     full_name + '.', full_name, kind, chunk_size)
+        if nested:
+            header = _gap_unit(lines, block_start, line_of(open_pos), full_name, kind)
+            footer = _gap_unit(lines, line_of(close_pos), block_end, full_name, kind)
+            units.extend(unit for unit in [header] + nested + [footer] if unit)
+        else:
+            units.append(CodeUnit(block_start, block_end, full_name, kind))
+        cursor = block_end + 1
+
+    gap = _gap_unit(lines, cursor, last_line, gap_symbol, gap_type)
+    if gap:
+        units.append(gap)
+    return units
+
+
+class CodeSplitter:
+    """按语法边界切分代码文件
+
+    Python 用 ast 按函数和类切分，C/C++/Java/JavaScript 用轻量的花括号扫描器按顶层块切分；
+    超过块大小的类继续按方法切分，单个函数仍超过块大小时按行切开。
+    每个块记录 symbol（如 "Parser.parse"，模块级代码为所属类名或空）、symbol_type 和行范围。
+    解析失败的文件回退到普通文本分块。
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self.fallback = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", " ", ""]
+        )
+
+    def units(self, text: str, file_type: str) -> Optional[List[CodeUnit]]:
+        """解析出语法单元，无法解析时返回 None"""
+        lines = text.split('\n')
+        if file_type == '.py':
+            try:
+                tree = ast.parse(text)
+            except (SyntaxError, ValueError):
+                return None
+            return _python_units(tree.body, lines, 1, len(lines), '', '', 'module', self.chunk_size)
+
+        line_starts = [0]
+        for line in lines[:-1]:
+            line_starts.append(line_starts[-1] + len(line) + 1)
+        return _c_family_units(text, lines, line_starts, 0, len(text), 1, len(lines), '', '', 'module', self.chunk_size)
+
+    def split_document(self, document: Document) -> List[Document]:
+        text = document.page_content
+        units = self.units(text, document.metadata.get('file_type', ''))
+        if units is None:
+            return self.fallback.split_documents([document])
+
+        lines = text.split('\n')
+        chunks = []
+        for unit in units:
+            for start, end in self._fit(lines, unit.start_line, unit.end_line):
+                content = '\n'.join(lines[start - 1:end])
+                metadata = dict(document.metadata)
+                metadata.update({
+                    'symbol': unit.symbol,
+                    'symbol_type': unit.symbol_type,
+                    'start_line': start,
+                    'end_line': end
+                })
+                if len(content) > self.chunk_size:
+                    # 单行超过块大小（如压缩过的代码），只能按字符切开
+                    chunks.extend(Document(page_content=piece, metadata=dict(metadata))
+                                  for piece in self.fallback.split_text(content))
+                else:
+                    chunks.append(Document(page_content=content, metadata=metadata))
+        return chunks
+
+    def _fit(self, lines: List[str], start: int, end: int) -> List[Tuple[int, int]]:
+        """把超过块大小的单元按整行切成若干段"""
+        if _text_size(lines, start, end) <= self.chunk_size:
+            return [(start, end)]
+        pieces = []
+        piece_start, size = start, 0
+        for line_no in range(start, end + 1):
+            line_size = len(lines[line_no - 1]) + 1
+            if size and size + line_size > self.chunk_size:
+                pieces.append((piece_start, line_no - 1))
+                piece_start, size = line_no, 0
+            size += line_size
+        pieces.append((piece_start, end))
+        return pieces
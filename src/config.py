@@ -6,10 +6,43 @@ load_dotenv()
 class Config:
     # 向量数据库配置
     CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./data/chroma")
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "numpy")  # 向量索引后端：numpy（精确检索）/ int8 / float16 / hnsw / ivfpq，变更后下次摄取自动重建
+    HNSW_M = int(os.getenv("HNSW_M", "16"))  # HNSW 每个节点的邻居数
+    HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))  # 构建时的候选数
+    HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))  # 检索时的候选数，越大召回率越高、延迟越大
+    IVFPQ_NLIST = int(os.getenv("IVFPQ_NLIST", "0"))  # IVF-PQ 倒排列表数，0 表示按 4×sqrt(块数) 自动选择
+    IVFPQ_M = int(os.getenv("IVFPQ_M", "32"))  # 每个向量的 PQ 编码字节数（16~64）
+    IVFPQ_NPROBE = int(os.getenv("IVFPQ_NPROBE", "16"))  # 检索时扫描的倒排列表数
+    IVFPQ_RERANK = int(os.getenv("IVFPQ_RERANK", "100"))  # 用原向量精确重排的候选数
+    IVFPQ_MIN_TRAIN_ROWS = int(os.getenv("IVFPQ_MIN_TRAIN_ROWS", "10000"))  # 块数达到该值才训练码本，之前使用精确检索
+    QUANTIZED_RERANK = int(os.getenv("QUANTIZED_RERANK", "50"))  # int8/float16 后端用原向量精确重排的候选数
+    INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))  # 重建后保留的版本数（含当前版本），用于回滚
+    
+    # 向量模型配置
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-zh-v1.5")
+    EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")  # 置空则关闭向量缓存
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch / onnx / onnx-int8（ONNX Runtime，仅 CPU）
+    ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./data/onnx_models")  # 导出的 ONNX 模型目录，缺失时自动导出
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # ONNX Runtime 计算线程数，0 表示使用全部CPU核
     
     # 文档处理配置
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "0"))  # 文档加载进程数，0 表示使用全部CPU核
+    PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", "0"))  # 单个 PDF 按页并行提取的进程数，0 表示自动（加载进程池内逐页串行）
+    PDF_TEXT_CACHE_DIR = os.getenv("PDF_TEXT_CACHE_DIR", "./data/pdf_text_cache")  # 按内容哈希缓存 PDF 逐页文本，置空则关闭
+    PDF_PAGE_MIN_CHARS = int(os.getenv("PDF_PAGE_MIN_CHARS", "20"))  # PyPDF2 提取的单页文本少于该字符数时改用 pdfplumber
+    WATCH_DATA_DIRS = os.getenv("WATCH_DATA_DIRS", "false").lower() == "true"  # 问答界面在后台监听数据目录并增量同步
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))  # 近重复块的 Jaccard 阈值，0 表示关闭去重
+    QA_GROUP_BY_ANSWER = os.getenv("QA_GROUP_BY_ANSWER", "true").lower() == "true"  # 共享答案的问答对合并为一条记录
+    
+    # 批处理配置：向量化批大小影响模型前向效率，写入批大小影响向量库 upsert 开销
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+    EMBED_BATCH_SIZE_MAX = int(os.getenv("EMBED_BATCH_SIZE_MAX", "512"))  # 自适应调节的上限
+    EMBED_BUCKET_BATCHES = int(os.getenv("EMBED_BUCKET_BATCHES", "8"))  # 每次取 N 批文本按 token 数排序后再分批，减少填充；1 表示按原顺序分批
+    EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # 向量化进程数，各绑定一段CPU核并加载一份模型；1 表示在当前进程内计算，0 表示每核一个进程
+    UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "1000"))
+    ADAPTIVE_BATCH = os.getenv("ADAPTIVE_BATCH", "false").lower() == "true"
     
     # 检索配置
     TOP_K_RETRIEVAL = int(os.getenv("TOP_K_RETRIEVAL", "3"))  # 减少检索数量，避免上下文过长
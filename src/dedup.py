@@ -0,0 +1,127 @@
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+
+# 去重索引与摄取清单放在同一目录
+DEDUP_INDEX_FILENAME = "dedup_index.npz"
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """选择 LSH 分段数 b 和每段行数 r，使 S 曲线的拐点 (1/b)^(1/r) 最接近阈值"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """基于 MinHash 签名和 LSH 分段的近重复文档块索引
+
+    文本按字符 n-gram 切分（对中英文都适用），签名的一致比例即 Jaccard 相似度的估计。
+    签名按 b 段、每段 r 行分桶，只有至少一段完全相同的块才会作为候选，
+    候选再用完整签名估计相似度，达到阈值才判定为近重复。
+    哈希参数由固定种子生成，签名可以持久化并在多次摄取之间复用。
+    """
+
+    def __init__(self, threshold: float, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        """计算文本的 MinHash 签名"""
+        text = ' '.join(text.split())
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        # 通用哈希 (a*x + b) mod p，按列取最小值得到每个排列的 MinHash
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """查找最相似的近重复块，返回 (块ID, 估计的 Jaccard 相似度)"""
+        candidates: Set[str] = set()
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(band.get(key, ()))
+
+        best = None
+        for chunk_id in candidates:
+            similarity = float(np.mean(self._signatures[chunk_id] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (chunk_id, similarity)
+        return best
+
+    def add(self, chunk_id: str, signature: np.ndarray):
+        if chunk_id in self._signatures:
+            return
+        self._signatures[chunk_id] = signature
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(key, set()).add(chunk_id)
+
+    def remove(self, chunk_id: str):
+        signature = self._signatures.pop(chunk_id, None)
+        if signature is None:
+            return
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            members = band.get(key)
+            if members:
+                members.discard(chunk_id)
+                if not members:
+                    del band[key]
+
+    def save(self, path: str):
+        """原子地写入签名（块ID + 签名矩阵）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ids = list(self._signatures)
+        matrix = np.stack([self._signatures[i] for i in ids]) if ids else np.zeros((0, self.num_perm), dtype=np.uint32)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, ids=np.array(ids, dtype=str), signatures=matrix)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: float, **kwargs) -> "NearDuplicateIndex":
+        """读取签名，文件不存在或签名长度不一致时返回空索引"""
+        index = cls(threshold, **kwargs)
+        if not Path(path).exists():
+            return index
+        try:
+            with np.load(path) as data:
+                ids, signatures = data['ids'], data['signatures']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ 读取去重索引失败: {e}")
+            return index
+
+        if signatures.ndim != 2 or signatures.shape[1] != index.num_perm:
+            return index
+        for chunk_id, signature in zip(ids, signatures):
+            index.add(str(chunk_id), signature)
+        return index
@@ -0,0 +1,270 @@
+import re
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import sys
+sys.path.insert(0, str(Path(__file__).parent))
+from config import Config
+
+KEY_SIZE = 20  # SHA-1 摘要长度
+NORMALIZE = True  # 向量统一做 L2 归一化
+
+
+def text_key(text: str) -> bytes:
+    """文本的缓存键"""
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+
+class TokenCounter:
+    """统计文本分词后的 token 数（含 [CLS]/[SEP]，超过 max_length 按截断计），用于按长度分桶
+
+    ONNX 后端读取导出目录中的 tokenizer.json，torch 后端使用 transformers 的快速分词器；
+    分词器不可用时按字符数估算（bge 中文模型的 token 数与汉字数接近）。
+    """
+
+    def __init__(self, backend: str = None, max_length: int = 512):
+        self.max_length = max_length
+        self._count = self._load(backend or Config.EMBEDDING_BACKEND)
+
+    def _load(self, backend: str):
+        try:
+            if backend in ('onnx', 'onnx-int8'):
+                from tokenizers import Tokenizer
+                from onnx_embeddings import onnx_model_dir
+                tokenizer = Tokenizer.from_file(str(onnx_model_dir() / 'tokenizer.json'))
+                tokenizer.no_padding()
+                tokenizer.enable_truncation(max_length=self.max_length)
+                return lambda texts: [len(encoding.ids) for encoding in tokenizer.encode_batch(texts)]
+
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(Config.EMBEDDING_MODEL)
+            return lambda texts: [
+                len(ids) for ids in tokenizer(texts, truncation=True, max_length=self.max_length)['input_ids']
+            ]
+        except Exception as e:
+            print(f"⚠️ 无法加载分词器，按字符数估算文本长度: {e}")
+            return lambda texts: [min(len(text) + 2, self.max_length) for text in texts]
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._count(list(texts)), dtype=np.int64)
+
+
+class EmbeddingCache:
+    """持久化的向量缓存
+
+    每个 (模型, 是否归一化) 组合一个子目录：
+    - vectors.f32: 按行追加的 float32 向量，读取时内存映射
+    - keys.bin:    与向量行一一对应的 20 字节文本哈希
+    - meta.json:   模型名、归一化标志和向量维度
+    启动时把 keys.bin 读入哈希表即可得到 文本哈希 -> 行号 的索引。
+    只读模式用于检索端，不写入也不修复文件，避免与正在写入的摄取进程冲突。
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, normalize: bool, read_only: bool = False):
+        namespace = re.sub(r'[^\w.-]', '_', model_name) + ('_norm' if normalize else '_raw')
+        self.dir = Path(cache_dir) / namespace
+        self.model_name = model_name
+        self.normalize = normalize
+        self.read_only = read_only
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / 'vectors.f32'
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.dir / 'keys.bin'
+
+    def _load(self):
+        meta_path = self.dir / 'meta.json'
+        if not meta_path.exists():
+            return
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            self.dim = json.load(f)['dim']
+
+        keys = self._keys_path.read_bytes() if self._keys_path.exists() else b''
+        vector_bytes = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        rows = min(len(keys) // KEY_SIZE, vector_bytes // (self.dim * 4))
+
+        # 上次写入中断时两个文件长度可能不一致，截断到完整的行
+        if not self.read_only:
+            if len(keys) != rows * KEY_SIZE:
+                with open(self._keys_path, 'r+b') as f:
+                    f.truncate(rows * KEY_SIZE)
+            if vector_bytes != rows * self.dim * 4:
+                with open(self._vectors_path, 'r+b') as f:
+                    f.truncate(rows * self.dim * 4)
+
+        self._index = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(rows)}
+        self._rows = rows
+
+    def _init_dim(self, dim: int):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({'model_name': self.model_name, 'normalize': self.normalize, 'dim': dim}, f)
+        self.dim = dim
+
+    def _vectors(self) -> np.ndarray:
+        """以内存映射方式读取全部向量（追加后重新映射）"""
+        if self._matrix is None or len(self._matrix) != self._rows:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(self._rows, self.dim))
+        return self._matrix
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """批量查找，未命中的位置为 None"""
+        with self._lock:
+            if not self._rows:
+                return [None] * len(keys)
+            matrix = self._vectors()
+            results = []
+            for key in keys:
+                row = self._index.get(key)
+                results.append(None if row is None else np.array(matrix[row]))
+            return results
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        """追加新向量（已存在的键会被跳过）"""
+        if self.read_only:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self._init_dim(vectors.shape[1])
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不匹配: {vectors.shape[1]} != {self.dim}")
+
+            fresh = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index and key not in fresh:
+                    fresh[key] = vector
+            if not fresh:
+                return
+
+            # 先写向量再写键，中断时多出的向量行会在下次加载时被截断
+            with open(self._vectors_path, 'ab') as f:
+                f.write(np.stack(list(fresh.values())).tobytes())
+            with open(self._keys_path, 'ab') as f:
+                f.write(b''.join(fresh.keys()))
+            for key in fresh:
+                self._index[key] = self._rows
+                self._rows += 1
+
+
+class CachedEmbeddings(Embeddings):
+    """在向量模型前加一层持久化缓存，只对未命中的文本调用模型"""
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        # 多个向量化线程可能同时调用，计数在锁内更新
+        self._counter_lock = threading.Lock()
+
+    def _count(self, hits: int, misses: int):
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # 同一批中重复的文本只计算一次
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None:
+                missing.setdefault(key, text)
+        self._count(len(texts) - sum(1 for v in cached if v is None), len(missing))
+
+        computed = {}
+        if missing:
+            vectors = np.asarray(self.inner.embed_documents(list(missing.values())), dtype=np.float32)
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(list(missing.keys()), vectors)
+
+        return [
+            (vector if vector is not None else computed[key]).tolist()
+            for key, vector in zip(keys, cached)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get_many([text_key(text)])[0]
+        if vector is not None:
+            self._count(1, 0)
+            return vector.tolist()
+        self._count(0, 1)
+        return self.inner.embed_query(text)
+
+
+def create_embeddings(
+    device: str = 'cpu',
+    read_only_cache: bool = False,
+    batch_size: int = None,
+    backend: str = None,
+    workers: int = 1
+) -> Embeddings:
+    """创建项目统一使用的向量模型（配置了缓存目录时带持久化缓存）
+
+    batch_size 为模型单次前向计算的最大批大小，默认沿用 sentence-transformers 的 32。
+    backend 默认取 Config.EMBEDDING_BACKEND：torch 使用 sentence-transformers，
+    onnx / onnx-int8 使用 ONNX Runtime（只在 CPU 上运行，忽略 device）。
+    workers > 1 时在多个进程中各加载一份模型分片计算（见 ShardedEmbeddings），缓存仍在当前进程中。
+    """
+    backend = backend or Config.EMBEDDING_BACKEND
+    if workers > 1:
+        from sharded_embeddings import ShardedEmbeddings
+        embeddings = ShardedEmbeddings(workers, device, batch_size, backend)
+    else:
+        embeddings = create_model(device, batch_size, backend)
+
+    if not Config.EMBEDDING_CACHE_DIR:
+        return embeddings
+
+    # 量化模型的输出与 PyTorch 略有差异，缓存按后端分开
+    cache_name = Config.EMBEDDING_MODEL if backend == 'torch' else f"{Config.EMBEDDING_MODEL}@{backend}"
+    cache = EmbeddingCache(Config.EMBEDDING_CACHE_DIR, cache_name, NORMALIZE, read_only=read_only_cache)
+    print(f"向量缓存: {cache.dir}（已缓存 {len(cache)} 条）")
+    return CachedEmbeddings(embeddings, cache)
+
+
+def create_model(device: str = 'cpu', batch_size: int = None, backend: str = None) -> Embeddings:
+    """创建不带缓存的向量模型"""
+    backend = backend or Config.EMBEDDING_BACKEND
+    if backend == 'torch':
+        return _torch_embeddings(device, batch_size)
+    if backend in ('onnx', 'onnx-int8'):
+        from onnx_embeddings import load_onnx_embeddings
+        # 只有模型文件还没有一致性校验记录时才加载 PyTorch 模型
+        return load_onnx_embeddings(
+            backend == 'onnx-int8',
+            batch_size=batch_size,
+            reference=lambda: _torch_embeddings('cpu', batch_size)
+        )
+    raise ValueError(f"未知的向量模型后端: {backend}")
+
+
+def _torch_embeddings(device: str, batch_size: int = None) -> Embeddings:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    encode_kwargs = {'normalize_embeddings': NORMALIZE}
+    if batch_size:
+        encode_kwargs['batch_size'] = batch_size
+    return HuggingFaceEmbeddings(
+        model_name=Config.EMBEDDING_MODEL,
+        model_kwargs={'device': device},
+        encode_kwargs=encode_kwargs
+    )
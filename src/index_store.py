@@ -0,0 +1,157 @@
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+import sys
+sys.path.insert(0, str(Path(__file__).parent))
+from config import Config
+
+# CHROMA_PERSIST_DIRECTORY 下的版本化布局：
+#   versions/<版本号>/  每个版本是一个完整的向量数据库目录（含摄取清单和去重索引）
+#   CURRENT             当前生效的版本号，原子替换
+#   versions/<版本号>/ABANDONED  回滚时写入被放弃的版本，清理时删除
+#   INGEST.lock         摄取锁，多个进程（问答界面、scripts/watch_ingest.py）的同步和重建串行执行
+# 没有 CURRENT 时沿用旧布局，CHROMA_PERSIST_DIRECTORY 本身就是向量数据库目录
+CURRENT_FILENAME = "CURRENT"
+VERSIONS_DIRNAME = "versions"
+ABANDONED_FILENAME = "ABANDONED"
+LOCK_FILENAME = "INGEST.lock"
+
+
+def index_root() -> Path:
+    return Path(Config.CHROMA_PERSIST_DIRECTORY)
+
+
+@contextmanager
+def ingest_lock():
+    """跨进程的摄取锁：持有期间其他进程的同步、重建和回滚等待，进程退出时由系统释放"""
+    root = index_root()
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / LOCK_FILENAME, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            # msvcrt 的阻塞锁只重试约 10 秒，这里循环直到拿到锁
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def current_version() -> Optional[str]:
+    """当前生效的版本号，旧布局时返回 None"""
+    try:
+        name = (index_root() / CURRENT_FILENAME).read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+    return name or None
+
+
+def active_index_dir() -> Path:
+    """当前生效的向量数据库目录"""
+    name = current_version()
+    if name:
+        return index_root() / VERSIONS_DIRNAME / name
+    return index_root()
+
+
+def list_versions() -> List[str]:
+    """所有版本号，从旧到新"""
+    versions_dir = index_root() / VERSIONS_DIRNAME
+    if not versions_dir.exists():
+        return []
+    return sorted(path.name for path in versions_dir.iterdir() if path.is_dir())
+
+
+def new_version_dir() -> Path:
+    """为一次重建分配新的版本目录（版本号按时间排序）"""
+    name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    path = index_root() / VERSIONS_DIRNAME / name
+    path.mkdir(parents=True)
+    return path
+
+
+def activate_version(name: str):
+    """原子地切换当前版本：读取方要么看到旧版本，要么看到新版本"""
+    root = index_root()
+    tmp_path = root / (CURRENT_FILENAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, root / CURRENT_FILENAME)
+
+
+def discard_version(name: str):
+    """删除一个版本（如校验失败的重建结果），当前版本不会被删除"""
+    if name == current_version():
+        return
+    shutil.rmtree(index_root() / VERSIONS_DIRNAME / name, ignore_errors=True)
+
+
+def collect_garbage(keep: int = None) -> List[str]:
+    """删除旧版本，保留当前版本及其之前最近的 keep-1 个版本（用于回滚），返回删除的版本号
+
+    仍被其他进程打开的目录可能删除失败（如 Windows），会在下次清理时重试。
+    """
+    keep = Config.INDEX_KEEP_VERSIONS if keep is None else keep
+    current = current_version()
+    versions = list_versions()
+    if current not in versions:
+        return []
+
+    older = versions[:versions.index(current)]
+    retained = set(older[-(keep - 1):]) if keep > 1 else set()
+    removed = []
+    for name in versions:
+        if name == current or name in retained:
+            continue
+        # 比当前版本新的目录是正在进行或失败的重建，不在这里清理；回滚时放弃的版本除外
+        if name > current and not (index_root() / VERSIONS_DIRNAME / name / ABANDONED_FILENAME).exists():
+            continue
+        try:
+            shutil.rmtree(index_root() / VERSIONS_DIRNAME / name)
+            removed.append(name)
+        except OSError as e:
+            print(f"⚠️ 删除旧索引版本 {name} 失败，下次重试: {e}")
+    return removed
+
+
+def rollback() -> Optional[str]:
+    """切换回当前版本之前最近的一个版本，返回切换后的版本号
+
+    被放弃的版本标记为 ABANDONED，保留到下一次清理（如下次重建）时才删除，在此之前可以删除标记后
+    用 activate_version 切换回去。
+    """
+    with ingest_lock():
+        return _rollback()
+
+
+def _rollback() -> Optional[str]:
+    current = current_version()
+    versions = list_versions()
+    if current not in versions:
+        return None
+    older = versions[:versions.index(current)]
+    if not older:
+        return None
+    activate_version(older[-1])
+    (index_root() / VERSIONS_DIRNAME / current / ABANDONED_FILENAME).touch()
+    return older[-1]
@@ -1,18 +1,31 @@
 import os
-import re
-import json
+import time
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
-import PyPDF2
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 import markdown
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 import sys
 sys.path.insert(0, str(Path(__file__).parent))
 from config import Config
+from manifest import IngestManifest, MANIFEST_FILENAME, file_hash, make_chunk_ids
+from pipeline import (
+    run_pipeline, ordered_map, length_buckets, sequential_batches,
+    AdaptiveBatchSizer, PaddingStats, ThroughputMeter
+)
+from embeddings import create_embeddings, CachedEmbeddings, TokenCounter
+from text_normalizer import TextNormalizer, NORMALIZER_VERSION, content_type_for
+from dedup import NearDuplicateIndex, DEDUP_INDEX_FILENAME
+from code_splitter import CodeSplitter, CODE_SPLITTER_VERSION
+from pdf_extract import extract_pdf_text
+from qa_store import QA_FILENAME, LEGACY_QA_FILENAME, find_qa_file, open_qa_store
+import index_store
+from vector_index import VectorIndex, open_index, backend_params
 
 class DocumentProcessor:
     """文档处理器，负责读取和清洗各种格式的文档"""
@@ -23,9 +36,14 @@ class DocumentProcessor:
             chunk_overlap=Config.CHUNK_OVERLAP,
             separators=["\n\n", "\n", " ", ""]
         )
+        # 代码文件按函数/类边界切分
+        self.code_splitter = CodeSplitter(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP)
+        self.normalizer = TextNormalizer()
+        # 模板生成的问答对大量共享同一答案，答案只清洗一次
+        self._cleaned_answers: Dict[str, str] = {}
     
-    def read_file(self, file_path: str) -> str:
-        """根据文件类型读取文件内容"""
+    def read_file(self, file_path: str, strict: bool = False) -> str:
+        """根据文件类型读取文件内容，strict=True 时读取异常向上抛出"""
         file_ext = Path(file_path).suffix.lower()
         
         try:
@@ -43,6 +61,8 @@ class DocumentProcessor:
                 print(f"不支持的文件类型: {file_ext}")
                 return ""
         except Exception as e:
+            if strict:
+                raise
             print(f"读取文件 {file_path} 时出错: {e}")
             return ""
     
@@ -61,13 +81,8 @@ class DocumentProcessor:
             return soup.get_text()
     
     def _read_pdf(self, file_path: str) -> str:
-        """读取PDF文件"""
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+        """读取PDF文件（按页并行，PyPDF2 提取不到文本的页改用 pdfplumber）"""
+        return extract_pdf_text(file_path)
     
     def _read_html(self, file_path: str) -> str:
         """读取HTML文件"""
@@ -81,37 +96,253 @@ class DocumentProcessor:
         with open(file_path, 'r', encoding='utf-8') as f:
             return f.read()
     
-    def clean_text(self, text: str) -> str:
-        """清洗文本"""
-        # 移除多余的空白字符
-        text = re.sub(r'\s+', ' ', text)
-        # 移除特殊字符
-        text = re.sub(r'[^\w\s\u4e00-\u9fff.,!?;:()[\]{}"\'-]', ' ', text)
-        # 移除过短的行
-        lines = [line.strip() for line in text.split('\n') if len(line.strip()) > 10]
-        return '\n'.join(lines)
+    def clean_text(self, text: str, content_type: str = 'prose') -> str:
+        """清洗文本，content_type 为 prose / code / qa，详见 TextNormalizer"""
+        return self.normalizer.normalize(text, content_type)
+    
+    def clean_qa_pair(self, question: str, answer: str) -> str:
+        """清洗问答对，结果与整体清洗 "问题: ...\n答案: ..." 相同"""
+        cleaned_answer = self._cleaned_answers.get(answer)
+        if cleaned_answer is None:
+            cleaned_answer = self.clean_text(f"答案: {answer}", 'qa')
+            self._cleaned_answers[answer] = cleaned_answer
+        return self.clean_text(f"问题: {question}", 'qa') + '\n' + cleaned_answer
+    
+    def load_source(self, file_path: Path) -> List[Document]:
+        """加载单个数据源，返回其中的文档"""
+        if file_path.name in (QA_FILENAME, LEGACY_QA_FILENAME):
+            return self.load_qa_pairs(file_path)
+        
+        doc = self.load_file(file_path)
+        return [doc] if doc else []
+    
+    def load_file(self, file_path: Path) -> Optional[Document]:
+        """读取并清洗单个文件"""
+        content = self.read_file(str(file_path), strict=True)
+        if not content:
+            return None
+        return self.build_document(file_path, content)
+    
+    def build_document(self, file_path: Path, content: str) -> Document:
+        """清洗已读取的文件内容并附加元数据"""
+        cleaned_content = self.clean_text(content, content_type_for(file_path.suffix.lower()))
+        metadata = {
+            'source': str(file_path),
+            'file_type': file_path.suffix.lower(),
+            'file_name': file_path.name,
+            'directory': file_path.parent.name
+        }
+        # 增强数据集中的论文文本
+        if file_path.parent.name == "texts" and file_path.parent.parent == self.enhanced_dir():
+            metadata['content_type'] = 'paper'
+        return Document(page_content=cleaned_content, metadata=metadata)
+    
+    @staticmethod
+    def enhanced_dir() -> Path:
+        """增强数据集（论文文本与问答对）所在目录"""
+        return Path(Config.DATA_DIRS.get('google_scholar_papers', './data/google_scholar_papers'))
+    
+    def load_qa_pairs(self, qa_file: Path) -> List[Document]:
+        """加载问答对
+        
+        模板生成的问答对中，同一概念的约20个问题共用一个答案。
+        开启 Config.QA_GROUP_BY_ANSWER 时按答案合并为一条记录（全部问题变体 + 答案），
+        只向量化一次，检索结果也不会被几乎相同的问答对占满。
+        """
+        qa_store = open_qa_store(qa_file)
+        
+        documents = self.build_qa_documents(qa_store, qa_file)
+        if Config.QA_GROUP_BY_ANSWER:
+            print(f"加载 {len(qa_store)} 个问答对，按答案合并为 {len(documents)} 条记录")
+        else:
+            print(f"加载 {len(qa_store)} 个问答对")
+        return documents
+    
+    def build_qa_documents(self, qa_pairs: Iterable[Dict[str, Any]], qa_file: Path) -> List[Document]:
+        """把问答对（列表或 QAStore 的流式遍历）清洗为文档"""
+        if Config.QA_GROUP_BY_ANSWER:
+            return self._group_qa_pairs(qa_pairs, qa_file)
+        
+        documents = []
+        for i, qa_pair in enumerate(qa_pairs):
+            question = qa_pair.get('question', '')
+            answer = qa_pair.get('answer', '')
+            source = qa_pair.get('source', '')
+            qa_type = qa_pair.get('type', 'unknown')
+            
+            # 将问答对转换为文档格式
+            cleaned_content = self.clean_qa_pair(question, answer)
+            
+            metadata = {
+                'source': f"qa_pairs_{i+1}",
+                'file_type': '.json',
+                'file_name': f"qa_pair_{i+1}.json",
+                'directory': qa_file.parent.name,
+                'content_type': 'qa_pair',
+                'qa_type': qa_type,
+                'original_source': source
+            }
+            
+            doc = Document(page_content=cleaned_content, metadata=metadata)
+            documents.append(doc)
+        
+        return documents
+    
+    def _group_qa_pairs(self, qa_pairs: Iterable[Dict[str, Any]], qa_file: Path) -> List[Document]:
+        """按答案合并问答对，每组保留首次出现的顺序，组内重复的问题只保留一次"""
+        groups: Dict[str, Dict[str, Any]] = {}
+        for i, qa_pair in enumerate(qa_pairs):
+            answer = qa_pair.get('answer', '')
+            group = groups.get(answer)
+            if group is None:
+                group = groups[answer] = {'first': i, 'questions': [], 'types': [], 'source': qa_pair.get('source', '')}
+            question = qa_pair.get('question', '')
+            if question not in group['questions']:
+                group['questions'].append(question)
+            qa_type = qa_pair.get('type', 'unknown')
+            if qa_type not in group['types']:
+                group['types'].append(qa_type)
+        
+        documents = []
+        for answer, group in groups.items():
+            first = group['first']
+            lines = [self.clean_text(f"问题: {question}", 'qa') for question in group['questions']]
+            lines.append(self.clean_text(f"答案: {answer}", 'qa'))
+            
+            metadata = {
+                'source': f"qa_pairs_{first+1}",
+                'file_type': '.json',
+                'file_name': f"qa_pair_{first+1}.json",
+                'directory': qa_file.parent.name,
+                'content_type': 'qa_group',
+                'qa_type': ','.join(group['types']),
+                'question_count': len(group['questions']),
+                'original_source': group['source']
+            }
+            documents.append(Document(page_content='\n'.join(filter(None, lines)), metadata=metadata))
+        
+        return documents
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
-        """分割文档"""
-        return self.text_splitter.split_documents(documents)
+        """分割文档，代码文件按语法边界切分并记录符号名和行范围"""
+        chunks = []
+        for doc in documents:
+            if content_type_for(doc.metadata.get('file_type', '')) == 'code':
+                chunks.extend(self.code_splitter.split_document(doc))
+            else:
+                chunks.extend(self.text_splitter.split_documents([doc]))
+        return chunks
+
+# 各加载进程内复用的文档处理器
+_worker_processor = None
+
+def _load_source_worker(path: str) -> Tuple[str, List[Document], Optional[str]]:
+    """进程池任务：加载单个数据源，异常只影响该文件"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DocumentProcessor()
+    try:
+        return path, _worker_processor.load_source(Path(path)), None
+    except Exception as e:
+        return path, [], str(e)
+
+def load_sources(paths: Iterable[Path], workers: int = None) -> Iterator[Tuple[Path, List[Document], Optional[str]]]:
+    """并行读取并清洗数据源，按输入顺序产出 (路径, 文档列表, 错误信息)
+    
+    workers 默认取 Config.LOAD_WORKERS（0 表示 CPU 核数），为 1 时在当前进程内串行加载。
+    同时在途的任务数限制在 workers 的两倍，下游处理慢时不会堆积已解析的文档。
+    """
+    if workers is None:
+        workers = Config.LOAD_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    
+    if workers <= 1:
+        for path in paths:
+            _, documents, error = _load_source_worker(str(path))
+            yield path, documents, error
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for path in paths:
+            in_flight.append((path, executor.submit(_load_source_worker, str(path))))
+            if len(in_flight) >= workers * 2:
+                done_path, future = in_flight.popleft()
+                _, documents, error = future.result()
+                yield done_path, documents, error
+        while in_flight:
+            done_path, future = in_flight.popleft()
+            _, documents, error = future.result()
+            yield done_path, documents, error
+
+def discover_sources(report_missing: bool = True) -> Dict[str, Path]:
+    """发现 Config.DATA_DIRS 中的所有数据源，返回 数据源键 -> 文件路径（按路径排序、去重）"""
+    sources = {}
+    
+    for dir_name, dir_path in Config.DATA_DIRS.items():
+        directory_path = Path(dir_path)
+        if not directory_path.exists():
+            if report_missing:
+                print(f"目录不存在: {dir_path}")
+            continue
+        for file_path in sorted(directory_path.rglob('*')):
+            if file_path.is_file() and file_path.suffix.lower() in Config.SUPPORTED_EXTENSIONS:
+                sources.setdefault(str(file_path), file_path)
+    
+    # 问答对文件作为一个整体数据源
+    qa_file = find_qa_file(DocumentProcessor.enhanced_dir())
+    if qa_file:
+        sources[str(qa_file)] = qa_file
+    
+    return sources
+
+# 同一进程内的摄取（界面按钮、文件监听）串行执行，避免同时改写向量库和清单；
+# 跨进程由 index_store.ingest_lock() 串行
+_sync_lock = threading.Lock()
+
+def is_dedup_target(metadata: Dict[str, Any]) -> bool:
+    """代码示例本身就是克隆检测的研究对象，相似的示例都要保留，不参与近重复去重"""
+    return content_type_for(metadata.get('file_type', '')) != 'code'
 
 class DataIngestor:
     """数据摄取器，负责处理整个数据摄取流程"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        embed_batch_size: int = None,
+        upsert_batch_size: int = None,
+        adaptive_batch: bool = None,
+        embed_workers: int = None
+    ):
         self.processor = DocumentProcessor()
-        # 使用 HuggingFace 的中文 Embedding 模型
-        import torch
+        # 向量化（模型前向）与写入（向量库 upsert）使用各自的批大小
+        self.embed_batch_size = embed_batch_size or Config.EMBED_BATCH_SIZE
+        self.upsert_batch_size = upsert_batch_size or Config.UPSERT_BATCH_SIZE
+        self.adaptive_batch = Config.ADAPTIVE_BATCH if adaptive_batch is None else adaptive_batch
+        self.max_embed_batch_size = max(self.embed_batch_size, Config.EMBED_BATCH_SIZE_MAX)
+        # 多个向量化进程并发处理不同批次，批次耗时互相影响，此时不做自适应调节
+        self.embed_workers = Config.EMBED_WORKERS if embed_workers is None else embed_workers
+        if self.embed_workers <= 0:
+            self.embed_workers = os.cpu_count() or 1
+        if self.embed_workers > 1:
+            self.adaptive_batch = False
+        # 按长度分桶：分词器在第一次向量化时加载
+        self.bucket_batches = max(1, Config.EMBED_BUCKET_BATCHES)
+        self.padding_stats = PaddingStats()
+        self._token_counter = None
+        # 使用 HuggingFace 的中文 Embedding 模型（EMBEDDING_BACKEND 为 onnx / onnx-int8 时用 ONNX Runtime 运行）
         # 临时强制使用 CPU
         device = 'cpu'
         print(f"⚠️ Embedding 使用 CPU 模式（RTX 5060 需要更新的 PyTorch）")
         
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="BAAI/bge-small-zh-v1.5",  # 中文向量模型，轻量高效
-            model_kwargs={'device': device},
-            encode_kwargs={'normalize_embeddings': True}
-        )
-        print(f"Embedding 模型加载完成: BAAI/bge-small-zh-v1.5 (设备: {device})")
+        # 模型内部的批大小取上限，保证每次调用只做一次前向计算
+        self.embeddings = create_embeddings(device, batch_size=self.max_embed_batch_size, workers=self.embed_workers)  # 中文向量模型，轻量高效
+        print(f"Embedding 模型加载完成: {Config.EMBEDDING_MODEL} (设备: {device}, 后端: {Config.EMBEDDING_BACKEND})")
+    
+    def discover_sources(self) -> Dict[str, Path]:
+        """发现所有数据源，返回 数据源键 -> 文件路径（按路径排序、去重）"""
+        return discover_sources()
     
     def load_documents_from_directory(self, directory: str) -> List[Document]:
         """从目录加载所有文档"""
@@ -122,157 +353,475 @@ class DataIngestor:
             print(f"目录不存在: {directory}")
             return documents
         
-        # 首先处理普通文档文件
-        for file_path in directory_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in Config.SUPPORTED_EXTENSIONS:
-                print(f"正在处理文件: {file_path}")
-                content = self.processor.read_file(str(file_path))
-                if content:
-                    cleaned_content = self.processor.clean_text(content)
-                    metadata = {
-                        'source': str(file_path),
-                        'file_type': file_path.suffix.lower(),
-                        'file_name': file_path.name,
-                        'directory': file_path.parent.name
-                    }
-                    doc = Document(page_content=cleaned_content, metadata=metadata)
-                    documents.append(doc)
-        
-        # 处理用户提供的论文数据（如果有）
-        processed_dir = Path("data/google_scholar_papers")
-        if processed_dir.exists():
-            documents.extend(self._load_enhanced_dataset(processed_dir))
+        paths = [
+            file_path for file_path in sorted(directory_path.rglob('*'))
+            if file_path.is_file() and file_path.suffix.lower() in Config.SUPPORTED_EXTENSIONS
+        ]
+        # 处理用户提供的论文问答对（如果有）
+        qa_file = find_qa_file(directory_path)
+        if qa_file:
+            paths.append(qa_file)
+        
+        for file_path, docs, error in load_sources(paths):
+            if error:
+                print(f"读取文件 {file_path} 时出错: {error}")
+                continue
+            print(f"已处理文件: {file_path}")
+            documents.extend(docs)
         
         return documents
     
-    def _load_enhanced_dataset(self, enhanced_dir: Path) -> List[Document]:
-        """加载增强数据集"""
-        documents = []
+    def _ingest_params(self) -> Dict[str, Any]:
+        """影响向量库内容的参数，记录在摄取清单中"""
+        return {
+            'chunk_size': Config.CHUNK_SIZE,
+            'chunk_overlap': Config.CHUNK_OVERLAP,
+            'text_normalizer': NORMALIZER_VERSION,
+            'code_splitter': CODE_SPLITTER_VERSION,
+            'qa_group_by_answer': Config.QA_GROUP_BY_ANSWER,
+            'dedup_threshold': Config.DEDUP_THRESHOLD,
+            'embedding_model': Config.EMBEDDING_MODEL,
+            **backend_params()
+        }
+    
+    def _open_vector_store(self, index_dir: Path = None, backend: str = None) -> VectorIndex:
+        """打开（或新建）持久化的向量索引，默认打开当前生效的版本"""
+        return open_index(index_dir or index_store.active_index_dir(), backend, embedding_function=self.embeddings)
+    
+    def _load_dedup_index(self, vector_store: VectorIndex, manifest: IngestManifest) -> Optional[NearDuplicateIndex]:
+        """打开近重复索引，关闭去重时返回 None
         
-        # 处理论文文本文件
-        texts_dir = enhanced_dir / "texts"
-        if texts_dir.exists():
-            for file_path in texts_dir.rglob('*.txt'):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    if content:
-                        cleaned_content = self.processor.clean_text(content)
-                        metadata = {
-                            'source': str(file_path),
-                            'file_type': '.txt',
-                            'file_name': file_path.name,
-                            'directory': enhanced_dir.name,
-                            'content_type': 'paper'
-                        }
-                        doc = Document(page_content=cleaned_content, metadata=metadata)
-                        documents.append(doc)
-                        print(f"加载增强论文: {file_path.name}")
-                except Exception as e:
-                    print(f"加载增强论文失败 {file_path}: {e}")
-        
-        # 处理问答对
-        qa_file = enhanced_dir / "qa_pairs.json"
-        if qa_file.exists():
-            try:
-                with open(qa_file, 'r', encoding='utf-8') as f:
-                    qa_pairs = json.load(f)
-                
-                for i, qa_pair in enumerate(qa_pairs):
-                    question = qa_pair.get('question', '')
-                    answer = qa_pair.get('answer', '')
-                    source = qa_pair.get('source', '')
-                    qa_type = qa_pair.get('type', 'unknown')
-                    
-                    # 将问答对转换为文档格式
-                    qa_content = f"问题: {question}\n答案: {answer}"
-                    cleaned_content = self.processor.clean_text(qa_content)
-                    
-                    metadata = {
-                        'source': f"qa_pairs_{i+1}",
-                        'file_type': '.json',
-                        'file_name': f"qa_pair_{i+1}.json",
-                        'directory': enhanced_dir.name,
-                        'content_type': 'qa_pair',
-                        'qa_type': qa_type,
-                        'original_source': source
-                    }
-                    
-                    doc = Document(page_content=cleaned_content, metadata=metadata)
-                    documents.append(doc)
-                
-                print(f"加载 {len(qa_pairs)} 个问答对")
-            except Exception as e:
-                print(f"加载问答对失败: {e}")
+        索引保存向量库中每个块的 MinHash 签名；旧版数据库没有索引文件时，从向量库中的文本补建一次。
+        """
+        if Config.DEDUP_THRESHOLD <= 0:
+            return None
+        index_path = manifest.path.parent / DEDUP_INDEX_FILENAME
+        if not manifest.sources:
+            return NearDuplicateIndex(Config.DEDUP_THRESHOLD)
         
-        return documents
+        index = NearDuplicateIndex.load(str(index_path), Config.DEDUP_THRESHOLD)
+        if not index_path.exists():
+            print("🔄 为已有文档块建立去重索引...")
+            stored = vector_store.get()
+            for chunk_id, text, metadata in zip(stored['ids'], stored['documents'], stored['metadatas']):
+                if is_dedup_target(metadata or {}):
+                    index.add(chunk_id, index.signature(text))
+        return index
+    
+    def _refresh_metadata(self, vector_store: VectorIndex, metadatas: Dict[str, Dict[str, Any]]) -> int:
+        """更新内容未变但元数据变化的块（如文件中位置移动的函数），返回更新的块数
+        
+        块ID只由来源和内容决定，这些块不会重新向量化，只合并更新元数据字段。
+        """
+        if not metadatas:
+            return 0
+        stored = vector_store.get(list(metadatas))
+        ids, updates = [], []
+        for chunk_id, old in zip(stored['ids'], stored['metadatas']):
+            new = metadatas[chunk_id]
+            if any((old or {}).get(key) != value for key, value in new.items()):
+                ids.append(chunk_id)
+                updates.append(new)
+        if ids:
+            vector_store.update_metadata(ids, updates)
+        return len(ids)
+    
+    def _update_provenance(self, vector_store: VectorIndex, provenance: Dict[str, List[str]]):
+        """在代表块的元数据中记录被合并的近重复块来自哪些数据源"""
+        if not provenance:
+            return
+        ids = list(provenance)
+        metadatas = [
+            {
+                'duplicate_sources': '; '.join(sorted(set(provenance[chunk_id]))),
+                'duplicate_count': len(provenance[chunk_id])
+            }
+            for chunk_id in ids
+        ]
+        vector_store.update_metadata(ids, metadatas)
     
-    def create_vector_store(self, documents: List[Document]) -> Chroma:
+    def _embed_stage(self, chunks: Iterator[Tuple[Document, str]]) -> Iterator[Tuple[List[Document], List[str], List[List[float]]]]:
+        """向量化阶段：每次取 EMBED_BUCKET_BATCHES 批文本，按 token 数分桶后分批计算向量，再按原顺序产出
+        
+        开启自适应时根据实测吞吐量调整批大小；使用多个向量化进程时，同时在途的批次数等于进程数。
+        """
+        sizer = AdaptiveBatchSizer(
+            self.embed_batch_size,
+            self.max_embed_batch_size if self.adaptive_batch else None
+        )
+        
+        window = []
+        for item in chunks:
+            window.append(item)
+            if len(window) >= sizer.size * self.bucket_batches:
+                yield self._embed_window(window, sizer)
+                window = []
+        if window:
+            yield self._embed_window(window, sizer)
+    
+    def _embed_window(self, window: List[Tuple[Document, str]], sizer: AdaptiveBatchSizer) -> Tuple[List[Document], List[str], List[List[float]]]:
+        docs = [chunk for chunk, _ in window]
+        ids = [chunk_id for _, chunk_id in window]
+        texts = [doc.page_content for doc in docs]
+        
+        batch_size = sizer.size
+        if self.bucket_batches > 1:
+            if self._token_counter is None:
+                self._token_counter = TokenCounter()
+            lengths = self._token_counter(texts)
+            batches = length_buckets(lengths, batch_size)
+            self.padding_stats.add(lengths, batch_size, batches)
+        else:
+            lengths = np.ones(len(texts))
+            batches = sequential_batches(len(texts), batch_size)
+        mean_length = lengths.mean()
+        
+        def embed(batch):
+            start = time.perf_counter()
+            batch_vectors = self.embeddings.embed_documents([texts[i] for i in batch])
+            # 分桶后各批的文本长短不一，耗时按窗口平均长度折算后再交给自适应调节
+            seconds = (time.perf_counter() - start) * mean_length / lengths[batch].mean()
+            previous_size = sizer.size
+            sizer.record(len(batch), seconds)
+            if sizer.size != previous_size:
+                print(f"向量化批大小调整为: {sizer.size}")
+            return batch, batch_vectors
+        
+        vectors = [None] * len(texts)
+        for batch, batch_vectors in ordered_map(embed, batches, self.embed_workers):
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+        return docs, ids, vectors
+    
+    def _write_batches(
+        self,
+        vector_store: VectorIndex,
+        batches: Iterator[Tuple[List[Document], List[str], List[List[float]]]],
+        meter: ThroughputMeter
+    ) -> int:
+        """写入阶段：把已向量化的批次按 upsert 批大小合并后写入向量数据库，返回写入的块数"""
+        docs, ids, vectors = [], [], []
+        
+        def flush():
+            vector_store.upsert(
+                ids,
+                vectors,
+                [doc.metadata for doc in docs],
+                [doc.page_content for doc in docs]
+            )
+            meter.add_written(len(ids))
+            print(f"处理进度: {meter.format()}")
+            docs.clear()
+            ids.clear()
+            vectors.clear()
+        
+        for batch_docs, batch_ids, batch_vectors in batches:
+            docs.extend(batch_docs)
+            ids.extend(batch_ids)
+            vectors.extend(batch_vectors)
+            if len(ids) >= self.upsert_batch_size:
+                flush()
+        if ids:
+            flush()
+        
+        return meter.written
+    
+    def create_vector_store(self, documents: List[Document]) -> VectorIndex:
         """创建向量数据库"""
         if not documents:
             print("没有文档可以处理")
             return None
         
         print(f"正在处理 {len(documents)} 个文档...")
-        split_docs = self.processor.split_documents(documents)
-        print(f"分割后得到 {len(split_docs)} 个文档块")
         
-        # 批量处理向量化
+        meter = ThroughputMeter(len(documents))
+        self.padding_stats = PaddingStats()
+        index = NearDuplicateIndex(Config.DEDUP_THRESHOLD) if Config.DEDUP_THRESHOLD > 0 else None
+        provenance: Dict[str, List[str]] = {}
+        
+        def split_stage(docs: Iterator[Document]) -> Iterator[Tuple[Document, str]]:
+            # 按来源生成确定性ID，重复写入时覆盖而不是追加
+            for doc in docs:
+                chunks = self.processor.split_documents([doc])
+                items = []
+                for chunk, chunk_id in zip(chunks, make_chunk_ids(doc.metadata.get('source', ''), chunks)):
+                    if index is not None and is_dedup_target(chunk.metadata):
+                        signature = index.signature(chunk.page_content)
+                        match = index.find(signature)
+                        if match:
+                            provenance.setdefault(match[0], []).append(chunk.metadata.get('source', ''))
+                            continue
+                        index.add(chunk_id, signature)
+                    items.append((chunk, chunk_id))
+                meter.source_done(len(items))
+                yield from items
+        
         print("开始向量化处理...")
-        batch_size = 100  # 批量大小
+        vector_store = self._open_vector_store()
+        written = self._write_batches(vector_store, run_pipeline(documents, [split_stage, self._embed_stage]), meter)
+        self._update_provenance(vector_store, provenance)
         
-        for i in range(0, len(split_docs), batch_size):
-            batch = split_docs[i:i+batch_size]
-            print(f"处理进度: {i+batch_size}/{len(split_docs)} ({(i+batch_size)/len(split_docs)*100:.1f}%)")
+        # 持久化
+        vector_store.persist()
+        skipped = sum(len(v) for v in provenance.values())
+        print(f"向量数据库已保存到: {index_store.active_index_dir()}（写入 {written} 个文档块，跳过近重复块 {skipped} 个）")
+        if self.padding_stats.tokens:
+            print(self.padding_stats.format())
+        
+        return vector_store
+    
+    def sync_vector_store(
+        self,
+        manifest: IngestManifest,
+        rebuild_all: bool = False,
+        changed: Optional[Iterable[str]] = None
+    ) -> VectorIndex:
+        """按摄取清单增量同步向量数据库
+        
+        只重新处理内容哈希变化的数据源，只向量化新增的块，
+        并删除已修改或已删除数据源中不再存在的块。
+        
+        读取 → 清洗 → 分块 → 去重 → 向量化 → 写入 以流水线方式运行，
+        第一个文件分块完成即开始向量化，内存中只保留有界队列里的少量批次。
+        
+        新块与向量库中已有块的估计 Jaccard 相似度达到 Config.DEDUP_THRESHOLD 时不再写入，
+        清单记录它对应的代表块；代表块被删除后，引用它的数据源会在同一次同步中重新处理。
+        
+        changed 为已知发生变化的数据源键（如文件监听得到的路径）时只对这些数据源计算哈希，
+        已删除的数据源仍通过与清单对比发现。
+        
+        向量数据库位于摄取清单所在的目录，后端由清单中的参数决定（旧清单没有记录时为 Chroma）。
+        """
+        index_dir = manifest.path.parent
+        vector_store = self._open_vector_store(index_dir, manifest.params.get('vector_backend', 'chroma'))
+        sources = self.discover_sources()
+        # 缓存计数在 embeddings 对象的整个生命周期内累计，这里只报告本次同步的增量
+        cache_start = None
+        if isinstance(self.embeddings, CachedEmbeddings):
+            cache_start = (self.embeddings.hits, self.embeddings.misses)
+        index = self._load_dedup_index(vector_store, manifest)
+        
+        stale_ids = []
+        stats = {'changed': 0, 'removed': 0, 'duplicates': 0}
+        # 近重复来源发生变化、需要更新溯源信息的代表块
+        affected_reps = set()
+        
+        # 已删除的数据源
+        for unit_key in list(manifest.sources):
+            if unit_key not in sources:
+                affected_reps.update(manifest.get_duplicates(unit_key).values())
+                stale_ids.extend(manifest.remove(unit_key))
+                stats['removed'] += 1
+                print(f"数据源已删除: {unit_key}")
+        if index is not None:
+            for chunk_id in stale_ids:
+                index.remove(chunk_id)
+        
+        # 新增或修改的数据源
+        self.padding_stats = PaddingStats()
+        pending: Dict[str, str] = {}
+        # 内容未变、沿用旧ID的块的最新元数据（代码块的行号、问答组的来源等可能已变化），写入完成后统一核对
+        kept_metadata: Dict[str, Dict[str, Any]] = {}
+        candidates = sources if changed is None else {k: sources[k] for k in changed if k in sources}
+        for unit_key, file_path in candidates.items():
+            try:
+                content_hash = file_hash(str(file_path))
+            except OSError as e:
+                print(f"读取文件 {file_path} 时出错: {e}")
+                continue
             
-            if i == 0:
-                # 第一批创建向量数据库
-                vector_store = Chroma.from_documents(
-                    documents=batch,
-                    embedding=self.embeddings,
-                    persist_directory=Config.CHROMA_PERSIST_DIRECTORY
-                )
-            else:
-                # 后续批次添加到现有数据库
-                vector_store.add_documents(batch)
+            if rebuild_all or manifest.get_hash(unit_key) != content_hash:
+                pending[unit_key] = content_hash
+        
+        def split_stage(loaded: Iterator[Tuple[Path, List[Document], Optional[str]]]) -> Iterator[Tuple[Document, str]]:
+            for file_path, documents, error in loaded:
+                unit_key = str(file_path)
+                if error:
+                    # 加载失败时保留旧块和旧哈希，下次摄取会重试
+                    print(f"读取文件 {file_path} 时出错: {error}")
+                    continue
+                
+                print(f"已处理文件: {file_path}")
+                chunks = self.processor.split_documents(documents)
+                chunk_ids = make_chunk_ids(unit_key, chunks)
+                
+                old_ids = set(manifest.get_chunk_ids(unit_key))
+                affected_reps.update(manifest.get_duplicates(unit_key).values())
+                kept_ids, duplicates, new_items = [], {}, []
+                for chunk, chunk_id in zip(chunks, chunk_ids):
+                    if chunk_id in old_ids:
+                        kept_ids.append(chunk_id)
+                        kept_metadata[chunk_id] = chunk.metadata
+                        continue
+                    if index is not None and is_dedup_target(chunk.metadata):
+                        signature = index.signature(chunk.page_content)
+                        match = index.find(signature)
+                        if match:
+                            duplicates[chunk_id] = match[0]
+                            continue
+                        index.add(chunk_id, signature)
+                    kept_ids.append(chunk_id)
+                    new_items.append((chunk, chunk_id))
+                
+                removed_ids = old_ids - set(kept_ids)
+                stale_ids.extend(removed_ids)
+                if index is not None:
+                    for chunk_id in removed_ids:
+                        index.remove(chunk_id)
+                affected_reps.update(duplicates.values())
+                stats['duplicates'] += len(duplicates)
+                
+                meter.source_done(len(new_items))
+                yield from new_items
+                
+                manifest.update(unit_key, pending[unit_key], kept_ids, duplicates)
+                stats['changed'] += 1
+        
+        written = 0
+        batch_keys = list(pending)
+        retried = set()
+        while True:
+            if batch_keys:
+                meter = ThroughputMeter(len(batch_keys))
+                written += self._write_batches(vector_store, run_pipeline(
+                    [sources[k] for k in batch_keys],
+                    [load_sources, split_stage, self._embed_stage]
+                ), meter)
+            
+            # 代表块已被删除的近重复块需要重新判定（保留或改挂到其他代表块）
+            deleted = set(stale_ids)
+            batch_keys = [
+                unit_key for unit_key in manifest.sources
+                if unit_key in sources and unit_key not in retried
+                and any(rep in deleted for rep in manifest.get_duplicates(unit_key).values())
+            ]
+            if not batch_keys:
+                break
+            for unit_key in batch_keys:
+                retried.add(unit_key)
+                pending[unit_key] = manifest.get_hash(unit_key)
+                print(f"近重复块的代表块已删除，重新处理: {unit_key}")
+        
+        # 新块全部写入后再删除旧块，同步过程中不会出现检索空洞
+        if stale_ids:
+            vector_store.delete(stale_ids)
+        refreshed = self._refresh_metadata(vector_store, kept_metadata)
+        
+        if index is not None:
+            deleted = set(stale_ids)
+            provenance: Dict[str, List[str]] = {rep: [] for rep in affected_reps if rep not in deleted}
+            for unit_key in manifest.sources:
+                for rep in manifest.get_duplicates(unit_key).values():
+                    if rep in provenance:
+                        provenance[rep].append(unit_key)
+            self._update_provenance(vector_store, provenance)
+        
+        print(f"变更数据源: {stats['changed']} 个，删除数据源: {stats['removed']} 个，"
+              f"新增块: {written} 个，移除块: {len(stale_ids)} 个，更新元数据: {refreshed} 个，"
+              f"跳过近重复块: {stats['duplicates']} 个")
+        if cache_start is not None:
+            print(f"向量缓存命中: {self.embeddings.hits - cache_start[0]} 条，"
+                  f"新计算: {self.embeddings.misses - cache_start[1]} 条")
+        if self.padding_stats.tokens:
+            print(self.padding_stats.format())
         
-        # 持久化
         vector_store.persist()
-        print(f"向量数据库已保存到: {Config.CHROMA_PERSIST_DIRECTORY}")
+        manifest.save()
+        if index is not None:
+            index.save(str(index_dir / DEDUP_INDEX_FILENAME))
+        print(f"向量数据库已保存到: {index_dir}（共 {manifest.total_chunks()} 个文档块）")
         
         return vector_store
     
-    def ingest_all_data(self, force_refresh: bool = False) -> Chroma:
-        """摄取所有数据目录中的文档"""
-        # 检查是否已有向量数据库
-        if not force_refresh and os.path.exists(Config.CHROMA_PERSIST_DIRECTORY):
+    def _manifest_path(self) -> Path:
+        return index_store.active_index_dir() / MANIFEST_FILENAME
+    
+    def ingest_all_data(self, force_refresh: bool = False) -> VectorIndex:
+        """摄取所有数据目录中的文档
+        
+        存在摄取清单且参数未变时，在当前版本上增量处理变化的文件；
+        force_refresh=True、还没有清单或摄取参数变化时，蓝绿重建一个新版本并原子切换。
+        """
+        with _sync_lock, index_store.ingest_lock():
+            return self._ingest_all_data(force_refresh)
+    
+    def update_sources(self, changed: Optional[Iterable[str]] = None) -> VectorIndex:
+        """把已知发生变化的数据源增量同步到向量数据库（供文件监听使用）
+        
+        changed 为 None 时检查全部数据源。还没有摄取清单或摄取参数变化时改为蓝绿重建。
+        """
+        with _sync_lock, index_store.ingest_lock():
+            manifest = IngestManifest.load(str(self._manifest_path()))
+            if manifest is None or not manifest.same_params(self._ingest_params()):
+                return self.rebuild_index()
+            return self.sync_vector_store(manifest, changed=changed)
+    
+    def _ingest_all_data(self, force_refresh: bool) -> VectorIndex:
+        params = self._ingest_params()
+        manifest = None if force_refresh else IngestManifest.load(str(self._manifest_path()))
+        
+        # 没有清单的旧版数据库：保持原有行为，直接加载
+        if manifest is None and not force_refresh and (index_store.active_index_dir() / "chroma.sqlite3").exists():
             try:
-                # 尝试加载现有数据库
-                vector_store = Chroma(
-                    persist_directory=Config.CHROMA_PERSIST_DIRECTORY,
-                    embedding_function=self.embeddings
-                )
+                vector_store = self._open_vector_store(backend='chroma')
                 print("✅ 已加载现有向量数据库，跳过数据摄取")
-                print("💡 如需重新摄取，请使用 force_refresh=True")
+                print("💡 如需重新摄取，请使用 force_refresh=True（重建后将支持增量更新）")
                 return vector_store
             except Exception as e:
                 print(f"⚠️ 加载现有数据库失败: {e}")
                 print("🔄 重新进行数据摄取...")
         
-        all_documents = []
+        if manifest is not None and manifest.same_params(params):
+            vector_store = self.sync_vector_store(manifest)
+            if manifest.total_chunks() == 0:
+                print("没有找到任何文档")
+                return None
+            return vector_store
         
-        for dir_name, dir_path in Config.DATA_DIRS.items():
-            print(f"\n正在处理目录: {dir_name}")
-            documents = self.load_documents_from_directory(dir_path)
-            all_documents.extend(documents)
-            print(f"从 {dir_name} 加载了 {len(documents)} 个文档")
+        if manifest is not None:
+            # 分块参数或向量模型变化：在新版本中重建，内容未变的块从向量缓存中取回
+            print("🔄 摄取参数已变化，重建向量数据库...")
+        return self.rebuild_index()
+    
+    def rebuild_index(self) -> Optional[VectorIndex]:
+        """蓝绿重建：在新的版本目录中全量构建，校验通过后原子切换为当前版本
         
-        if all_documents:
-            return self.create_vector_store(all_documents)
-        else:
-            print("没有找到任何文档")
-            return None
+        重建期间正在运行的检索继续读取旧版本；校验失败时丢弃新版本，当前版本不受影响。
+        切换后按 Config.INDEX_KEEP_VERSIONS 清理旧版本，保留的旧版本可用于回滚。
+        """
+        version_dir = index_store.new_version_dir()
+        print(f"🔄 在新版本中重建向量数据库: {version_dir}")
+        manifest = IngestManifest(str(version_dir / MANIFEST_FILENAME), self._ingest_params())
+        
+        try:
+            vector_store = self.sync_vector_store(manifest)
+            if manifest.total_chunks() == 0:
+                print("没有找到任何文档")
+                index_store.discard_version(version_dir.name)
+                return None
+            self.validate_index(vector_store, manifest)
+        except Exception:
+            index_store.discard_version(version_dir.name)
+            raise
+        
+        index_store.activate_version(version_dir.name)
+        print(f"✅ 已切换到新版本: {version_dir.name}")
+        removed = index_store.collect_garbage()
+        if removed:
+            print(f"已清理旧版本: {', '.join(removed)}")
+        return vector_store
+    
+    def validate_index(self, vector_store: VectorIndex, manifest: IngestManifest):
+        """切换前校验新版本：向量数量与清单一致，且冒烟查询能返回结果"""
+        count = vector_store.count()
+        expected = manifest.total_chunks()
+        if count != expected:
+            raise RuntimeError(f"新版本校验失败：向量数量 {count} 与摄取清单记录的 {expected} 不一致")
+        
+        hits = vector_store.search(self.embeddings.embed_query("代码克隆检测"), k=1)
+        if not hits or not hits[0][0].page_content:
+            raise RuntimeError("新版本校验失败：冒烟查询没有返回结果")
+        print(f"新版本校验通过：{count} 个文档块")
 
 def main():
     """主函数，用于测试数据摄取功能"""
@@ -283,9 +832,9 @@ def main():
         print("数据摄取完成!")
         # 测试检索
         query = "什么是代码克隆检测?"
-        docs = vector_store.similarity_search(query, k=3)
+        hits = vector_store.search(ingestor.embeddings.embed_query(query), k=3)
         print(f"\n测试检索 '{query}' 的结果:")
-        for i, doc in enumerate(docs, 1):
+        for i, (doc, _) in enumerate(hits, 1):
             print(f"\n文档 {i}:")
             print(f"来源: {doc.metadata.get('source', 'Unknown')}")
             print(f"内容: {doc.page_content[:200]}...")
@@ -0,0 +1,107 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from langchain.docstore.document import Document
+
+# 清单文件与向量数据库放在同一目录，两者同生共灭
+MANIFEST_FILENAME = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_hash(file_path: str) -> str:
+    """计算文件内容的 SHA-256 哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_ids(unit_key: str, chunks: List[Document]) -> List[str]:
+    """为文档块生成确定性ID
+
+    ID 只由来源和块内容决定（同一来源内重复出现的相同内容按出现次序区分），
+    因此文件修改后未变化的块保持原ID，无需重新向量化。
+    """
+    seen: Dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        text = chunk.page_content
+        occurrence = seen.get(text, 0)
+        seen[text] = occurrence + 1
+        key = f"{unit_key}\x00{occurrence}\x00{text}"
+        ids.append(hashlib.sha1(key.encode('utf-8')).hexdigest())
+    return ids
+
+
+class IngestManifest:
+    """摄取清单，记录每个数据源的内容哈希、已写入的块ID、近重复块的去向以及生成这些块的参数"""
+
+    def __init__(self, path: str, params: Dict[str, Any]):
+        self.path = Path(path)
+        self.params = dict(params)
+        self.sources: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IngestManifest"]:
+        """读取清单，不存在或格式不兼容时返回 None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 读取摄取清单失败: {e}")
+            return None
+
+        if data.get('version') != MANIFEST_VERSION:
+            return None
+
+        manifest = cls(str(path), data.get('params', {}))
+        manifest.sources = data.get('sources', {})
+        return manifest
+
+    def save(self):
+        """原子地写入清单"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'params': self.params,
+                'sources': self.sources
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def same_params(self, params: Dict[str, Any]) -> bool:
+        """判断分块与向量化参数是否完全一致"""
+        return self.params == params
+
+    def get_hash(self, unit_key: str) -> Optional[str]:
+        entry = self.sources.get(unit_key)
+        return entry['hash'] if entry else None
+
+    def get_chunk_ids(self, unit_key: str) -> List[str]:
+        entry = self.sources.get(unit_key)
+        return list(entry['chunk_ids']) if entry else []
+
+    def get_duplicates(self, unit_key: str) -> Dict[str, str]:
+        """被判定为近重复而未写入的块：块ID -> 代表块ID"""
+        entry = self.sources.get(unit_key)
+        return dict(entry.get('duplicates', {})) if entry else {}
+
+    def update(self, unit_key: str, content_hash: str, chunk_ids: List[str], duplicates: Dict[str, str] = None):
+        self.sources[unit_key] = {'hash': content_hash, 'chunk_ids': list(chunk_ids)}
+        if duplicates:
+            self.sources[unit_key]['duplicates'] = dict(duplicates)
+
+    def remove(self, unit_key: str) -> List[str]:
+        """移除数据源，返回其原有的块ID"""
+        entry = self.sources.pop(unit_key, None)
+        return list(entry['chunk_ids']) if entry else []
+
+    def total_chunks(self) -> int:
+        return sum(len(entry['chunk_ids']) for entry in self.sources.values())
@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import sys
+sys.path.insert(0, str(Path(__file__).parent))
+from config import Config
+from pipeline import length_buckets
+
+# 导出目录布局：
+#   model.onnx        float32 模型（last_hidden_state 输出）
+#   model.int8.onnx   动态 int8 量化后的模型（权重 int8，激活运行时量化）
+#   tokenizer.json    快速分词器
+#   export.json       导出参数（模型名、最大序列长度）和每个模型文件与 PyTorch 的一致性校验结果
+ONNX_FILENAME = "model.onnx"
+INT8_FILENAME = "model.int8.onnx"
+EXPORT_INFO_FILENAME = "export.json"
+
+# 与 PyTorch 输出的最低余弦相似度，低于该值的导出结果不会启用
+PARITY_THRESHOLD = 0.99
+
+# 一致性校验使用的样本：中英文、代码和长短不一的文本
+PARITY_TEXTS = [
+    "代码克隆检测",
+    "什么是 Type-3 代码克隆？",
+    "基于抽象语法树的克隆检测方法对标识符重命名不敏感。",
+    "Deep learning based code clone detection with graph neural networks",
+    "def add(a, b):\n    return a + b",
+    "public static int max(int[] values) { int m = values[0]; for (int v : values) if (v > m) m = v; return m; }",
+    "SourcererCC 使用词袋模型和倒排索引，在大规模代码库上检测 Type-1 到 Type-3 克隆。" * 8,
+]
+
+
+def onnx_model_dir(model_name: str = None) -> Path:
+    """模型对应的 ONNX 导出目录"""
+    model_name = model_name or Config.EMBEDDING_MODEL
+    return Path(Config.ONNX_MODEL_DIR) / re.sub(r'[^\w.-]', '_', model_name)
+
+
+def export_onnx(model_name: str = None, output_dir: Path = None, quantize: bool = True) -> Path:
+    """把 HuggingFace 模型导出为 ONNX（可选动态 int8 量化），返回导出目录
+
+    导出只需执行一次，需要 torch、transformers 和 onnx；之后的推理只依赖 onnxruntime 和 tokenizers。
+    先导出到临时目录再整体替换，中断时不会留下不完整的模型。
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_name = model_name or Config.EMBEDDING_MODEL
+    output_dir = Path(output_dir or onnx_model_dir(model_name))
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=output_dir.name + '.', dir=output_dir.parent))
+    try:
+        print(f"导出 ONNX 模型: {model_name}")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = tokenizer(["代码克隆检测", "code clone"], padding=True, return_tensors='pt')
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+        dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                str(tmp_dir / ONNX_FILENAME),
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        # tokenizer.json 供推理端的 tokenizers 直接加载，不需要 transformers
+        tokenizer.save_pretrained(str(tmp_dir))
+
+        if quantize:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            print("动态 int8 量化...")
+            quantize_dynamic(str(tmp_dir / ONNX_FILENAME), str(tmp_dir / INT8_FILENAME), weight_type=QuantType.QInt8)
+
+        with open(tmp_dir / EXPORT_INFO_FILENAME, 'w', encoding='utf-8') as f:
+            json.dump({
+                'model_name': model_name,
+                'max_length': min(getattr(tokenizer, 'model_max_length', 512), 512),
+                'quantized': quantize,
+                'parity': {}
+            }, f, ensure_ascii=False, indent=2)
+
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"ONNX 模型已导出: {output_dir}")
+    return output_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """用 ONNX Runtime（CPU）运行导出的 bge 模型
+
+    与 sentence-transformers 的 bge 配置一致：取 [CLS] 位置的隐藏状态作为句向量并做 L2 归一化，
+    超过 max_length 个 token 的文本被截断。文本按 token 数分桶后分批，每批只填充到批内最长的文本。
+    """
+
+    def __init__(
+        self,
+        model_dir: Path,
+        quantized: bool = False,
+        batch_size: int = 32,
+        normalize: bool = True,
+        num_threads: int = None
+    ):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(f"ONNX 向量后端需要安装 onnxruntime 和 tokenizers: {e}") from e
+
+        self.model_dir = Path(model_dir)
+        self.quantized = quantized
+        self.batch_size = batch_size
+        self.normalize = normalize
+        model_path = self.model_dir / (INT8_FILENAME if quantized else ONNX_FILENAME)
+        if not model_path.exists():
+            raise FileNotFoundError(f"ONNX 模型不存在: {model_path}")
+
+        info_path = self.model_dir / EXPORT_INFO_FILENAME
+        info = json.loads(info_path.read_text(encoding='utf-8')) if info_path.exists() else {}
+        self.max_length = info.get('max_length', 512)
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / 'tokenizer.json'))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.pad_id = self.tokenizer.token_to_id('[PAD]') or 0
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        num_threads = Config.EMBEDDING_THREADS if num_threads is None else num_threads
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(model_path), options, providers=['CPUExecutionProvider'])
+        self._input_names = [item.name for item in self.session.get_inputs()]
+
+    def _run(self, encodings: list) -> np.ndarray:
+        """对一批分词结果做一次前向计算，填充到批内最长的文本"""
+        width = max(len(encoding.ids) for encoding in encodings)
+        features = {
+            'input_ids': np.full((len(encodings), width), self.pad_id, dtype=np.int64),
+            'attention_mask': np.zeros((len(encodings), width), dtype=np.int64),
+            'token_type_ids': np.zeros((len(encodings), width), dtype=np.int64)
+        }
+        for row, encoding in enumerate(encodings):
+            length = len(encoding.ids)
+            features['input_ids'][row, :length] = encoding.ids
+            features['attention_mask'][row, :length] = 1
+            features['token_type_ids'][row, :length] = encoding.type_ids
+        hidden = self.session.run(None, {name: features[name] for name in self._input_names})[0]
+        vectors = hidden[:, 0].astype(np.float32)
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.maximum(norms, 1e-12)
+        return vectors
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """按 token 数分桶后分批编码，返回与输入顺序一致的 (len(texts), dim) float32 矩阵"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        encodings = self.tokenizer.encode_batch(list(texts))
+        result = None
+        for batch in length_buckets([len(encoding.ids) for encoding in encodings], self.batch_size):
+            vectors = self._run([encodings[i] for i in batch])
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[batch] = vectors
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._run([self.tokenizer.encode(text)])[0].tolist()
+
+
+def parity(reference: Embeddings, candidate: Embeddings, texts: List[str] = None) -> np.ndarray:
+    """两个向量模型对同一批文本输出的逐条余弦相似度"""
+    texts = texts or PARITY_TEXTS
+    expected = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    actual = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    dot = np.sum(expected * actual, axis=1)
+    norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    return dot / np.maximum(norms, 1e-12)
+
+
+def _read_export_info(model_dir: Path) -> Dict:
+    info_path = model_dir / EXPORT_INFO_FILENAME
+    try:
+        return json.loads(info_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_parity(model_dir: Path, filename: str, cosines: np.ndarray) -> Dict:
+    """把一个模型文件的一致性校验结果写入 export.json（原子替换），返回该记录"""
+    record = {
+        'min': round(float(cosines.min()), 5),
+        'mean': round(float(cosines.mean()), 5),
+        'threshold': PARITY_THRESHOLD,
+        'passed': bool(cosines.min() >= PARITY_THRESHOLD)
+    }
+    info = _read_export_info(model_dir)
+    info.setdefault('parity', {})[filename] = record
+    tmp_path = model_dir / (EXPORT_INFO_FILENAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, model_dir / EXPORT_INFO_FILENAME)
+    return record
+
+
+def parity_record(quantized: bool, model_dir: Path = None) -> Optional[Dict]:
+    """export.json 中该模型文件的一致性校验结果；模型文件不存在或尚未校验时返回 None"""
+    model_dir = Path(model_dir or onnx_model_dir())
+    filename = INT8_FILENAME if quantized else ONNX_FILENAME
+    if not (model_dir / filename).exists():
+        return None
+    record = _read_export_info(model_dir).get('parity', {}).get(filename)
+    # 阈值调高后，按旧阈值通过的记录需要重新校验
+    if record is None or record.get('threshold', 0) < PARITY_THRESHOLD:
+        return None
+    return record
+
+
+def load_onnx_embeddings(
+    quantized: bool,
+    batch_size: int = None,
+    reference: Optional[Callable[[], Embeddings]] = None,
+    num_threads: int = None
+) -> OnnxEmbeddings:
+    """加载 ONNX 向量模型，导出目录中没有该模型文件时先导出
+
+    只加载 export.json 中有通过记录的模型文件。没有记录时调用 reference() 创建 PyTorch 模型做一致性校验，
+    并把结果记入 export.json（之后的加载不再需要 PyTorch）；最低余弦相似度低于 PARITY_THRESHOLD、
+    或没有记录又无法校验（reference 为 None）时报错，避免静默地用偏差过大的模型写入向量库。
+    """
+    model_dir = onnx_model_dir()
+    filename = INT8_FILENAME if quantized else ONNX_FILENAME
+    if not (model_dir / filename).exists():
+        export_onnx(output_dir=model_dir, quantize=True)
+
+    record = parity_record(quantized, model_dir)
+    if record is None and reference is None:
+        raise RuntimeError(f"ONNX 模型 {model_dir / filename} 尚未通过与 PyTorch 的一致性校验")
+    embeddings = OnnxEmbeddings(model_dir, quantized=quantized, batch_size=batch_size or 32, num_threads=num_threads)
+    if record is None:
+        cosines = parity(reference(), embeddings)
+        print(f"ONNX{' int8' if quantized else ''} 与 PyTorch 输出的余弦相似度: 最低 {cosines.min():.4f}，平均 {cosines.mean():.4f}")
+        record = _record_parity(model_dir, filename, cosines)
+    if not record['passed']:
+        raise RuntimeError(
+            f"ONNX 模型 {model_dir / filename} 与 PyTorch 输出不一致（最低余弦相似度 {record['min']:.4f} < {PARITY_THRESHOLD}），"
+            f"删除 {model_dir} 后重新导出或改用 torch 后端"
+        )
+    return embeddings
@@ -0,0 +1,164 @@
+import os
+import gzip
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+import sys
+sys.path.insert(0, str(Path(__file__).parent))
+from config import Config
+from manifest import file_hash
+
+# 提取逻辑（PyPDF2 / pdfplumber 的选择方式）变化时递增，旧版本的缓存自动失效
+EXTRACTOR_VERSION = 1
+
+# 页数少于该值时在当前进程内逐页提取，进程间传递的开销不划算
+PARALLEL_MIN_PAGES = 8
+
+# 按进程数缓存的进程池，多次调用复用
+_pools = {}
+
+
+def _default_workers() -> int:
+    """PDF_PAGE_WORKERS 为 0 时：主进程使用全部CPU核；已在子进程中（如按文件并行的加载进程池）时逐页串行"""
+    if Config.PDF_PAGE_WORKERS > 0:
+        return Config.PDF_PAGE_WORKERS
+    if multiprocessing.parent_process() is not None:
+        return 1
+    return os.cpu_count() or 1
+
+
+def _plumber_page(plumber, index: int) -> str:
+    try:
+        return plumber.pages[index].extract_text() or ""
+    except Exception:
+        return ""
+
+
+def extract_page_range(pdf_path: str, start: int, end: int, min_chars: int = None) -> List[str]:
+    """提取 [start, end) 页的文本
+
+    每页先用 PyPDF2 提取；出错或去掉空白后少于 min_chars 个字符（扫描页、复杂排版）时
+    改用 pdfplumber 提取该页，取两者中较长的结果。pdfplumber 只在需要时打开一次。
+    """
+    import PyPDF2
+    min_chars = Config.PDF_PAGE_MIN_CHARS if min_chars is None else min_chars
+    pages: List[str] = []
+    plumber = None
+    try:
+        with open(pdf_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            for index in range(start, min(end, len(reader.pages))):
+                try:
+                    text = reader.pages[index].extract_text() or ""
+                except Exception:
+                    text = ""
+                if len(text.strip()) < min_chars:
+                    if plumber is None:
+                        import pdfplumber
+                        try:
+                            plumber = pdfplumber.open(pdf_path)
+                        except Exception:
+                            plumber = False
+                    if plumber:
+                        fallback = _plumber_page(plumber, index)
+                        if len(fallback.strip()) > len(text.strip()):
+                            text = fallback
+                pages.append(text)
+    finally:
+        if plumber:
+            plumber.close()
+    return pages
+
+
+def page_count(pdf_path: str) -> int:
+    import PyPDF2
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+class PdfTextCache:
+    """按 PDF 内容哈希持久化缓存逐页提取结果
+
+    <cache_dir>/<哈希前两位>/<哈希>.v<提取器版本>-<PDF_PAGE_MIN_CHARS>.json.gz，内容为每页文本的 JSON 列表（gzip 压缩）。
+    键只由文件内容和提取参数决定，文件改名或移动后仍能命中。先写临时文件再原子替换，
+    多个加载进程可以同时读写；损坏的缓存文件按未命中处理并在提取后覆盖。
+    """
+
+    def __init__(self, cache_dir: str):
+        self.dir = Path(cache_dir)
+
+    def _path(self, content_hash: str) -> Path:
+        name = f"{content_hash}.v{EXTRACTOR_VERSION}-{Config.PDF_PAGE_MIN_CHARS}.json.gz"
+        return self.dir / content_hash[:2] / name
+
+    def get(self, content_hash: str) -> Optional[List[str]]:
+        try:
+            with gzip.open(self._path(content_hash), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def put(self, content_hash: str, pages: List[str]):
+        path = self._path(content_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(pages, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def extract_pdf_pages(pdf_path: str, workers: Optional[int] = None) -> List[str]:
+    """提取 PDF 的每页文本（按页码排列），配置了 PDF_TEXT_CACHE_DIR 时先查缓存"""
+    pdf_path = str(pdf_path)
+    if not Config.PDF_TEXT_CACHE_DIR:
+        return _extract_pages(pdf_path, workers)
+
+    cache = PdfTextCache(Config.PDF_TEXT_CACHE_DIR)
+    content_hash = file_hash(pdf_path)
+    pages = cache.get(content_hash)
+    if pages is None:
+        pages = _extract_pages(pdf_path, workers)
+        try:
+            cache.put(content_hash, pages)
+        except OSError as e:
+            print(f"⚠️ 写入 PDF 文本缓存失败: {e}")
+    return pages
+
+
+def _extract_pages(pdf_path: str, workers: Optional[int] = None) -> List[str]:
+    """按页并行提取 PDF 文本
+
+    页按连续区间分给 workers 个进程（每个进程只解析一次文件），pdfplumber 回退逐页决定。
+    页数少于 PARALLEL_MIN_PAGES 或 workers 为 1 时在当前进程内提取。
+    """
+    workers = _default_workers() if workers is None else max(1, workers)
+    if workers <= 1:
+        return extract_page_range(pdf_path, 0, sys.maxsize)
+    total = page_count(pdf_path)
+    if total < PARALLEL_MIN_PAGES:
+        return extract_page_range(pdf_path, 0, total)
+
+    # 区间数取进程数的两倍，页的提取耗时不均时负载更均衡
+    ranges = min(total, workers * 2)
+    bounds = [total * i // ranges for i in range(ranges + 1)]
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    futures = [
+        pool.submit(extract_page_range, pdf_path, bounds[i], bounds[i + 1])
+        for i in range(ranges) if bounds[i] < bounds[i + 1]
+    ]
+    pages: List[str] = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def extract_pdf_text(pdf_path: str, workers: Optional[int] = None, skip_empty: bool = False) -> str:
+    """提取 PDF 全文：各页文本按页序拼接，每页以换行结尾（空页也保留一个换行）
+
+    skip_empty 为 True 时跳过没有文本的页。
+    """
+    return "".join(text + "\n" for text in extract_pdf_pages(pdf_path, workers) if text or not skip_empty)
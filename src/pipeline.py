@@ -0,0 +1,232 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+import numpy as np
+
+# 阶段结束标记
+_DONE = object()
+
+
+class _StageError:
+    """在队列中传递上游阶段抛出的异常"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _pump(items: Iterable, out: queue.Queue, stop: threading.Event):
+    """在线程中运行一个阶段，把产出写入有界队列（队列满时阻塞，形成背压）"""
+    try:
+        for item in items:
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set():
+                return
+        result = _DONE
+    except BaseException as e:
+        result = _StageError(e)
+
+    while not stop.is_set():
+        try:
+            out.put(result, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _drain(source: queue.Queue) -> Iterator:
+    """把上游队列还原成迭代器"""
+    while True:
+        item = source.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: List[Callable[[Iterator], Iterator]],
+    queue_size: int = 8
+) -> Iterator:
+    """流式流水线：每个阶段在独立线程中运行，阶段之间用有界队列连接
+
+    每个阶段是一个 "迭代器 -> 迭代器" 的生成器函数；返回最后一个阶段的产出。
+    任一阶段出错时异常会传递给调用方，调用方提前退出时所有阶段随之停止。
+    内存占用只取决于 queue_size 和单个元素的大小，与数据总量无关。
+    """
+    stop = threading.Event()
+    upstream: Iterator = iter(source)
+    threads = []
+
+    for stage in stages:
+        channel: queue.Queue = queue.Queue(maxsize=queue_size)
+        thread = threading.Thread(target=_pump, args=(stage(upstream), channel, stop), daemon=True)
+        thread.start()
+        threads.append(thread)
+        upstream = _drain(channel)
+
+    try:
+        yield from upstream
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=1)
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """按固定大小分批"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ordered_map(func: Callable[[Any], Any], items: Iterable[Any], concurrency: int) -> Iterator[Any]:
+    """在线程池中并发执行 func，按输入顺序产出结果，同时在途的任务数不超过 concurrency"""
+    if concurrency <= 1:
+        for item in items:
+            yield func(item)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = deque()
+        for item in items:
+            in_flight.append(executor.submit(func, item))
+            if len(in_flight) >= concurrency:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int) -> List[np.ndarray]:
+    """按长度排序后切分批次，返回每批在原列表中的下标；同一批内长度相近，填充到批内最长时浪费最少"""
+    order = np.argsort(np.asarray(lengths), kind='stable')
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def sequential_batches(count: int, batch_size: int) -> List[np.ndarray]:
+    """按原顺序切分批次，返回每批的下标"""
+    return [np.arange(start, min(start + batch_size, count)) for start in range(0, count, batch_size)]
+
+
+class PaddingStats:
+    """统计按原顺序分批与按长度分桶两种方式下的填充比例
+
+    填充比例 = 填充 token 数 / (每批文本数 × 批内最长长度) 之和。
+    """
+
+    def __init__(self):
+        self.tokens = 0
+        self.sequential_slots = 0
+        self.bucketed_slots = 0
+        self._lock = threading.Lock()
+
+    def add(self, lengths: Sequence[int], batch_size: int, batches: List[np.ndarray]):
+        """记录一组文本：batches 为实际使用的分批，同时按原顺序分批计算对照值"""
+        lengths = np.asarray(lengths)
+        sequential = sequential_batches(len(lengths), batch_size)
+        with self._lock:
+            self.tokens += int(lengths.sum())
+            self.sequential_slots += sum(len(batch) * int(lengths[batch].max()) for batch in sequential)
+            self.bucketed_slots += sum(len(batch) * int(lengths[batch].max()) for batch in batches)
+
+    @staticmethod
+    def _ratio(tokens: int, slots: int) -> float:
+        return 1 - tokens / slots if slots else 0.0
+
+    @property
+    def sequential_ratio(self) -> float:
+        return self._ratio(self.tokens, self.sequential_slots)
+
+    @property
+    def bucketed_ratio(self) -> float:
+        return self._ratio(self.tokens, self.bucketed_slots)
+
+    def format(self) -> str:
+        return f"向量化填充比例: 按顺序分批 {self.sequential_ratio:.1%} → 按长度分桶 {self.bucketed_ratio:.1%}"
+
+
+class AdaptiveBatchSizer:
+    """批大小调节器
+
+    固定模式下始终返回初始批大小；自适应模式下每次吞吐量提升就把批大小翻倍，
+    直到达到上限或吞吐量不再提升，此时回退到最佳批大小并固定下来。
+    """
+
+    def __init__(self, initial: int, maximum: Optional[int] = None, min_gain: float = 1.05):
+        self.size = max(1, initial)
+        self.maximum = maximum
+        self.min_gain = min_gain
+        self._best_size = self.size
+        self._best_rate = 0.0
+        self._frozen = maximum is None or maximum <= self.size
+
+    def record(self, items: int, seconds: float):
+        """记录一个批次的耗时"""
+        if self._frozen or items < self.size or seconds <= 0:
+            return
+        rate = items / seconds
+        if rate >= self._best_rate * self.min_gain:
+            self._best_rate = rate
+            self._best_size = self.size
+            if self.size >= self.maximum:
+                self._frozen = True
+            else:
+                self.size = min(self.size * 2, self.maximum)
+        else:
+            self.size = self._best_size
+            self._frozen = True
+
+
+class ThroughputMeter:
+    """吞吐量统计：已写入块数、块/秒，并按已完成数据源的平均块数估算剩余时间"""
+
+    def __init__(self, total_sources: int):
+        self.total_sources = total_sources
+        self.sources_done = 0
+        self.chunks_seen = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def source_done(self, chunks: int):
+        with self._lock:
+            self.sources_done += 1
+            self.chunks_seen += chunks
+
+    def add_written(self, count: int):
+        with self._lock:
+            self.written += count
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self._start
+        return self.written / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        with self._lock:
+            if not self.sources_done or not self.written:
+                return None
+            per_source = self.chunks_seen / self.sources_done
+            expected = self.chunks_seen + per_source * (self.total_sources - self.sources_done)
+            remaining = max(0.0, expected - self.written)
+        rate = self.rate
+        return remaining / rate if rate > 0 else None
+
+    def format(self) -> str:
+        eta = self.eta_seconds()
+        eta_text = f"{eta:.0f}秒" if eta is not None else "估算中"
+        return (f"已写入 {self.written} 个文档块，{self.rate:.1f} 块/秒，"
+                f"数据源 {self.sources_done}/{self.total_sources}，预计剩余 {eta_text}")
@@ -0,0 +1,210 @@
+import os
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+
+# 问答对存储布局：
+#   qa_pairs.jsonl    每行一个问答对（紧凑 JSON，UTF-8），行号即问答对ID（从0开始）
+#   qa_pairs.idx.npz  偏移索引（与 JSONL 同名，后缀为 .idx.npz）：offsets[i] 为第 i 行的起始字节（末尾多一项为文件长度），
+#                     types[i] 为第 i 个问答对的类型编号（对应 type_names），
+#                     source_size / source_mtime_ns 记录建索引时 JSONL 的大小和修改时间
+# 索引可以随时由 JSONL 重建：缺失或与 JSONL 不匹配时打开存储会自动重建。
+QA_FILENAME = "qa_pairs.jsonl"
+# 旧版格式：整个文件是一个 JSON 数组
+LEGACY_QA_FILENAME = "qa_pairs.json"
+
+
+def _encode(qa_pair: Dict[str, Any]) -> bytes:
+    return (json.dumps(qa_pair, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _index_path(qa_file: Path) -> Path:
+    return qa_file.with_name(qa_file.stem + '.idx.npz')
+
+
+class _IndexBuilder:
+    """边写入（或扫描）JSONL 边记录每行的偏移和类型"""
+
+    def __init__(self):
+        self.offsets: List[int] = [0]
+        self.codes: List[int] = []
+        self.type_names: Dict[str, int] = {}
+
+    def add(self, qa_type: str, length: int):
+        code = self.type_names.get(qa_type)
+        if code is None:
+            code = self.type_names[qa_type] = len(self.type_names)
+        self.codes.append(code)
+        self.offsets.append(self.offsets[-1] + length)
+
+    def skip(self, length: int):
+        """空行并入上一个问答对（读取时 json.loads 忽略首尾空白），文件开头的空行跳过"""
+        if self.codes:
+            self.offsets[-1] += length
+        else:
+            self.offsets[0] += length
+
+    def save(self, qa_file: Path, index_file: Path = None):
+        stat = qa_file.stat()
+        index_file = index_file or _index_path(qa_file)
+        tmp_file = index_file.with_name(index_file.name + '.tmp.npz')
+        np.savez(
+            tmp_file,
+            offsets=np.asarray(self.offsets, dtype=np.int64),
+            types=np.asarray(self.codes, dtype=np.int16),
+            type_names=np.asarray(list(self.type_names), dtype=str),
+            source_size=np.int64(stat.st_size),
+            source_mtime_ns=np.int64(stat.st_mtime_ns)
+        )
+        os.replace(tmp_file, index_file)
+
+
+def write_qa_pairs(qa_file: Path, qa_pairs: Iterable[Dict[str, Any]]) -> int:
+    """把问答对逐行写入 JSONL 并同时生成偏移索引，返回写入数量
+
+    内存占用与问答对总数无关（索引每个问答对只占 10 字节）。先写临时文件再原子替换，中断时保留上一次的完整结果。
+    """
+    qa_file = Path(qa_file)
+    tmp_file = qa_file.with_name(qa_file.name + '.tmp')
+    builder = _IndexBuilder()
+    with open(tmp_file, 'wb') as f:
+        for qa_pair in qa_pairs:
+            line = _encode(qa_pair)
+            f.write(line)
+            builder.add(qa_pair.get('type', 'unknown'), len(line))
+    os.replace(tmp_file, qa_file)
+    builder.save(qa_file)
+    return len(builder.codes)
+
+
+def convert_json(json_file: Path, qa_file: Path = None) -> int:
+    """把旧版的 qa_pairs.json（JSON 数组）转换为 JSONL 存储，返回问答对数量"""
+    json_file = Path(json_file)
+    qa_file = Path(qa_file) if qa_file else json_file.with_name(QA_FILENAME)
+    with open(json_file, 'r', encoding='utf-8') as f:
+        qa_pairs = json.load(f)
+    if not isinstance(qa_pairs, list):
+        raise ValueError(f"{json_file} 不是问答对数组")
+    return write_qa_pairs(qa_file, qa_pairs)
+
+
+class QAStore:
+    """带偏移索引的问答对存储（只读）
+
+    支持流式遍历、O(1) 计数、按ID随机读取和按类型筛选，都不需要把整个文件读入内存。
+    索引缺失或过期时从 JSONL 扫描重建（目录不可写时只保留在内存中）。
+    """
+
+    def __init__(self, qa_file: Path):
+        self.path = Path(qa_file)
+        index = self._load_index()
+        if index is None:
+            index = self._rebuild_index()
+        self._offsets = index['offsets']
+        self._types = index['types']
+        self._type_names = [str(name) for name in index['type_names']]
+
+    def _load_index(self) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            with np.load(_index_path(self.path)) as data:
+                index = {name: data[name] for name in data.files}
+        except (OSError, ValueError, KeyError):
+            return None
+        stat = self.path.stat()
+        if int(index.get('source_size', -1)) != stat.st_size or int(index.get('source_mtime_ns', -1)) != stat.st_mtime_ns:
+            return None
+        return index
+
+    def _rebuild_index(self) -> Dict[str, np.ndarray]:
+        builder = _IndexBuilder()
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    builder.add(json.loads(line).get('type', 'unknown'), len(line))
+                else:
+                    builder.skip(len(line))
+        try:
+            builder.save(self.path)
+        except OSError as e:
+            print(f"⚠️ 无法写入问答对索引 {_index_path(self.path)}: {e}")
+        return {
+            'offsets': np.asarray(builder.offsets, dtype=np.int64),
+            'types': np.asarray(builder.codes, dtype=np.int16),
+            'type_names': np.asarray(list(builder.type_names), dtype=str)
+        }
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """按ID顺序流式读取全部问答对"""
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def get(self, qa_id: int) -> Dict[str, Any]:
+        """按ID读取一个问答对"""
+        if not 0 <= qa_id < len(self):
+            raise IndexError(f"问答对ID超出范围: {qa_id}")
+        with open(self.path, 'rb') as f:
+            return self._read(f, qa_id)
+
+    __getitem__ = get
+
+    def _read(self, f, qa_id: int) -> Dict[str, Any]:
+        start = int(self._offsets[qa_id])
+        f.seek(start)
+        return json.loads(f.read(int(self._offsets[qa_id + 1]) - start))
+
+    def type_counts(self) -> Dict[str, int]:
+        """各类型的问答对数量"""
+        counts = np.bincount(self._types, minlength=len(self._type_names))
+        return {name: int(count) for name, count in zip(self._type_names, counts)}
+
+    def ids_of_type(self, qa_type: str) -> np.ndarray:
+        """某一类型的全部问答对ID（升序）"""
+        if qa_type not in self._type_names:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self._types == self._type_names.index(qa_type))
+
+    def iter_type(self, qa_type: str) -> Iterator[Dict[str, Any]]:
+        """按ID顺序读取某一类型的问答对，只读取该类型所在的行"""
+        ids = self.ids_of_type(qa_type)
+        with open(self.path, 'rb') as f:
+            for qa_id in ids:
+                yield self._read(f, int(qa_id))
+
+
+def find_qa_file(directory: Path) -> Optional[Path]:
+    """目录中的问答对文件：优先 JSONL 存储，其次旧版 JSON 数组"""
+    for name in (QA_FILENAME, LEGACY_QA_FILENAME):
+        qa_file = Path(directory) / name
+        if qa_file.exists():
+            return qa_file
+    return None
+
+
+def find_qa_files(data_dir: Path) -> List[Path]:
+    """data_dir 下（递归）的全部问答对文件；同一目录下已有 JSONL 存储时忽略旧版 qa_pairs.json"""
+    data_dir = Path(data_dir)
+    qa_files = sorted(data_dir.rglob(QA_FILENAME))
+    converted = {qa_file.parent for qa_file in qa_files}
+    qa_files.extend(
+        qa_file for qa_file in sorted(data_dir.rglob(LEGACY_QA_FILENAME))
+        if qa_file.parent not in converted
+    )
+    return qa_files
+
+
+def open_qa_store(qa_file: Path) -> QAStore:
+    """打开问答对存储；传入旧版 qa_pairs.json 时先在同一目录转换为 JSONL（JSONL 已存在时直接使用）"""
+    qa_file = Path(qa_file)
+    if qa_file.suffix == '.json':
+        jsonl_file = qa_file.with_name(QA_FILENAME)
+        if not jsonl_file.exists():
+            print(f"转换旧版问答对文件: {qa_file} -> {jsonl_file}")
+            convert_json(qa_file, jsonl_file)
+        qa_file = jsonl_file
+    return QAStore(qa_file)
@@ -1,23 +1,38 @@
-from typing import List, Dict, Any, Optional
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+from typing import List, Dict, Any, Optional, Tuple
 from langchain.docstore.document import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 from config import Config
+from embeddings import create_embeddings
+from manifest import MANIFEST_FILENAME
+from vector_index import VectorIndex, open_index, index_backend
+import index_store
 
 class CloneDetectionRetriever(BaseRetriever):
     """专门用于代码克隆检测的检索器"""
     
-    vector_store: Chroma
+    index: VectorIndex
+    embeddings: Embeddings
     top_k: int = Config.TOP_K_RETRIEVAL
     
     class Config:
         arbitrary_types_allowed = True
     
+    def _search(self, query: str, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        hits = self.index.search(self.embeddings.embed_query(query), self.top_k, filter)
+        return [doc for doc, _ in hits]
+    
+    def batch_search(self, queries: List[str], filter: Optional[Dict[str, Any]] = None) -> List[List[Document]]:
+        """批量检索：所有查询一次向量化（模型内按长度分桶分批），再一次矩阵运算检索"""
+        if not queries:
+            return []
+        vectors = self.embeddings.embed_documents(list(queries))
+        return [[doc for doc, _ in hits] for hits in self.index.search_many(vectors, self.top_k, filter)]
+    
     def _get_relevant_documents(
         self, 
         query: str, 
@@ -26,8 +41,7 @@ class CloneDetectionRetriever(BaseRetriever):
     ) -> List[Document]:
         """检索相关文档"""
         # 基础相似性搜索
-        docs = self.vector_store.similarity_search(query, k=self.top_k)
-        return docs
+        return self._search(query)
     
     def search_with_metadata(
         self, 
@@ -37,15 +51,15 @@ class CloneDetectionRetriever(BaseRetriever):
         """带过滤条件的搜索"""
         if filters:
             # 构建过滤条件
-            search_kwargs = {"k": self.top_k}
+            search_filter = None
             if "file_type" in filters:
-                search_kwargs["filter"] = {"file_type": filters["file_type"]}
+                search_filter = {"file_type": filters["file_type"]}
             if "directory" in filters:
-                search_kwargs["filter"] = {"directory": filters["directory"]}
+                search_filter = {"directory": filters["directory"]}
             
-            docs = self.vector_store.similarity_search(query, **search_kwargs)
+            docs = self._search(query, search_filter)
         else:
-            docs = self.vector_store.similarity_search(query, k=self.top_k)
+            docs = self._search(query)
         
         return docs
     
@@ -68,32 +82,82 @@ class RetrieverManager:
     """检索器管理器"""
     
     def __init__(self):
-        self.vector_store = None
+        self.index = None
         self.retriever = None
+        self.watcher = None
+        self.embeddings = None
+        # 加载时的 (生效版本目录, 摄取清单修改时间)；清单每次同步后原子替换，可作为索引版本号
+        self._index_version = None
+        self._backend = None
+    
+    def _current_index_version(self) -> Tuple[str, Optional[int]]:
+        index_dir = index_store.active_index_dir()
+        try:
+            return str(index_dir), (index_dir / MANIFEST_FILENAME).stat().st_mtime_ns
+        except OSError:
+            return str(index_dir), None
+    
+    def refresh_if_updated(self) -> bool:
+        """向量数据库切换了版本或被其他进程（如 scripts/watch_ingest.py）更新时重新加载，返回是否重新加载"""
+        if not self.retriever:
+            return False
+        version = self._current_index_version()
+        if version == self._index_version:
+            return False
+        
+        if version[0] != self._index_version[0]:
+            # 蓝绿重建切换了版本，直接打开新目录
+            print(f"检测到向量数据库切换到新版本: {version[0]}")
+        elif self._backend != 'chroma':
+            # 重新读取状态文件并映射向量文件，不需要重新加载模型
+            print("检测到向量数据库已更新，重新加载...")
+        elif self.watcher is not None:
+            # 进程内监听与检索共享 Chroma 客户端，写入的数据已经可见，不需要重新加载
+            self._index_version = version
+            return False
+        else:
+            print("检测到向量数据库已更新，重新加载...")
+            # Chroma 按目录在进程内缓存客户端，清空后才会从磁盘读取其他进程写入的内容
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        return self.load_vector_store()
+    
+    def start_watcher(self, interval: float = 1.0, debounce: float = 2.0):
+        """在当前进程中后台监听数据目录，文件变化后增量更新向量数据库，检索立即可见"""
+        if self.watcher is not None:
+            return self.watcher
+        from ingest import DataIngestor
+        from watcher import SourceWatcher
+        
+        def on_update(changed):
+            # 下一次检索时 refresh_if_updated 会发现新的版本号
+            print(f"向量数据库已更新（{len(changed)} 个数据源）")
+        
+        self.watcher = SourceWatcher(DataIngestor(), interval=interval, debounce=debounce, on_update=on_update)
+        self.watcher.start()
+        return self.watcher
     
     def load_vector_store(self) -> bool:
         """加载已存在的向量数据库"""
         try:
-            import torch
+            self._index_version = self._current_index_version()
             # 临时强制使用 CPU，避免 CUDA 兼容性问题
             device = 'cpu'  # 改为 'cuda' 当 PyTorch 版本兼容后
             print(f"⚠️ 当前使用 CPU 模式（RTX 5060 需要更新的 PyTorch 版本）")
             
-            embeddings = HuggingFaceEmbeddings(
-                model_name="BAAI/bge-small-zh-v1.5",
-                model_kwargs={'device': device},
-                encode_kwargs={'normalize_embeddings': True}
-            )
-            self.vector_store = Chroma(
-                persist_directory=Config.CHROMA_PERSIST_DIRECTORY,
-                embedding_function=embeddings
-            )
+            # 检索端只读缓存，缓存由数据摄取写入；重新加载索引时复用已加载的模型
+            if self.embeddings is None:
+                self.embeddings = create_embeddings(device, read_only_cache=True)
+            index_dir = Path(self._index_version[0])
+            self._backend = index_backend(index_dir)
+            self.index = open_index(index_dir, self._backend, read_only=True, embedding_function=self.embeddings)
             # 使用 Pydantic 方式初始化
             self.retriever = CloneDetectionRetriever(
-                vector_store=self.vector_store,
+                index=self.index,
+                embeddings=self.embeddings,
                 top_k=Config.TOP_K_RETRIEVAL
             )
-            print(f"向量数据库加载成功 (设备: {device})")
+            print(f"向量数据库加载成功 (设备: {device}, 向量模型后端: {Config.EMBEDDING_BACKEND})")
             return True
         except Exception as e:
             print(f"加载向量数据库失败: {e}")
@@ -111,6 +175,8 @@ class RetrieverManager:
         if not self.retriever:
             if not self.load_vector_store():
                 return []
+        else:
+            self.refresh_if_updated()
         
         if search_type == "general":
             return self.retriever._get_relevant_documents(query)
@@ -122,6 +188,15 @@ class RetrieverManager:
         else:
             return self.retriever._get_relevant_documents(query)
     
+    def batch_search(self, queries: List[str]) -> List[List[Document]]:
+        """批量通用检索，按查询顺序返回每个查询的文档列表"""
+        if not self.retriever:
+            if not self.load_vector_store():
+                return [[] for _ in queries]
+        else:
+            self.refresh_if_updated()
+        return self.retriever.batch_search(queries)
+    
     def get_search_summary(self, query: str, docs: List[Document]) -> Dict[str, Any]:
         """获取搜索结果摘要"""
         if not docs:
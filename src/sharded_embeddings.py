@@ -0,0 +1,208 @@
+import os
+import math
+import queue
+import atexit
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import sys
+sys.path.insert(0, str(Path(__file__).parent))
+from config import Config
+from pipeline import length_buckets
+
+# 线程库读取的线程数环境变量，需要在加载 torch / onnxruntime 之前设置
+_THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+# 传给子进程的模型配置
+_MODEL_SETTINGS = ('EMBEDDING_MODEL', 'ONNX_MODEL_DIR')
+# 单个分片的最少文本数，分片过小时每次前向的开销占比过高
+MIN_SHARD_SIZE = 16
+
+
+def available_cores() -> List[int]:
+    """当前进程可用的 CPU 核编号"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _embed_worker(cores: List[int], device: str, batch_size: Optional[int], backend: str, settings: Dict[str, str],
+                  tasks: multiprocessing.Queue, results: multiprocessing.Queue):
+    """向量化进程：绑定到 cores 并加载一份模型，循环处理任务直到收到 None"""
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    threads = str(len(cores))
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = threads
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError:
+            pass
+
+    try:
+        from embeddings import create_model
+        Config.EMBEDDING_THREADS = len(cores)
+        model = create_model(device, batch_size, backend)
+        torch = sys.modules.get('torch')
+        if torch is not None:
+            torch.set_num_threads(len(cores))
+    except Exception as e:
+        results.put((None, None, f"{type(e).__name__}: {e}"))
+        return
+    results.put((None, None, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        request_id, texts = task
+        try:
+            vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+            results.put((request_id, vectors, None))
+        except Exception as e:
+            results.put((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+class ShardedEmbeddings(Embeddings):
+    """多进程分片的向量模型
+
+    PyTorch 的算子内多线程在几十个核上扩展性很差，这里改为启动 workers 个进程，
+    把可用 CPU 核平均切分后分别绑定到各进程（每个进程的计算线程数等于分到的核数），每个进程加载一份模型。
+    所有进程从同一个任务队列取文本分片，结果按请求编号交回调用方，顺序与输入一致。
+    embed_documents 是线程安全的：多个线程可以同时提交，任务在进程间自动均衡。
+    """
+
+    def __init__(self, workers: int, device: str = 'cpu', batch_size: int = None, backend: str = None):
+        self.batch_size = batch_size or 32
+        self._token_counter = None
+        self.backend = backend or Config.EMBEDDING_BACKEND
+        cores = available_cores()
+        self.workers = max(1, min(workers, len(cores)))
+
+        if self.backend in ('onnx', 'onnx-int8'):
+            from onnx_embeddings import parity_record
+            # 导出和一致性校验在当前进程中完成一次，避免多个进程同时导出或各自加载 PyTorch 模型；
+            # 校验未通过时在这里直接报错
+            record = parity_record(self.backend == 'onnx-int8')
+            if record is None or not record['passed']:
+                from embeddings import create_model
+                create_model(device, batch_size, self.backend)
+
+        # 子进程重新导入 config，运行时修改过的模型配置需要显式传入
+        settings = {name: getattr(Config, name) for name in _MODEL_SETTINGS}
+        # spawn 启动的子进程不继承父进程已加载的 torch 线程池等状态
+        context = multiprocessing.get_context('spawn')
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._closed = False
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(
+                target=_embed_worker,
+                args=([int(core) for core in shard], device, batch_size, self.backend, settings,
+                      self._tasks, self._results),
+                daemon=True
+            )
+            for shard in np.array_split(np.array(cores), self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        print(f"启动 {self.workers} 个向量化进程（每个进程 {len(cores) // self.workers} 个CPU核）...")
+        ready = 0
+        while ready < len(self._processes):
+            try:
+                _, _, error = self._results.get(timeout=1)
+            except queue.Empty:
+                if all(process.is_alive() for process in self._processes):
+                    continue
+                error = "进程异常退出"
+            if error:
+                self.close()
+                raise RuntimeError(f"向量化进程加载模型失败: {error}")
+            ready += 1
+
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+        atexit.register(self.close)
+
+    def _dispatch(self):
+        """把子进程返回的结果交给对应的 Future，子进程异常退出时让等待中的请求失败"""
+        while not self._closed:
+            try:
+                request_id, vectors, error = self._results.get(timeout=1)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    self._fail_pending(RuntimeError("向量化进程异常退出"))
+                    return
+                continue
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(f"向量化进程出错: {error}"))
+            else:
+                future.set_result(vectors)
+
+    def _fail_pending(self, error: Exception):
+        self._closed = True
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def submit(self, texts: List[str]) -> Future:
+        """提交一个分片，返回结果为 float32 矩阵的 Future"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("向量化进程已关闭")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        self._tasks.put((request_id, list(texts)))
+        return future
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """按 token 数分桶、按进程数切分后并行计算，返回与输入顺序一致的 float32 矩阵"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        shard_size = max(MIN_SHARD_SIZE, min(self.batch_size, math.ceil(len(texts) / self.workers)))
+        if self._token_counter is None:
+            from embeddings import TokenCounter
+            self._token_counter = TokenCounter(self.backend)
+        shards = length_buckets(self._token_counter(texts), shard_size)
+        futures = [self.submit([texts[i] for i in shard]) for shard in shards]
+        result = None
+        for shard, future in zip(shards, futures):
+            vectors = future.result()
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[shard] = vectors
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit([text]).result()[0].tolist()
+
+    def close(self):
+        """停止所有向量化进程"""
+        if not self._processes:
+            return
+        self._fail_pending(RuntimeError("向量化进程已关闭"))
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class TermHit(NamedTuple):
+    """一次命中：术语所属类别、术语原文（术语表中的写法）和在文本中的位置 [start, end)"""
+    category: str
+    term: str
+    start: int
+    end: int
+
+
+def _lower(text: str) -> str:
+    """小写化并保持长度不变，命中位置可以直接对应原文
+
+    少数字符（如 'İ'）小写后变为多个字符，这些字符保持原样。
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+class TermMatcher:
+    """多类别术语表的 Aho-Corasick 自动机（大小写不敏感的子串匹配）
+
+    所有类别的术语预先编译成一个自动机，一次扫描文本即可得到全部命中（含相互重叠的术语），
+    耗时只与文本长度和命中数有关，不随术语数量增长。同一术语可以属于多个类别。
+    安装了 pyahocorasick 时使用其 C 实现，否则使用纯 Python 实现，两者结果相同。
+    """
+
+    def __init__(self, terms: Dict[str, Iterable[str]], use_native: Optional[bool] = None):
+        # 小写后的模式串 -> [(类别, 术语原文)]，同一类别内重复的术语只保留一次
+        patterns: Dict[str, List[Tuple[str, str]]] = {}
+        for category, category_terms in terms.items():
+            for term in dict.fromkeys(category_terms):
+                key = _lower(term)
+                if key:
+                    patterns.setdefault(key, []).append((category, term))
+
+        self._native = None
+        if use_native is not False:
+            try:
+                import ahocorasick
+            except ImportError:
+                if use_native:
+                    raise
+            else:
+                automaton = ahocorasick.Automaton()
+                for key, owners in patterns.items():
+                    automaton.add_word(key, (len(key), owners))
+                automaton.make_automaton()
+                self._native = automaton
+        if self._native is None:
+            self._build(patterns)
+
+    @property
+    def backend(self) -> str:
+        return 'pyahocorasick' if self._native is not None else 'python'
+
+    def _build(self, patterns: Dict[str, List[Tuple[str, str]]]):
+        """构建自动机：字典树 + 失败指针，再把失败转移展开进各状态的转移表
+
+        根状态的转移单独保存，其余状态只保存与根状态不同的转移，扫描时不需要沿失败指针回退。
+        """
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[Tuple[int, List[Tuple[str, str]]]]] = [[]]
+        for key, owners in patterns.items():
+            state = 0
+            for ch in key:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append((len(key), owners))
+
+        root = goto[0]
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [{} for _ in goto]
+        queue = deque(root.values())
+        while queue:
+            state = queue.popleft()
+            fallback = fail[state]
+            outputs[state] = outputs[state] + outputs[fallback]
+            # 失败状态更浅，已在之前处理完毕；根状态的转移由扫描时回落处理
+            table = dict(delta[fallback]) if fallback else {}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fallback].get(ch, root.get(ch, 0)) if fallback else root.get(ch, 0)
+                table[ch] = nxt
+                queue.append(nxt)
+            delta[state] = table
+
+        self._root = root
+        self._delta = delta
+        self._outputs = outputs
+
+    def find(self, text: str, categories: Optional[Set[str]] = None) -> List[TermHit]:
+        """扫描一次文本，返回全部命中（按结束位置排列），categories 不为空时只保留这些类别"""
+        lowered = _lower(text)
+        hits: List[TermHit] = []
+        if self._native is not None:
+            matches = (
+                (end + 1, length, owners)
+                for end, (length, owners) in self._native.iter(lowered)
+            )
+        else:
+            matches = self._scan(lowered)
+        for end, length, owners in matches:
+            for category, term in owners:
+                if categories is None or category in categories:
+                    hits.append(TermHit(category, term, end - length, end))
+        return hits
+
+    def _scan(self, lowered: str):
+        root_get = self._root.get
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        for index, ch in enumerate(lowered):
+            nxt = delta[state].get(ch)
+            state = nxt if nxt is not None else root_get(ch, 0)
+            if outputs[state]:
+                for length, owners in outputs[state]:
+                    yield index + 1, length, owners
+
+
+def first_hits(hits: Iterable[TermHit], category: str, limit: int = None) -> Dict[str, int]:
+    """某一类别中命中的术语 -> 首次出现的起始位置；limit 不为空时只统计完全落在 [0, limit) 内的命中"""
+    found: Dict[str, int] = {}
+    for hit in hits:
+        if hit.category != category or (limit is not None and hit.end > limit):
+            continue
+        if hit.term not in found or hit.start < found[hit.term]:
+            found[hit.term] = hit.start
+    return found
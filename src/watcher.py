@@ -0,0 +1,104 @@
+import time
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+import sys
+sys.path.insert(0, str(Path(__file__).parent))
+from ingest import DataIngestor, discover_sources
+
+
+def snapshot_sources() -> Dict[str, Tuple[int, int]]:
+    """数据源键 -> (修改时间, 文件大小)"""
+    snapshot = {}
+    for unit_key, file_path in discover_sources(report_missing=False).items():
+        try:
+            stat = file_path.stat()
+        except OSError:
+            continue
+        snapshot[unit_key] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+class SourceWatcher:
+    """监听 Config.DATA_DIRS 中文件的新增、修改和删除，并增量同步向量数据库
+
+    按 interval 秒轮询文件的修改时间和大小（不依赖平台相关的文件事件接口）。
+    发现变化后等待 debounce 秒内不再有新变化（持续变化时最多等待 max_delay 秒）再同步，
+    一次复制多个文件或编辑器分多次写入只触发一次同步。
+    同步只对变化的文件计算哈希，内容未变的文件（如只更新了修改时间）不会重新向量化。
+    """
+
+    def __init__(
+        self,
+        ingestor: DataIngestor,
+        interval: float = 1.0,
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        on_update: Optional[Callable[[Set[str]], None]] = None
+    ):
+        self.ingestor = ingestor
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_update = on_update
+        self._snapshot = snapshot_sources()
+        self._pending: Set[str] = set()
+        self._first_change = 0.0
+        self._last_change = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self) -> bool:
+        """检查一次文件变化，到达同步时机时同步，返回是否执行了同步"""
+        current = snapshot_sources()
+        changed = {
+            unit_key for unit_key in set(current) | set(self._snapshot)
+            if current.get(unit_key) != self._snapshot.get(unit_key)
+        }
+        self._snapshot = current
+
+        now = time.monotonic()
+        if changed:
+            if not self._pending:
+                self._first_change = now
+            self._pending |= changed
+            self._last_change = now
+
+        if not self._pending:
+            return False
+        if now - self._last_change < self.debounce and now - self._first_change < self.max_delay:
+            return False
+
+        batch = set(self._pending)
+        print(f"检测到 {len(batch)} 个数据源变化，开始增量同步...")
+        try:
+            self.ingestor.update_sources(batch)
+        except Exception as e:
+            # 保留待同步的数据源，下一轮重试
+            print(f"增量同步失败，稍后重试: {e}")
+            self._first_change = self._last_change = now
+            return False
+
+        self._pending -= batch
+        if self.on_update:
+            self.on_update(batch)
+        return True
+
+    def run(self):
+        """在当前线程中持续监听，直到调用 stop()"""
+        print(f"开始监听数据目录（轮询间隔 {self.interval} 秒，去抖 {self.debounce} 秒）")
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> threading.Thread:
+        """在后台线程中监听"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
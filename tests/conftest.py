@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 与 scripts/ 相同：src 目录下的模块按顶层模块导入
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
@@ -0,0 +1,115 @@
+from langchain.docstore.document import Document
+
+from code_splitter import CodeSplitter
+
+PYTHON_SOURCE = '''import os
+
+X = 1
+
+
+# helper
+def add(a, b):
+    return a + b
+
+
+class Parser:
+    """doc"""
+
+    def parse(self, text):
+        return text.split()
+
+    def reset(self):
+        pass
+'''
+
+JAVA_SOURCE = '''package a;
+
+import java.util.List;
+
+public class Stack {
+    private int[] items;
+
+    // push an item
+    public void push(int v) {
+        if (v > 0) { items[0] = v; }
+    }
+
+    public int pop() {
+        return items[0];
+    }
+}
+
+int helper(int x) { return x * 2; }
+'''
+
+
+def _units(splitter, text, file_type):
+    return [(unit.start_line, unit.end_line, unit.symbol, unit.symbol_type)
+            for unit in splitter.units(text, file_type)]
+
+
+def test_python_units_follow_definitions():
+    assert _units(CodeSplitter(1000, 100), PYTHON_SOURCE, '.py') == [
+        (1, 3, '', 'module'),
+        (6, 8, 'add', 'function'),  # 紧贴在上方的注释并入函数
+        (11, 18, 'Parser', 'class'),
+    ]
+
+
+def test_large_python_class_is_split_by_method():
+    assert _units(CodeSplitter(60, 0), PYTHON_SOURCE, '.py') == [
+        (1, 3, '', 'module'),
+        (6, 8, 'add', 'function'),
+        (11, 12, 'Parser', 'class'),
+        (14, 15, 'Parser.parse', 'method'),
+        (17, 18, 'Parser.reset', 'method'),
+    ]
+
+
+def test_c_family_units_follow_top_level_blocks():
+    assert _units(CodeSplitter(1000, 100), JAVA_SOURCE, '.java') == [
+        (1, 3, '', 'module'),
+        (5, 16, 'Stack', 'class'),
+        (18, 18, 'helper', 'function'),
+    ]
+
+
+def test_large_c_family_class_is_split_by_method():
+    units = _units(CodeSplitter(80, 0), JAVA_SOURCE, '.java')
+    assert (8, 11, 'Stack.push', 'method') in units
+    assert (13, 15, 'Stack.pop', 'method') in units
+    assert units[-1] == (18, 18, 'helper', 'function')
+
+
+def test_split_document_records_symbol_metadata():
+    document = Document(page_content=PYTHON_SOURCE, metadata={'source': 'p.py', 'file_type': '.py'})
+    chunks = CodeSplitter(1000, 100).split_document(document)
+    assert [chunk.metadata['symbol'] for chunk in chunks] == ['', 'add', 'Parser']
+    add = chunks[1]
+    assert add.page_content == '# helper\ndef add(a, b):\n    return a + b'
+    assert add.metadata['source'] == 'p.py'
+    assert (add.metadata['start_line'], add.metadata['end_line']) == (6, 8)
+
+
+def test_oversized_function_is_cut_on_line_boundaries():
+    source = 'def f():\n' + ''.join(f'    x{i} = {i}\n' for i in range(50))
+    lines = source.split('\n')
+    chunks = CodeSplitter(100, 0).split_document(Document(page_content=source, metadata={'file_type': '.py'}))
+    assert len(chunks) > 1
+    assert all(len(chunk.page_content) <= 100 and chunk.metadata['symbol'] == 'f' for chunk in chunks)
+    # 各段首尾相接，覆盖整个函数
+    assert chunks[0].metadata['start_line'] == 1
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.metadata['start_line'] == previous.metadata['end_line'] + 1
+    for chunk in chunks:
+        start, end = chunk.metadata['start_line'], chunk.metadata['end_line']
+        assert chunk.page_content == '\n'.join(lines[start - 1:end])
+
+
+def test_unparsable_python_falls_back_to_text_splitting():
+    splitter = CodeSplitter(1000, 100)
+    broken = 'def broken(:\n    pass\n'
+    assert splitter.units(broken, '.py') is None
+    chunks = splitter.split_document(Document(page_content=broken, metadata={'file_type': '.py'}))
+    assert [chunk.page_content for chunk in chunks] == [broken.strip()]
+    assert 'symbol' not in chunks[0].metadata
@@ -0,0 +1,76 @@
+import numpy as np
+
+from dedup import NearDuplicateIndex
+
+BASE = ("基于抽象语法树的克隆检测方法先把源代码解析为语法树，再比较子树的结构，"
+        "因此对标识符重命名和格式变化不敏感，适合检测 Type-2 和 Type-3 克隆。")
+NEAR = BASE.replace("Type-3 克隆。", "Type-3 克隆！")
+OTHER = "SourcererCC uses a bag-of-tokens model with an inverted index to scale clone detection to large repositories."
+
+
+def _index_with(*entries, threshold=0.8):
+    index = NearDuplicateIndex(threshold)
+    for chunk_id, text in entries:
+        index.add(chunk_id, index.signature(text))
+    return index
+
+
+def test_signature_is_deterministic_and_whitespace_insensitive():
+    index = NearDuplicateIndex(0.8)
+    signature = index.signature(BASE)
+    assert signature.shape == (index.num_perm,) and signature.dtype == np.uint32
+    assert np.array_equal(signature, NearDuplicateIndex(0.8).signature(BASE))
+    assert np.array_equal(index.signature("a  b\n c"), index.signature("a b c"))
+
+
+def test_bands_times_rows_equals_num_perm():
+    for threshold in (0.5, 0.8, 0.9, 0.95):
+        index = NearDuplicateIndex(threshold)
+        assert index.bands * index.rows == index.num_perm
+
+
+def test_find_near_duplicate_but_not_unrelated_text():
+    index = _index_with(('base', BASE), ('other', OTHER))
+    match = index.find(index.signature(NEAR))
+    assert match is not None and match[0] == 'base' and match[1] >= 0.8
+    assert index.find(index.signature("完全无关的一段文本，讨论的是向量数据库的内存映射存储格式。")) is None
+    exact = index.find(index.signature(OTHER))
+    assert exact == ('other', 1.0)
+
+
+def test_add_is_idempotent_and_remove_forgets_chunk():
+    index = _index_with(('base', BASE))
+    index.add('base', index.signature(OTHER))
+    assert len(index) == 1
+    # 重复 add 不覆盖原签名
+    assert index.find(index.signature(BASE))[0] == 'base'
+
+    index.remove('base')
+    index.remove('missing')
+    assert len(index) == 0
+    assert index.find(index.signature(BASE)) is None
+    assert all(not band for band in index._buckets)
+
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / 'dedup_index.npz'
+    index = _index_with(('base', BASE), ('other', OTHER))
+    index.save(str(path))
+
+    loaded = NearDuplicateIndex.load(str(path), 0.8)
+    assert len(loaded) == 2
+    assert loaded.find(loaded.signature(NEAR))[0] == 'base'
+    assert loaded.find(loaded.signature(OTHER)) == ('other', 1.0)
+
+
+def test_load_falls_back_to_empty_index(tmp_path):
+    assert len(NearDuplicateIndex.load(str(tmp_path / 'missing.npz'), 0.8)) == 0
+
+    # 签名长度与当前参数不一致时（如修改了 num_perm）丢弃旧签名
+    path = tmp_path / 'dedup_index.npz'
+    _index_with(('base', BASE)).save(str(path))
+    assert len(NearDuplicateIndex.load(str(path), 0.8, num_perm=64)) == 0
+
+    corrupt = tmp_path / 'corrupt.npz'
+    corrupt.write_bytes(b'not an npz')
+    assert len(NearDuplicateIndex.load(str(corrupt), 0.8)) == 0
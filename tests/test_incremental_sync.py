@@ -0,0 +1,68 @@
+import hashlib
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import ingest
+from config import Config
+
+CODE = '''def a():
+    return 1
+
+
+def b():
+    return 2
+'''
+
+
+class HashEmbeddings(Embeddings):
+    """按文本哈希生成的确定性向量，记录调用次数"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        return [byte / 255 + 0.01 for byte in digest[:16]]
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def ingestor(tmp_path, monkeypatch):
+    examples = tmp_path / 'examples'
+    examples.mkdir()
+    monkeypatch.setattr(Config, 'DATA_DIRS', {'examples': str(examples), 'google_scholar_papers': str(tmp_path / 'none')})
+    monkeypatch.setattr(Config, 'CHROMA_PERSIST_DIRECTORY', str(tmp_path / 'index'))
+    monkeypatch.setattr(Config, 'VECTOR_BACKEND', 'numpy')
+    monkeypatch.setattr(Config, 'LOAD_WORKERS', 1)
+    monkeypatch.setattr(Config, 'EMBED_WORKERS', 1)
+    monkeypatch.setattr(ingest, 'create_embeddings', lambda *args, **kwargs: HashEmbeddings())
+    return ingest.DataIngestor()
+
+
+def _line_ranges(vector_store):
+    stored = vector_store.get()
+    return {
+        metadata['symbol']: (metadata['start_line'], metadata['end_line'])
+        for metadata in stored['metadatas'] if metadata.get('symbol')
+    }
+
+
+def test_moved_functions_keep_ids_but_get_new_line_numbers(tmp_path, ingestor):
+    source = tmp_path / 'examples' / 'sample.py'
+    source.write_text(CODE, encoding='utf-8')
+    vector_store = ingestor.ingest_all_data()
+    assert _line_ranges(vector_store) == {'a': (1, 2), 'b': (5, 6)}
+    calls = ingestor.embeddings.calls
+
+    source.write_text('import os\nimport sys\n\n\n' + CODE, encoding='utf-8')
+    vector_store = ingestor.update_sources([str(source)])
+    assert _line_ranges(vector_store) == {'a': (5, 6), 'b': (9, 10)}
+    # 函数内容没有变化，只有新增的模块级代码需要向量化
+    assert ingestor.embeddings.calls == calls + 1
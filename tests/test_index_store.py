@@ -0,0 +1,61 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import index_store
+from config import Config
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CHROMA_PERSIST_DIRECTORY', str(tmp_path / 'chroma'))
+    return tmp_path / 'chroma'
+
+
+def _try_lock_elsewhere(root):
+    """在另一个进程中尝试非阻塞地获取摄取锁，返回是否成功"""
+    code = textwrap.dedent(f'''
+        import fcntl, sys
+        with open({str(root / index_store.LOCK_FILENAME)!r}, 'a+b') as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                sys.exit(1)
+    ''')
+    return subprocess.run([sys.executable, '-c', code]).returncode == 0
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='使用 fcntl 检查锁状态')
+def test_ingest_lock_excludes_other_processes(root):
+    with index_store.ingest_lock():
+        assert not _try_lock_elsewhere(root)
+    assert _try_lock_elsewhere(root)
+
+
+def _make_versions(root, names):
+    for name in names:
+        (root / index_store.VERSIONS_DIRNAME / name).mkdir(parents=True)
+
+
+def test_rollback_keeps_abandoned_version_until_next_cleanup(root):
+    _make_versions(root, ['v1', 'v2'])
+    index_store.activate_version('v2')
+
+    assert index_store.rollback() == 'v1'
+    assert index_store.current_version() == 'v1'
+    # 被放弃的版本仍在，可以切换回去
+    assert index_store.list_versions() == ['v1', 'v2']
+    assert (root / index_store.VERSIONS_DIRNAME / 'v2' / index_store.ABANDONED_FILENAME).exists()
+
+    assert index_store.collect_garbage(keep=2) == ['v2']
+    assert index_store.list_versions() == ['v1']
+    assert index_store.rollback() is None
+
+
+def test_collect_garbage_skips_newer_builds_in_progress(root):
+    _make_versions(root, ['v1', 'v2', 'v3', 'v4'])
+    index_store.activate_version('v3')
+    assert index_store.collect_garbage(keep=2) == ['v1']
+    assert index_store.list_versions() == ['v2', 'v3', 'v4']
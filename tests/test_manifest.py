@@ -0,0 +1,84 @@
+import json
+
+from langchain.docstore.document import Document
+
+from manifest import MANIFEST_VERSION, IngestManifest, file_hash, make_chunk_ids
+
+PARAMS = {'chunk_size': 1000, 'chunk_overlap': 200, 'embedding_model': 'BAAI/bge-small-zh-v1.5'}
+
+
+def _docs(*texts):
+    return [Document(page_content=text) for text in texts]
+
+
+def test_chunk_ids_are_deterministic_and_sha1_hex():
+    ids = make_chunk_ids('a.md', _docs('alpha', 'beta'))
+    assert ids == make_chunk_ids('a.md', _docs('alpha', 'beta'))
+    assert all(len(chunk_id) == 40 and int(chunk_id, 16) >= 0 for chunk_id in ids)
+    # 来源不同时ID不同
+    assert set(ids).isdisjoint(make_chunk_ids('b.md', _docs('alpha', 'beta')))
+
+
+def test_repeated_text_in_one_source_gets_distinct_ids():
+    ids = make_chunk_ids('a.md', _docs('same', 'same', 'same'))
+    assert len(set(ids)) == 3
+
+
+def test_editing_one_chunk_changes_only_its_id():
+    """文件修改后只有变化的块需要重新向量化：新旧ID的差集就是增删的块"""
+    old = make_chunk_ids('a.md', _docs('intro', 'body', 'outro'))
+    new = make_chunk_ids('a.md', _docs('intro', 'body v2', 'outro'))
+    assert set(old) - set(new) == {old[1]}
+    assert set(new) - set(old) == {new[1]}
+
+
+def test_file_hash_tracks_content(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_text('hello', encoding='utf-8')
+    first = file_hash(str(path))
+    assert first == file_hash(str(path))
+    path.write_text('hello!', encoding='utf-8')
+    assert file_hash(str(path)) != first
+
+
+def test_save_load_round_trip(tmp_path):
+    path = tmp_path / 'index' / 'ingest_manifest.json'
+    manifest = IngestManifest(str(path), PARAMS)
+    manifest.update('a.md', 'h1', ['id1', 'id2'], duplicates={'id3': 'id1'})
+    manifest.update('b.md', 'h2', ['id4'])
+    manifest.save()
+
+    loaded = IngestManifest.load(str(path))
+    assert loaded.params == PARAMS
+    assert loaded.get_hash('a.md') == 'h1'
+    assert loaded.get_chunk_ids('a.md') == ['id1', 'id2']
+    assert loaded.get_duplicates('a.md') == {'id3': 'id1'}
+    assert loaded.get_duplicates('b.md') == {}
+    assert loaded.total_chunks() == 3
+    assert not path.with_name(path.name + '.tmp').exists()
+
+
+def test_load_rejects_missing_corrupt_and_other_versions(tmp_path):
+    path = tmp_path / 'ingest_manifest.json'
+    assert IngestManifest.load(str(path)) is None
+    path.write_text('{not json', encoding='utf-8')
+    assert IngestManifest.load(str(path)) is None
+    path.write_text(json.dumps({'version': MANIFEST_VERSION + 1, 'params': PARAMS, 'sources': {}}), encoding='utf-8')
+    assert IngestManifest.load(str(path)) is None
+
+
+def test_param_comparison():
+    manifest = IngestManifest('unused.json', PARAMS)
+    assert manifest.same_params(dict(PARAMS))
+    rechunked = dict(PARAMS, chunk_size=2000)
+    assert not manifest.same_params(rechunked)
+    assert not manifest.same_params(dict(PARAMS, embedding_model='other'))
+
+
+def test_remove_returns_old_chunk_ids():
+    manifest = IngestManifest('unused.json', PARAMS)
+    manifest.update('a.md', 'h1', ['id1', 'id2'])
+    assert manifest.remove('a.md') == ['id1', 'id2']
+    assert manifest.remove('a.md') == []
+    assert manifest.get_hash('a.md') is None
+    assert manifest.total_chunks() == 0
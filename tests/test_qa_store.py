@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from qa_store import QAStore, convert_json, find_qa_files, open_qa_store, write_qa_pairs
+
+QA_PAIRS = [
+    {'question': '什么是 Type-1 克隆？', 'answer': '除空白和注释外完全相同的代码片段。', 'type': 'concept'},
+    {'question': 'What is NiCad?', 'answer': 'A near-miss clone detector.', 'type': 'tool'},
+    {'question': 'SourcererCC 如何扩展到大规模代码库？', 'answer': '使用倒排索引和过滤启发式。', 'type': 'concept'},
+    {'question': 'no type', 'answer': 'defaults to unknown'},
+]
+
+
+def _write(tmp_path, qa_pairs=QA_PAIRS):
+    qa_file = tmp_path / 'qa_pairs.jsonl'
+    assert write_qa_pairs(qa_file, iter(qa_pairs)) == len(qa_pairs)
+    return qa_file
+
+
+def test_offsets_point_at_line_starts(tmp_path):
+    qa_file = _write(tmp_path)
+    data = qa_file.read_bytes()
+    store = QAStore(qa_file)
+    offsets = store._offsets
+    assert offsets[0] == 0 and offsets[-1] == len(data)
+    assert [data[start:end].count(b'\n') for start, end in zip(offsets, offsets[1:])] == [1] * len(QA_PAIRS)
+    for qa_id, (start, end) in enumerate(zip(offsets, offsets[1:])):
+        assert json.loads(data[start:end]) == QA_PAIRS[qa_id]
+
+
+def test_random_access_iteration_and_types(tmp_path):
+    store = QAStore(_write(tmp_path))
+    assert len(store) == 4
+    assert list(store) == QA_PAIRS
+    assert store[2] == QA_PAIRS[2] and store.get(0) == QA_PAIRS[0]
+    assert store.type_counts() == {'concept': 2, 'tool': 1, 'unknown': 1}
+    assert store.ids_of_type('concept').tolist() == [0, 2]
+    assert store.ids_of_type('missing').tolist() == []
+    assert list(store.iter_type('concept')) == [QA_PAIRS[0], QA_PAIRS[2]]
+    for bad in (-1, 4):
+        with pytest.raises(IndexError):
+            store.get(bad)
+
+
+def test_missing_or_stale_index_is_rebuilt(tmp_path):
+    qa_file = _write(tmp_path)
+    index_file = tmp_path / 'qa_pairs.idx.npz'
+    index_file.unlink()
+    assert QAStore(qa_file)[1] == QA_PAIRS[1]
+    assert index_file.exists()
+
+    # 追加一行（带空行）后索引过期，重新打开时重建
+    with open(qa_file, 'ab') as f:
+        f.write(b'\n' + json.dumps({'question': 'q', 'answer': 'a', 'type': 'tool'}).encode('utf-8') + b'\n')
+    stat = qa_file.stat()
+    os.utime(qa_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    store = QAStore(qa_file)
+    assert len(store) == 5
+    assert store[3] == QA_PAIRS[3] and store[4]['question'] == 'q'
+    assert store.type_counts()['tool'] == 2
+    with np.load(index_file) as data:
+        assert int(data['source_size']) == qa_file.stat().st_size
+
+
+def test_convert_and_open_legacy_json(tmp_path):
+    legacy = tmp_path / 'qa_pairs.json'
+    legacy.write_text(json.dumps(QA_PAIRS, ensure_ascii=False), encoding='utf-8')
+    store = open_qa_store(legacy)
+    assert store.path == tmp_path / 'qa_pairs.jsonl'
+    assert list(store) == QA_PAIRS
+
+    other = tmp_path / 'other' / 'qa_pairs.json'
+    other.parent.mkdir()
+    other.write_text(json.dumps(QA_PAIRS[:1]), encoding='utf-8')
+    # 已转换的目录只返回 JSONL，未转换的目录返回旧版 JSON
+    assert find_qa_files(tmp_path) == [tmp_path / 'qa_pairs.jsonl', other]
+    assert convert_json(other) == 1
+
+
+def test_convert_rejects_non_list(tmp_path):
+    legacy = tmp_path / 'qa_pairs.json'
+    legacy.write_text('{"question": "q"}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        convert_json(legacy)
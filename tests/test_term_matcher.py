@@ -0,0 +1,106 @@
+import random
+import string
+
+import pytest
+
+from term_matcher import TermHit, TermMatcher, first_hits
+
+TERMS = {
+    'concept': ['code clone', 'clone', 'Type-3', 'abstract syntax tree', 'AST'],
+    'method': ['AST', 'token', 'hash', 'hashing'],
+    'venue': ['ICSE', 'FSE'],
+}
+TEXT = "Code clones (Type-3) detected by AST hashing; see ICSE'24 and the abstract syntax tree token stream."
+
+
+def _naive(terms, text):
+    """逐个术语做大小写不敏感的子串查找，作为对照"""
+    lowered = text.lower()
+    hits = set()
+    for category, category_terms in terms.items():
+        for term in set(category_terms):
+            key = term.lower()
+            start = lowered.find(key)
+            while start != -1:
+                hits.add(TermHit(category, term, start, start + len(key)))
+                start = lowered.find(key, start + 1)
+    return hits
+
+
+def _random_case(terms, rng):
+    return {
+        category: [''.join(ch.upper() if rng.random() < 0.5 else ch for ch in term) for term in category_terms]
+        for category, category_terms in terms.items()
+    }
+
+
+def test_finds_all_overlapping_hits_case_insensitively():
+    hits = TermMatcher(TERMS, use_native=False).find(TEXT)
+    assert set(hits) == _naive(TERMS, TEXT)
+    # 同一术语属于多个类别时各报告一次，命中保留术语表中的写法
+    ast = TEXT.index('AST')
+    assert TermHit('concept', 'AST', ast, ast + 3) in hits and TermHit('method', 'AST', ast, ast + 3) in hits
+    assert TermHit('concept', 'code clone', 0, 10) in hits
+    # 按结束位置排列
+    assert [hit.end for hit in hits] == sorted(hit.end for hit in hits)
+
+
+def test_category_filter():
+    hits = TermMatcher(TERMS, use_native=False).find(TEXT, {'venue'})
+    icse = TEXT.index('ICSE')
+    assert hits == [TermHit('venue', 'ICSE', icse, icse + 4)]
+
+
+def test_random_texts_match_naive_scan():
+    rng = random.Random(0)
+    alphabet = 'abc '
+    terms = {
+        'a': [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(30)],
+        'b': [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 6))) for _ in range(30)],
+    }
+    terms = {category: [term for term in category_terms if term.strip()] for category, category_terms in terms.items()}
+    matcher = TermMatcher(terms, use_native=False)
+    for _ in range(50):
+        text = ''.join(rng.choice(alphabet + 'ABC') for _ in range(rng.randint(0, 80)))
+        assert set(matcher.find(text)) == _naive(terms, text)
+
+
+def test_positions_survive_length_changing_lowercase():
+    # 'İ'.lower() 是两个字符，匹配位置仍对应原文
+    text = 'İstanbul ICSE'
+    hits = TermMatcher(TERMS, use_native=False).find(text, {'venue'})
+    assert hits == [TermHit('venue', 'ICSE', 9, 13)]
+    assert text[hits[0].start:hits[0].end] == 'ICSE'
+
+
+def test_empty_terms_and_duplicates_are_ignored():
+    matcher = TermMatcher({'a': ['', 'x', 'x', 'X']}, use_native=False)
+    assert matcher.find('xx') == [
+        TermHit('a', 'x', 0, 1), TermHit('a', 'X', 0, 1),
+        TermHit('a', 'x', 1, 2), TermHit('a', 'X', 1, 2),
+    ]
+    assert TermMatcher({}, use_native=False).find('anything') == []
+
+
+def test_first_hits():
+    hits = TermMatcher(TERMS, use_native=False).find(TEXT + ' AST again')
+    ast, hashing, token = TEXT.index('AST'), TEXT.index('hashing'), TEXT.index('token')
+    assert first_hits(hits, 'method') == {'AST': ast, 'hash': hashing, 'hashing': hashing, 'token': token}
+    # limit 只统计完全落在 [0, limit) 内的命中：'hashing' 跨过边界
+    assert first_hits(hits, 'method', limit=hashing + 5) == {'AST': ast, 'hash': hashing}
+
+
+def test_native_backend_matches_pure_python():
+    pytest.importorskip('ahocorasick')
+    rng = random.Random(1)
+    terms = _random_case(TERMS, rng)
+    terms['extra'] = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 5))) for _ in range(200)]
+    native = TermMatcher(terms, use_native=True)
+    python = TermMatcher(terms, use_native=False)
+    assert native.backend == 'pyahocorasick' and python.backend == 'python'
+    texts = [TEXT, 'İstanbul ICSE', ''] + [
+        ''.join(rng.choice(string.ascii_letters + ' -') for _ in range(300)) for _ in range(30)
+    ]
+    for text in texts:
+        assert sorted(native.find(text)) == sorted(python.find(text))
+        assert sorted(native.find(text, {'extra'})) == sorted(python.find(text, {'extra'}))
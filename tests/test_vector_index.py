@@ -0,0 +1,290 @@
+import numpy as np
+import pytest
+
+from vector_index import ID_BYTES, NumpyIndex, QuantizedIndex
+
+DIM = 16
+
+
+def _dataset(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, DIM)).astype(np.float32)
+    ids = [f'id{i}' for i in range(rows)]
+    documents = [f'doc{i}' for i in range(rows)]
+    metadatas = [{'group': i % 3, 'source': f'file{i % 7}.md'} for i in range(rows)]
+    return ids, vectors, metadatas, documents
+
+
+def _brute_force(vectors, queries, k, rows=None):
+    """精确余弦相似度 top-k：[(行号, 相似度)]"""
+    rows = np.arange(len(vectors)) if rows is None else np.asarray(rows)
+    data = vectors[rows] / np.linalg.norm(vectors[rows], axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ data.T
+    results = []
+    for query_scores in scores:
+        top = np.argsort(-query_scores, kind='stable')[:k]
+        results.append([(int(rows[i]), float(query_scores[i])) for i in top])
+    return results
+
+
+def _filled(index_cls, path, rows=300, **kwargs):
+    ids, vectors, metadatas, documents = _dataset(rows)
+    index = index_cls(path, **kwargs)
+    index.upsert(ids, vectors, metadatas, documents)
+    return index, vectors
+
+
+def _assert_matches(hits, expected):
+    assert [doc.page_content for doc, _ in hits] == [f'doc{row}' for row, _ in expected]
+    assert np.allclose([score for _, score in hits], [score for _, score in expected], atol=1e-5)
+
+
+def test_search_matches_brute_force(tmp_path):
+    index, vectors = _filled(NumpyIndex, tmp_path)
+    queries = np.random.default_rng(1).standard_normal((5, DIM)).astype(np.float32)
+    for hits, expected in zip(index.search_many(queries, 10), _brute_force(vectors, queries, 10)):
+        _assert_matches(hits, expected)
+
+
+def test_filter_restricts_candidates(tmp_path):
+    index, vectors = _filled(NumpyIndex, tmp_path)
+    query = np.random.default_rng(2).standard_normal((1, DIM)).astype(np.float32)
+    hits = index.search(query[0], 5, filter={'group': 1, 'source': 'file4.md'})
+    rows = [i for i in range(300) if i % 3 == 1 and i % 7 == 4]
+    _assert_matches(hits, _brute_force(vectors, query, 5, rows)[0])
+    assert all(doc.metadata == {'group': 1, 'source': 'file4.md'} for doc, _ in hits)
+    assert index.search(query[0], 5, filter={'group': 99}) == []
+
+
+def test_upsert_overwrites_and_delete_removes(tmp_path):
+    index, vectors = _filled(NumpyIndex, tmp_path, rows=20)
+    index.upsert(['id3'], [vectors[5]], [{'group': 9}], ['doc3 v2'])
+    index.delete(['id4', 'missing'])
+    assert index.count() == 19
+    stored = index.get(['id3', 'id4'])
+    assert stored['ids'] == ['id3'] and stored['documents'] == ['doc3 v2'] and stored['metadatas'] == [{'group': 9}]
+    top = [doc.page_content for doc, _ in index.search(vectors[5], 2)]
+    assert sorted(top) == ['doc3 v2', 'doc5']
+    assert 'doc4' not in [doc.page_content for doc, _ in index.search(vectors[4], 20)]
+
+
+def test_persist_reload_and_compaction(tmp_path):
+    index, vectors = _filled(NumpyIndex, tmp_path, rows=40)
+    index.delete([f'id{i}' for i in range(20)])
+    index.persist()
+
+    reader = NumpyIndex(tmp_path, read_only=True)
+    assert reader.count() == 20
+    assert reader._rows == 20  # 删除超过 COMPACT_RATIO，持久化时已压缩
+    queries = vectors[20:23]
+    expected = _brute_force(vectors, queries, 5, rows=range(20, 40))
+    for hits, want in zip(reader.search_many(queries, 5), expected):
+        _assert_matches(hits, want)
+    with pytest.raises(RuntimeError):
+        reader.upsert(['x'], [vectors[0]], [{}], ['x'])
+
+
+def test_unpersisted_rows_are_invisible_to_readers(tmp_path):
+    index, vectors = _filled(NumpyIndex, tmp_path, rows=10)
+    index.persist()
+    index.upsert(['late'], [vectors[0]], [{}], ['late'])
+    assert NumpyIndex(tmp_path, read_only=True).count() == 10
+
+
+def test_rejects_ids_that_do_not_fit(tmp_path):
+    index = NumpyIndex(tmp_path)
+    vector = np.ones((1, DIM), dtype=np.float32)
+    index.upsert(['a' * ID_BYTES], vector, [{}], ['ok'])
+    for bad in ('a' * (ID_BYTES + 1), '块'):
+        with pytest.raises(ValueError):
+            index.upsert([bad], vector, [{}], ['bad'])
+    assert index.get()['ids'] == ['a' * ID_BYTES]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    index, _ = _filled(NumpyIndex, tmp_path, rows=5)
+    with pytest.raises(ValueError):
+        index.upsert(['x'], np.ones((1, DIM + 1), dtype=np.float32), [{}], ['x'])
+
+
+@pytest.mark.parametrize('quantization', ['int8', 'float16'])
+def test_quantized_search_matches_brute_force(tmp_path, quantization):
+    """第一轮量化打分后用 float32 原向量重排，top-k 和相似度与精确检索一致"""
+    index, vectors = _filled(QuantizedIndex, tmp_path, quantization=quantization, rerank=50)
+    queries = np.random.default_rng(3).standard_normal((5, DIM)).astype(np.float32)
+    expected = _brute_force(vectors, queries, 10)
+    for hits, want in zip(index.search_many(queries, 10), expected):
+        _assert_matches(hits, want)
+
+    # 持久化（int8 在 256 行以上时重新校准缩放系数）后重新打开
+    index.persist()
+    reader = QuantizedIndex(tmp_path, read_only=True, quantization=quantization, rerank=50)
+    for hits, want in zip(reader.search_many(queries, 10), expected):
+        _assert_matches(hits, want)
+    if quantization == 'int8':
+        assert index._calibration == 1 and not np.allclose(index._scales, 1.0 / 127)
+
+
+def test_quantized_storage_is_smaller(tmp_path):
+    int8, _ = _filled(QuantizedIndex, tmp_path / 'int8', quantization='int8')
+    float16, _ = _filled(QuantizedIndex, tmp_path / 'float16', quantization='float16')
+    exact, _ = _filled(NumpyIndex, tmp_path / 'numpy')
+    assert int8.resident_bytes() * 4 == exact.resident_bytes()
+    assert float16.resident_bytes() * 2 == exact.resident_bytes()
+
+
+def test_quantized_rejects_unknown_scheme(tmp_path):
+    with pytest.raises(ValueError):
+        QuantizedIndex(tmp_path, quantization='int4')
+
+
+def _recall(hits_per_query, expected):
+    found = sum(len({doc.page_content for doc, _ in hits} & {f'doc{row}' for row, _ in want})
+                for hits, want in zip(hits_per_query, expected))
+    return found / sum(len(want) for want in expected)
+
+
+def test_hnsw_recall_against_brute_force(tmp_path):
+    pytest.importorskip('hnswlib')
+    from vector_index import HnswIndex
+    index, vectors = _filled(HnswIndex, tmp_path, rows=2000)
+    queries = np.random.default_rng(4).standard_normal((20, DIM)).astype(np.float32)
+    results = index.search_many(queries, 10)
+    assert _recall(results, _brute_force(vectors, queries, 10)) >= 0.95
+    # 返回的相似度是真实的余弦相似度
+    for (doc, score) in results[0]:
+        row = int(doc.page_content[3:])
+        assert score == pytest.approx(_brute_force(vectors, queries[:1], 1, rows=[row])[0][0][1], abs=1e-4)
+
+
+def test_hnsw_filter_uses_graph(tmp_path):
+    """候选行较多时在图中过滤检索，结果只包含满足条件的行"""
+    pytest.importorskip('hnswlib')
+    from vector_index import HnswIndex
+    index, vectors = _filled(HnswIndex, tmp_path, rows=2000, ef_search=8)
+    queries = np.random.default_rng(5).standard_normal((10, DIM)).astype(np.float32)
+    rows = [i for i in range(2000) if i % 3 == 1]
+    assert len(rows) > max(5, index.ef_search) * 64
+    results = [index.search(query, 5, filter={'group': 1}) for query in queries]
+    assert all(doc.metadata['group'] == 1 for hits in results for doc, _ in hits)
+    index.set_ef_search(64)
+    results = [index.search(query, 5, filter={'group': 1}) for query in queries]
+    assert _recall(results, _brute_force(vectors, queries, 5, rows)) >= 0.9
+
+
+def test_hnsw_delete_and_reopen(tmp_path):
+    pytest.importorskip('hnswlib')
+    from vector_index import HnswIndex
+    index, vectors = _filled(HnswIndex, tmp_path, rows=300)
+    index.delete(['id7', 'id8'])
+    assert index.count() == 298
+    assert {'doc7', 'doc8'}.isdisjoint(doc.page_content for doc, _ in index.search(vectors[7], 20))
+    index.persist()
+
+    reader = HnswIndex(tmp_path, read_only=True)
+    assert reader._graph is not None and reader.count() == 298
+    queries = vectors[10:15]
+    expected = _brute_force(vectors, queries, 5, rows=[i for i in range(300) if i not in (7, 8)])
+    assert _recall(reader.search_many(queries, 5), expected) >= 0.95
+    assert {'doc7', 'doc8'}.isdisjoint(doc.page_content for doc, _ in reader.search(vectors[7], 20))
+
+
+def test_hnsw_upsert_after_reopen(tmp_path):
+    pytest.importorskip('hnswlib')
+    from vector_index import HnswIndex
+    index, vectors = _filled(HnswIndex, tmp_path, rows=100)
+    index.persist()
+
+    writer = HnswIndex(tmp_path)
+    extra = np.random.default_rng(6).standard_normal((5, DIM)).astype(np.float32)
+    writer.upsert([f'new{i}' for i in range(5)], extra, [{'group': 9}] * 5, [f'new{i}' for i in range(5)])
+    writer.upsert(['id0'], [extra[0] * -1], [{'group': 8}], ['doc0 v2'])
+    assert writer._graph.element_count == writer._rows
+    for i in range(5):
+        assert writer.search(extra[i], 1)[0][0].page_content == f'new{i}'
+    assert writer.search(-extra[0], 1)[0][0].page_content == 'doc0 v2'
+    writer.persist()
+
+    reader = HnswIndex(tmp_path, read_only=True)
+    assert reader.count() == 105
+    assert reader.search(extra[3], 1, filter={'group': 9})[0][0].page_content == 'new3'
+
+
+def _clustered(rows=2000, clusters=40, seed=7):
+    """围绕 clusters 个中心分布的向量，近似检索需要在正确的倒排列表中找到近邻"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIM)).astype(np.float32)
+    vectors = centers[np.arange(rows) % clusters] + 0.3 * rng.standard_normal((rows, DIM)).astype(np.float32)
+    return vectors, centers
+
+
+def _ivfpq(path, vectors, **kwargs):
+    from vector_index import IvfPqIndex
+    ids, _, metadatas, documents = _dataset(len(vectors))
+    kwargs = dict(dict(nlist=32, m=8, nprobe=8, rerank=50, min_train_rows=256), **kwargs)
+    index = IvfPqIndex(path, **kwargs)
+    index.upsert(ids, vectors, metadatas, documents)
+    return index
+
+
+def test_ivfpq_trains_on_persist(tmp_path):
+    vectors, _ = _clustered()
+    small = _ivfpq(tmp_path / 'small', vectors[:200])
+    small.persist()
+    assert not small.trained  # 不足 min_train_rows 时使用精确检索
+
+    index = _ivfpq(tmp_path / 'large', vectors)
+    assert not index.trained
+    index.persist()
+    assert index.trained
+    assert index._codes.shape == (2000, 8) and len(index._lists) == 2000
+    assert index.resident_bytes() < 2000 * DIM * 4
+
+
+def test_ivfpq_recall_on_clustered_data(tmp_path):
+    vectors, centers = _clustered()
+    index = _ivfpq(tmp_path, vectors)
+    index.persist()
+    queries = centers[:10] + 0.3 * np.random.default_rng(8).standard_normal((10, DIM)).astype(np.float32)
+    results = index.search_many(queries, 10)
+    assert _recall(results, _brute_force(vectors, queries, 10)) >= 0.9
+    # 候选经过原向量精确重排，返回的相似度是真实值
+    for hits, want in zip(results, _brute_force(vectors, queries, 1)):
+        assert hits[0][1] == pytest.approx(want[0][1], abs=1e-5)
+
+
+def test_ivfpq_filter(tmp_path):
+    vectors, centers = _clustered()
+    index = _ivfpq(tmp_path, vectors)
+    index.persist()
+    rows = [i for i in range(2000) if i % 3 == 1]
+    assert len(rows) > index.rerank * 8  # 走倒排列表而不是精确计算
+    queries = centers[:10]
+    results = [index.search(query, 5, filter={'group': 1}) for query in queries]
+    assert all(doc.metadata['group'] == 1 for hits in results for doc, _ in hits)
+    assert _recall(results, _brute_force(vectors, queries, 5, rows)) >= 0.9
+
+
+def test_ivfpq_delete_reopen_and_upsert(tmp_path):
+    from vector_index import IvfPqIndex
+    vectors, _ = _clustered()
+    index = _ivfpq(tmp_path, vectors)
+    index.persist()
+    index.delete(['id5', 'id45'])  # 同一个簇中的两个向量
+    assert {'doc5', 'doc45'}.isdisjoint(doc.page_content for doc, _ in index.search(vectors[5], 20))
+    index.persist()
+
+    reader = IvfPqIndex(tmp_path, read_only=True, nprobe=8, rerank=50)
+    assert reader.trained and reader.count() == 1998
+    assert {'doc5', 'doc45'}.isdisjoint(doc.page_content for doc, _ in reader.search(vectors[5], 20))
+    queries = vectors[100:105]
+    expected = _brute_force(vectors, queries, 5, rows=[i for i in range(2000) if i not in (5, 45)])
+    assert _recall(reader.search_many(queries, 5), expected) >= 0.9
+
+    # 重新打开后写入的行用已有码本编码，无需重新训练即可检索到
+    writer = IvfPqIndex(tmp_path, nprobe=8, rerank=50, min_train_rows=256)
+    writer.upsert(['new'], [vectors[7] * 2 + 0.01], [{'group': 9}], ['new'])
+    assert writer.trained and len(writer._codes) == writer._rows
+    assert writer.search(vectors[7], 1)[0][0].page_content in ('new', 'doc7')
+    assert writer.search(vectors[7], 1, filter={'group': 9})[0][0].page_content == 'new'